@@ -1,11 +1,13 @@
 """Contains a trigger endpoint."""
 
 import logging
+from typing import Optional
 
 from fastapi import FastAPI, Query, HTTPException
 from starlette.responses import JSONResponse
 
 from pnp.api.models import EmptyResponse
+from pnp.engines import Engine
 from pnp.models import TaskSet
 from .base import Endpoint
 
@@ -16,8 +18,10 @@ class Trigger(Endpoint):
     """Triggers a poll right now without being it's schedule be fulfilled.
     This only works for polling components and not for regular pull"""
 
-    def __init__(self, tasks: TaskSet):
+    def __init__(self, tasks: TaskSet, engine: Optional[Engine] = None):
         self.tasks = tasks
+        # The engine knows where the pull is running (e.g. in a worker process)
+        self.engine = engine
 
     async def endpoint(
             self,
@@ -47,7 +51,10 @@ class Trigger(Endpoint):
             )
 
         try:
-            await pull.pull_now()
+            if self.engine is not None:
+                await self.engine.trigger(task)
+            else:
+                await pull.pull_now()
             return EmptyResponse()
         except Exception as exc:  # pylint: disable=broad-except
             _LOGGER.exception("While triggering the poll an error occurred.")
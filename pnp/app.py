@@ -32,7 +32,7 @@ class Application(Loggable, ReprMixin):
             self._api.create_api(
                 enable_metrics=config.api.enable_metrics,
             )
-            Trigger(config.tasks).attach(self._api.fastapi)
+            Trigger(config.tasks, self._engine).attach(self._api.fastapi)
 
     @property
     def api(self) -> Optional[RestAPI]:
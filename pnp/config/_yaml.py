@@ -12,7 +12,9 @@ from yamlinclude import YamlIncludeConstructor
 
 from pnp.config._base import Configuration, ConfigLoader
 from pnp.engines import Engine as RealEngine, RetryHandler
-from pnp.models import UDFModel, PullModel, PushModel, TaskModel, TaskSet, APIModel
+from pnp.models import (
+    UDFModel, PullModel, PushModel, TaskModel, TaskSet, APIModel, EXECUTORS, EXECUTOR_THREAD
+)
 from pnp.plugins import load_plugin
 from pnp.plugins.pull import Pull
 from pnp.plugins.push import Push
@@ -45,11 +47,19 @@ class Schemas:
     push_selector_name = "selector"
     push_unwrap_name = "unwrap"
     push_deps_name = "deps"
+    push_max_concurrency_name = "max_concurrency"
+    push_ordered_name = "ordered"
+    push_executor_name = "executor"
 
     Push = sc.Schema({
         plugin_name: sc.Use(str),
         sc.Optional(push_selector_name, default=None): sc.Or(object, None),
         sc.Optional(push_unwrap_name, default=False): bool,
+        sc.Optional(push_max_concurrency_name, default=None): sc.Or(
+            None, sc.And(int, lambda val: val > 0, error="max_concurrency has to be positive")
+        ),
+        sc.Optional(push_ordered_name, default=False): sc.Or(bool, str),
+        sc.Optional(push_executor_name, default=EXECUTOR_THREAD): sc.Or(*EXECUTORS),
         sc.Optional(plugin_args_name, default={}): {
             sc.Optional(str): object
         },
@@ -203,7 +213,10 @@ def _mk_push(task_config: Box, **extra: Any) -> List[PushModel]:
                 )),
                 selector=push[Schemas.push_selector_name],
                 unwrap=unwrap,
-                deps=list(_many(push[Schemas.push_deps_name], push_name))
+                deps=list(_many(push[Schemas.push_deps_name], push_name)),
+                max_concurrency=push.get(Schemas.push_max_concurrency_name),
+                ordered=push.get(Schemas.push_ordered_name, False),
+                executor=push.get(Schemas.push_executor_name, EXECUTOR_THREAD)
             )
     pushes = task_config[Schemas.task_push_name]
     prefix = task_config[Schemas.task_name] + "_push"
@@ -10,15 +10,17 @@ from pnp.engines._base import (
     LimitedRetryHandler,
     AdvancedRetryHandler,
     PushExecutor,
+    PushPlan,
     NotSupportedError
 )
+from pnp.engines._process import ProcessEngine
 
 
 DEFAULT_ENGINE = AsyncEngine(retry_handler=AdvancedRetryHandler())
 
 
 __all__ = [
-    'Engine', 'AsyncEngine', 'RetryDirective', 'RetryHandler', 'NoRetryHandler',
+    'Engine', 'AsyncEngine', 'ProcessEngine', 'RetryDirective', 'RetryHandler', 'NoRetryHandler',
     'SimpleRetryHandler', 'LimitedRetryHandler', 'AdvancedRetryHandler', 'PushExecutor',
-    'NotSupportedError', 'DEFAULT_ENGINE'
+    'PushPlan', 'NotSupportedError', 'DEFAULT_ENGINE'
 ]
@@ -1,98 +1,248 @@
 """Base implementation for asynchronous engines."""
 
 import asyncio
-from typing import Optional
+import concurrent.futures
+import threading
+from collections import deque
+from typing import Optional, Dict, List, Tuple, Deque, Any, Iterable, Iterator
 
-from pnp.engines._base import Engine, RetryHandler, SimpleRetryHandler, PushExecutor
+from pnp import validator
+from pnp.engines._base import (
+    Engine, RetryHandler, SimpleRetryHandler, PushExecutor, PushPlan
+)
+from pnp.engines._queue import PayloadQueue, OVERFLOW_POLICIES, OVERFLOW_BLOCK
 from pnp.models import TaskSet, TaskModel, PushModel
 from pnp.plugins.pull import SyncPull
-from pnp.plugins.push import Push
-from pnp.shared.async_ import async_sleep_until_interrupt
 from pnp.typing import Payload
-from pnp.utils import PY37
+from pnp.utils import PY37, freeze
+
+
+def _current_task() -> Any:
+    # pylint: disable=no-member
+    return asyncio.current_task() if PY37 else asyncio.Task.current_task()  # type: ignore
 
 
 class AsyncEngine(Engine):
-    """Asynchronous engine using asyncio."""
+    """
+    Asynchronous engine using asyncio.
+
+    Each task gets a bounded queue for the payloads its pull emits. The queue is served by a
+    fixed number of worker coroutines that actually execute the pushes. When the queue is full
+    the `queue_overflow` policy decides what happens:
+
+    * `block`: A pull running in a separate thread is blocked until there is space left. Payloads
+      of pulls running on the event loop wait in a bounded backlog of the queue (see
+      `PayloadQueue`)
+    * `drop_oldest`: The oldest queued payload is discarded
+    * `drop_newest`: The new payload is discarded
+
+    Sync pulls run in threads on their own. The engine's thread pool is reserved for short-lived
+    work like sync pushes and selector evaluations. You may size it by passing
+    `executor_workers` (default is the python default). The default executor of the event loop
+    is left alone: Other code running on the loop does not share the pool.
+    """
 
     __REPR_FIELDS__ = 'retry_handler'
 
     HEARTBEAT_INTERVAL = 0.5
 
     def __init__(
-            self, retry_handler: Optional[RetryHandler] = None
+            self, retry_handler: Optional[RetryHandler] = None, queue_size: int = 1000,
+            queue_overflow: str = OVERFLOW_BLOCK, workers: int = 10,
+            executor_workers: Optional[int] = None
     ):
         super().__init__()
         if not retry_handler:
             self.retry_handler = SimpleRetryHandler()  # type: RetryHandler
         else:
             self.retry_handler = retry_handler
+
+        validator.one_of(OVERFLOW_POLICIES, queue_overflow=queue_overflow)
+        self.queue_size = max(0, int(queue_size))  # 0 means unbounded
+        self.queue_overflow = str(queue_overflow)
+        self.workers = max(1, int(workers))
+        if executor_workers is not None and int(executor_workers) < 1:
+            raise ValueError(
+                "executor_workers has to be positive, but is {}".format(executor_workers)
+            )
+        self.executor_workers = None if executor_workers is None else int(executor_workers)
+
         self.loop = asyncio.get_event_loop()
+        self._loop_thread = None  # type: Optional[int]
+        self._queues = {}  # type: Dict[str, PayloadQueue]
+        # The pushes of each task compiled once at start
+        self._plans = {}  # type: Dict[str, List[PushPlan]]
+        # Counters per task: Received payloads and failed pushes
+        self._stats = {}  # type: Dict[str, Dict[str, int]]
+        self._workers = []  # type: List[asyncio.Future[Any]]
+        self._executor = None  # type: Optional[concurrent.futures.ThreadPoolExecutor]
+        # Payloads notified by other threads waiting to be dispatched by the event loop and
+        # whether they reserved space in the queue
+        self._handoff = deque()  # type: Deque[Tuple[TaskModel, Payload, bool]]
+        self._handoff_scheduled = False
+        # Registry of the running asyncio tasks
+        self._pull_tasks = {}  # type: Dict[str, asyncio.Future[Any]]
+        self._watcher = None  # type: Optional[asyncio.Future[Any]]
 
     async def _start(self, tasks: TaskSet) -> None:
         # Use the loop to create callbacks that was used to start the engine
         self.loop = asyncio.get_event_loop()
-        coros = [self._wait_for_tasks_to_complete()]
+        self._loop_thread = threading.get_ident()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.executor_workers, thread_name_prefix='pnp-executor'
+        )
         for _, task in tasks.items():
-            coros.append(self._start_task(task))
+            self._plans[task.name] = [
+                PushPlan(push, executor=self._executor) for push in task.pushes
+            ]
+            self._stats[task.name] = dict(payloads=0, failed=0)
+            queue = PayloadQueue(maxsize=self.queue_size, overflow=self.queue_overflow)
+            self._queues[task.name] = queue
+            self._workers.extend(
+                self.loop.create_task(self._worker(task, queue)) for _ in range(self.workers)
+            )
+            self._pull_tasks[task.name] = self.loop.create_task(self._start_task(task))
 
-        for coro in coros:
-            self.loop.create_task(coro)
+        self._watcher = self.loop.create_task(self._wait_for_tasks_to_complete())
 
     async def _stop(self) -> None:
         if not self.tasks:
             return  # Nothing to stop
 
+        if asyncio.get_event_loop() is not self.loop:
+            # Stop is requested from another thread: The tasks belong to the engine's loop
+            await asyncio.wrap_future(
+                asyncio.run_coroutine_threadsafe(self._stop(), self.loop)
+            )
+            return
+
+        if self._watcher is not None and self._watcher is not _current_task():
+            self._watcher.cancel()
+        self._watcher = None
+
         await asyncio.gather(
             *[self._stop_task(task) for task in self.tasks.values()]
         )
         await self._wait_for_tasks_to_complete(True)
+        await self._stop_pushes(self.tasks.values())
+        for plans in self._plans.values():
+            for plan in plans:
+                await plan.close()
+        await PushExecutor().close()
+
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        self._pull_tasks = {}
+        self._queues = {}
+        self._plans = {}
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Returns some counters per task: The number of payloads the pull emitted
+        (`payloads`), the number of failed pushes (`failed`) and the number of pushes waiting
+        to be executed (`queued`)."""
+        return {
+            name: dict(stats, queued=self._queues[name].in_flight if name in self._queues else 0)
+            for name, stats in self._stats.items()
+        }
 
     async def _wait_for_tasks_to_complete(self, called_from_stop: bool = False) -> None:
-        """Check if something is still running on the event loop (like running pushes) so that the
-        event loop will not terminate but wait for pending tasks."""
-        # pylint: disable=no-member
-        fun_pending_tasks = asyncio.all_tasks if PY37 else asyncio.Task.all_tasks  # type: ignore
-        fun_current_task = (
-            asyncio.current_task if PY37  # type: ignore
-            else asyncio.Task.current_task
-        )
+        """Waits for all pulls to exit and all pending pushes to complete so that the engine
+        will not terminate before. Waiting is purely event based: Nothing happens while idle."""
+        current = _current_task()
+        pulls = [pull for pull in self._pull_tasks.values() if pull is not current]
+        if pulls:
+            await asyncio.wait(pulls)
 
-        # pylint: enable=no-member
-        async def _pending_tasks_exist() -> bool:
-            all_tasks = list(fun_pending_tasks())
-            for task in all_tasks:
-                if task is fun_current_task():  # Just in case
-                    continue
-                if task.done():  # Just in case
-                    continue
-                # Is a push running?
-                if "coro=<AsyncEngine._schedule_push()" in str(task):
-                    return True
-                # Is a pull running?
-                if "coro=<AsyncEngine._start_task()" in str(task):
-                    return True
-            return False
-
-        await asyncio.sleep(self.HEARTBEAT_INTERVAL)
-        while await _pending_tasks_exist():
-            await asyncio.sleep(self.HEARTBEAT_INTERVAL)
+        # Pushes: Handed off by other threads, queued or waiting in the backlog of a queue
+        while self._handoff or any(queue.in_flight for queue in self._queues.values()):
+            if self._handoff:
+                await asyncio.sleep(0)  # The drain is already scheduled: Let it run
+            for queue in list(self._queues.values()):
+                await queue.join()
 
         if not called_from_stop:
             await self.stop()
 
+    def _enqueue(self, task: TaskModel, payload: Payload) -> None:
+        """Dispatches the payload to the task's queue. When called from another thread than the
+        event loop the payload is handed off to the loop: Many notifications will be batched into
+        a single wakeup of the loop. The calling thread might be blocked when the queue is full
+        (see `queue_overflow`)."""
+        queue = self._queues.get(task.name)
+        if queue is None:
+            return  # Engine is not running (anymore)
+
+        # One immutable copy per payload: It is shared by all pushes and their selectors.
+        # When called from a pull thread this work is done there and not in the event loop.
+        payload = freeze(payload)
+
+        if threading.get_ident() == self._loop_thread:
+            self._dispatch(task, queue, payload)
+            return
+
+        reserved = queue.overflow == OVERFLOW_BLOCK
+        if reserved:
+            # The space is reserved before the payload is handed off: Payloads on their way to
+            # the loop count against the size of the queue as well
+            count = len(self._plans[task.name])
+            while not queue.reserve(count, timeout=self.HEARTBEAT_INTERVAL):
+                if task.pull.instance.stopped or not self.is_running:
+                    return
+
+        # deque.append / popleft are thread-safe: No need for locking
+        self._handoff.append((task, payload, reserved))
+        if not self._handoff_scheduled:
+            self._handoff_scheduled = True
+            self.loop.call_soon_threadsafe(self._drain_handoff)
+
+    def _drain_handoff(self) -> None:
+        """Dispatches all payloads that were handed off by other threads so far."""
+        # Reset the flag first: Any payload appended from now on will schedule another drain
+        self._handoff_scheduled = False
+        while self._handoff:
+            task, payload, reserved = self._handoff.popleft()
+            queue = self._queues.get(task.name)
+            if queue is not None:
+                self._dispatch(task, queue, payload, reserved=reserved)
+
+    def _dispatch(
+            self, task: TaskModel, queue: PayloadQueue, payload: Payload, reserved: bool = False
+    ) -> None:
+        """Puts the payload for each push of the task into the queue. Has to be called from
+        the event loop."""
+        self._stats[task.name]['payloads'] += 1
+        for plan in self._plans[task.name]:
+            self.logger.debug(
+                "[Task-%s] Queueing item '%s' for push '%s'",
+                task.name,
+                payload,
+                plan.name
+            )
+            # We cannot block the event loop itself: When the queue is full the payload waits
+            # in the backlog of the queue (block) -> keeps the order of the payloads
+            queue.offer((payload, plan), reserved=reserved)
+
+    async def _worker(self, task: TaskModel, queue: PayloadQueue) -> None:
+        """Processes the queued payloads of the given task."""
+        while True:
+            payload, plan = await queue.get()
+            try:
+                await self._schedule_push(task, payload, plan)
+            except Exception:  # pragma: no cover, pylint: disable=broad-except
+                self.logger.exception("[Task-%s] Worker failed", task.name)
+            finally:
+                queue.task_done()
+
     async def _start_task(self, task: TaskModel) -> None:
         """Start the given task."""
         def on_payload_sync(pull: SyncPull, payload: Payload) -> None:
             _ = pull  # Fake usage
-            for push in task.pushes:
-                self.logger.debug(
-                    "[Task-%s] Execution of item '%s' for push '%s'",
-                    task.name,
-                    payload,
-                    push
-                )
-                self.loop.create_task(self._schedule_push(payload, push))
+            self._enqueue(task, payload)
 
         task.pull.instance.callback(on_payload_sync)  # type: ignore
 
@@ -149,30 +299,35 @@ class AsyncEngine(Engine):
             directive.wait_for
         )
 
-        async def _interrupt() -> bool:
-            return task.pull.instance.stopped
-        await async_sleep_until_interrupt(directive.wait_for, _interrupt)
+        await task.pull.instance.wait_stopped(directive.wait_for)
 
     async def _stop_task(self, task: TaskModel) -> None:
         self.logger.info("Stopping task %s", task.name)
         instance = task.pull.instance
         await instance.stop()
 
-    async def _schedule_push(self, payload: Payload, push: PushModel) -> None:
-        assert isinstance(push, PushModel)
-        assert isinstance(push.instance, Push)
+    async def _stop_pushes(self, tasks: Iterable[TaskModel]) -> None:
+        """Stops all pushes (including dependencies) of the given tasks. Gives them a chance
+        to flush any buffered payloads."""
+        def _walk(pushes: Iterable[PushModel]) -> Iterator[PushModel]:
+            for push in pushes:
+                yield push
+                yield from _walk(push.deps)
 
-        def _callback(result: Payload, dependency: PushModel) -> None:
-            self.loop.create_task(self._schedule_push(result, dependency))
+        for task in tasks:
+            for push in _walk(task.pushes):
+                try:
+                    await push.instance.stop()
+                except Exception:  # pylint: disable=broad-except
+                    self.logger.exception("Stopping push '%s' failed", push.instance.name)
 
+    async def _schedule_push(self, task: TaskModel, payload: Payload, plan: PushPlan) -> None:
         try:
-            await PushExecutor().execute(
-                push.instance.name,
-                payload,
-                push,
-                _callback
-            )
+            # Dependencies are processed by the same worker. Putting them back into the
+            # queue could dead-lock the workers when the queue is full.
+            await plan.run(plan.name, payload)
         except KeyboardInterrupt:  # pragma: no cover
             pass
         except Exception:  # pragma: no cover, pylint: disable=broad-except
-            self.logger.exception("Push '%s' failed", push.instance.name)
+            self._stats[task.name]['failed'] += 1
+            self.logger.exception("Push '%s' failed", plan.name)
@@ -1,18 +1,24 @@
 """Contains base classes for engines."""
 
-import copy
+import asyncio
+import concurrent.futures
+import inspect
 from abc import abstractmethod, ABCMeta
+from collections import OrderedDict
 from datetime import datetime
-from typing import Any, Callable, Optional, Coroutine, Iterable
+from functools import partial
+from typing import Any, Awaitable, Callable, Optional, Coroutine, Iterable, List, Tuple, Union, cast
 
 import pydantic
 import typeguard
 from typeguard import check_argument_types
 
 from pnp import validator
-from pnp.models import TaskSet, PushModel
-from pnp.selector import PayloadSelector
-from pnp.shared.async_ import run_sync
+from pnp.models import TaskSet, TaskModel, PushModel, EXECUTOR_PROCESS
+from pnp.plugins.push import SyncPush
+from pnp.selector import CompiledSelector, PayloadSelector
+from pnp.shared.async_ import KeyedLock, run_sync
+from pnp.shared.process import ProcessOffload
 from pnp.typing import Payload
 from pnp.utils import (
     Loggable,
@@ -20,6 +26,8 @@ from pnp.utils import (
     parse_duration_literal,
     DurationLiteral,
     is_iterable_but_no_str,
+    freeze,
+    make_hashable,
     ReprMixin
 )
 
@@ -46,7 +54,7 @@ class Engine(Loggable, ReprMixin, metaclass=ABCMeta):
     A call to to an engine's `run(...)` method will block the calling thread until the engine
     decides the job is done (normally an external SIGTERM occurs)
     """
-    __REPR_FIELDS__ = 'is_running'
+    __REPR_FIELDS__ = 'is_running'  # type: Union[str, List[str]]
 
     def __init__(self) -> None:
         self._is_running = False
@@ -127,6 +135,11 @@ class Engine(Loggable, ReprMixin, metaclass=ABCMeta):
         """Stop the engine. Override in child classes."""
         raise NotImplementedError()
 
+    async def trigger(self, task: TaskModel) -> None:
+        """Runs the pull of the given task right now (see `Pull.pull_now`). Override in child
+        classes when the pull is not run by the calling process."""
+        await task.pull.instance.pull_now()
+
 
 class RetryDirective(pydantic.BaseModel):
     """Contains directive information for engines on how to proceed in erroneous cases."""
@@ -243,45 +256,251 @@ class AdvancedRetryHandler(LimitedRetryHandler):
         )
 
 
-class PushExecutor(Loggable, Singleton):
+# A compiled push: Name, bound push coroutine, compiled selector, unwrap flag, dependency slots
+PlanStep = Tuple[str, Callable[[Payload], Awaitable[Payload]], Optional[CompiledSelector], bool,
+                 Tuple[int, ...]]
+
+
+class PushPlan(Loggable, ReprMixin):
     """
-    Given a payload and the push this helper actually "executes" the push by passing the payload
-    after the (optional) selector did some magic to it.
+    The push and its dependencies compiled into a flat list of steps. Each step refers to its
+    dependencies by their slot (index) in the list. The push coroutines are bound and the
+    selectors compiled once, so executing the plan does not touch the `PushModel` tree anymore.
+
+    `max_concurrency` limits how many payloads are processed by the push (including its
+    dependencies) at the same time. `ordered` processes the payloads one after another in the
+    order they arrive; a selector expression computes a key to only order payloads with the same
+    key (e.g. per mqtt topic). A dependency with limits of its own gets a nested plan.
+    A synchronous push with the `process` executor runs in a pool of worker processes; any other
+    synchronous work (sync pushes, slow selectors) runs in the given `executor` (default is the
+    default executor of the event loop).
+
+    Examples:
+
+        >>> import asyncio
+        >>> from pnp.plugins.push.simple import Nop
+        >>> dep = PushModel(instance=Nop(name='dep'), selector='data * 2')
+        >>> plan = PushPlan(PushModel(instance=Nop(name='root'), unwrap=True, deps=[dep]))
+        >>> len(plan), plan.name
+        (2, 'root')
+        >>> asyncio.new_event_loop().run_until_complete(plan.run('doctest', [1, 2]))
+        >>> dep.instance.last_payload
+        4
     """
 
-    async def _internal(
-            self, ident: str, payload: Payload, push: PushModel,
-            result_callback: Optional[PushResultCallback] = None
-    ) -> None:
-        self.logger.debug("[%s] Selector: Applying '%s' to '%s'", ident, push.selector, payload)
-        # The selector expression has no async support
-        payload = await run_sync(
-            PayloadSelector().eval_selector, push.selector, copy.deepcopy(payload)
+    __REPR_FIELDS__ = ['name']
+
+    def __init__(
+            self, push: PushModel, executor: Optional[concurrent.futures.Executor] = None
+    ):
+        validator.is_instance(PushModel, push=push)
+        self.name = push.instance.name
+        self._executor = executor
+        self._models = []  # type: List[PushModel]
+        self._steps = []  # type: List[PlanStep]
+        self._nested = []  # type: List[PushPlan]
+        self._offloads = []  # type: List[ProcessOffload]
+        self._compile(push)
+        self._suppress = PayloadSelector().suppress
+
+        self.max_concurrency = push.max_concurrency and max(1, int(push.max_concurrency))
+        self._limit = None  # type: Optional[asyncio.Semaphore]
+        self._order_key = None  # type: Optional[Callable[[Payload], Any]]
+        if isinstance(push.ordered, str):
+            self._order_key = PayloadSelector().compile_selector(push.ordered)
+        elif push.ordered:
+            self._order_key = lambda payload: None  # Everything is ordered
+        self._order_locks = KeyedLock()
+        # Resolved when the latest payload asked for its order lock
+        self._order_turn = None  # type: Optional[asyncio.Future[None]]
+
+    def __len__(self) -> int:
+        return len(self._steps)
+
+    def _compile(self, push: PushModel) -> int:
+        slot = len(self._steps)
+        self._models.append(push)
+        if slot > 0 and (push.max_concurrency or push.ordered):
+            # The limits apply to the dependency and its own dependencies: Run a nested plan
+            nested = PushPlan(push, executor=self._executor)
+            self._nested.append(nested)
+            self._steps.append((nested.name, partial(nested.run, nested.name), None, False, ()))
+            return slot
+
+        self._steps.append(None)  # type: ignore  # Reserve the slot: Dependencies come next
+        selector = (
+            None if push.selector is None
+            else PayloadSelector().compile_selector(push.selector)
         )
+        push_fun = push.instance.push
+        push_impl = getattr(push.instance, '_push')
+        if push.executor == EXECUTOR_PROCESS:
+            if not isinstance(push.instance, SyncPush):
+                raise ValueError(
+                    "Push '{}' is asynchronous: Only synchronous pushes can run in worker "
+                    "processes".format(push.instance.name)
+                )
+            # One worker process per allowed concurrent execution
+            offload = ProcessOffload(push.instance, processes=push.max_concurrency)
+            self._offloads.append(offload)
+            push_fun = partial(offload.call, '_push')
+        elif self._executor is not None and not inspect.iscoroutinefunction(push_impl):
+            push_fun = partial(run_sync, push_impl, executor=self._executor)
+        deps = tuple(self._compile(dep) for dep in push.deps)
+        self._steps[slot] = (
+            push.instance.name, push_fun, selector, bool(push.unwrap), deps
+        )
+        return slot
 
-        if PayloadSelector().should_suppress(payload):
-            self.logger.debug(
-                "[%s] Selector evaluated to suppress literal. Skipping the push", ident
-            )
-            return
+    async def close(self) -> None:
+        """Releases the resources of the plan (e.g. worker processes)."""
+        for nested in self._nested:
+            await nested.close()
+        for offload in self._offloads:
+            await offload.close()
 
-        self.logger.debug("[%s] Emitting '%s' to push '%s'", ident, payload, push.instance)
-        push_result = await push.instance.push(payload)
+    async def run(
+            self, ident: str, payload: Payload,
+            result_callback: Optional[PushResultCallback] = None
+    ) -> None:
+        """
+        Executes the plan for the given payload. Dependencies are processed depth-first right
+        after the push they depend on. When a `result_callback` is given the dependencies of the
+        root push are delegated to the callback instead.
+        """
+        if self._order_key is None and not self.max_concurrency:
+            await self._run(ident, payload, result_callback)
+            return
 
-        # Trigger any dependent pushes
-        for dependency in push.deps:
-            if result_callback:
-                # Delegate work back to the engine
+        key = None
+        if self._order_key is not None:
+            key = await self._acquire_order(payload)
+        try:
+            if self.max_concurrency:
+                if self._limit is None:
+                    self._limit = asyncio.Semaphore(self.max_concurrency)
+                async with self._limit:
+                    await self._run(ident, payload, result_callback)
+            else:
+                await self._run(ident, payload, result_callback)
+        finally:
+            if self._order_key is not None:
+                self._order_locks.release(key)
+
+    async def _acquire_order(self, payload: Payload) -> Any:
+        """Computes the order key of the payload and acquires its lock. Payloads ask for their
+        lock in the order they arrive, even if the key is computed in the executor."""
+        order_key = cast(Callable[[Payload], Any], self._order_key)
+        inline = getattr(order_key, 'inline', True)
+        previous = self._order_turn
+        if inline and (previous is None or previous.done()):
+            # No await before the lock is acquired: The order of arrival is kept
+            key = make_hashable(order_key(payload))
+            await self._order_locks.acquire(key)
+            return key
+
+        turn = asyncio.get_event_loop().create_future()  # type: asyncio.Future[None]
+        self._order_turn = turn
+        try:
+            if inline:
+                key = make_hashable(order_key(payload))
+            else:
+                # Calls user-defined functions or is slow: Do not block the event loop
+                key = make_hashable(
+                    await run_sync(order_key, payload, executor=self._executor)
+                )
+            if previous is not None:
+                # Wait until the payloads that arrived earlier asked for their lock
+                await asyncio.wait([previous])
+        finally:
+            turn.set_result(None)
+        await self._order_locks.acquire(key)
+        return key
+
+    async def _run(
+            self, ident: str, payload: Payload,
+            result_callback: Optional[PushResultCallback] = None
+    ) -> None:
+        steps = self._steps
+        suppress = self._suppress
+        # Slot, payload and whether the payload is already an unwrapped item
+        stack = [(0, payload, False)]  # type: List[Tuple[int, Payload, bool]]
+        while stack:
+            slot, payload, unwrapped = stack.pop()
+            name, push, selector, unwrap, deps = steps[slot]
+
+            if unwrap and not unwrapped and is_iterable_but_no_str(payload):
+                items = list(payload)
                 self.logger.debug(
-                    "[%s] Dependency callback is given. Delegating work back to engine", ident
+                    "[%s] Unwrapping payload to %s individual items", ident, len(items)
                 )
-                result_callback(push_result, dependency)
-            else:
-                # No delegation callback defined: The executor will recursively call itself
+                stack.extend((slot, item, True) for item in reversed(items))
+                continue
+
+            if selector is not None:
+                if selector.inline:
+                    # Cheap enough: Not worth the round-trip to the executor
+                    payload = selector(payload)
+                else:
+                    # Calls user-defined functions or is slow: Do not block the event loop
+                    payload = await run_sync(selector, payload, executor=self._executor)
+            if payload is suppress:
                 self.logger.debug(
-                    "[%s] No callback is given. Recursively process dependencies", ident
+                    "[%s] Selector evaluated to suppress literal. Skipping the push", ident
                 )
-                await self.execute(ident, push_result, dependency)
+                continue
+
+            self.logger.debug("[%s] Emitting '%s' to push '%s'", ident, payload, name)
+            result = await push(payload)
+            if not deps:
+                continue
+
+            # Dependencies will share the result: Make sure no one can change it
+            result = freeze(result)
+            if result_callback is not None:
+                # Delegate work back to the engine
+                for dep in deps:
+                    result_callback(result, self._models[dep])
+                continue
+            stack.extend((dep, result, False) for dep in reversed(deps))
+
+
+class PushExecutor(Loggable, Singleton):
+    """
+    Given a payload and the push this helper actually "executes" the push by passing the payload
+    after the (optional) selector did some magic to it.
+
+    The push is compiled to a `PushPlan` on its first call and the plan is reused afterwards
+    (the most recently used `MAX_PLANS` plans are kept). Call `close` to release the resources
+    of the cached plans. Engines should compile the plans once and run them directly.
+    """
+
+    MAX_PLANS = 256
+
+    def __init__(self) -> None:
+        # Push models are neither hashable nor weak referenceable: The plans are keyed by the id
+        # of the model. The model is kept alongside, so its id can't be reused by another one
+        self._plans = OrderedDict()  # type: OrderedDict[int, Tuple[PushModel, PushPlan]]
+
+    async def _plan(self, push: PushModel) -> PushPlan:
+        cached = self._plans.get(id(push))
+        if cached is not None and cached[0] is push:
+            self._plans.move_to_end(id(push))
+            return cached[1]
+        plan = PushPlan(push)
+        self._plans[id(push)] = (push, plan)
+        if len(self._plans) > self.MAX_PLANS:
+            _, (_, evicted) = self._plans.popitem(last=False)
+            await evicted.close()
+        return plan
+
+    async def close(self) -> None:
+        """Releases the resources of the cached plans (e.g. worker processes) and forgets
+        them."""
+        plans = [plan for _, plan in self._plans.values()]
+        self._plans.clear()
+        for plan in plans:
+            await plan.close()
 
     async def execute(
             self, ident: str, payload: Payload, push: PushModel,
@@ -310,12 +529,7 @@ class PushExecutor(Loggable, Singleton):
             )
             result_callback = None
 
-        if push.unwrap and is_iterable_but_no_str(payload):
-            # Payload unwrapping
-            length = len(payload)
-            self.logger.debug("[%s] Unwrapping payload to %s individual items", ident, str(length))
-            for item in payload:
-                await self._internal(ident, item, push, result_callback)
-        else:
-            # Standard way
-            await self._internal(ident, payload, push, result_callback)
+        # Sibling pushes and dependencies share the payload: Nobody may change it in place
+        payload = freeze(payload)
+        plan = await self._plan(push)
+        await plan.run(ident, payload, result_callback)
@@ -0,0 +1,497 @@
+"""Engine that shards the tasks across multiple processes."""
+
+import asyncio
+import copy
+import logging
+import logging.handlers
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import threading
+import time
+from typing import Optional, Dict, List, Any, Iterator
+
+from pnp.engines._async import AsyncEngine
+from pnp.engines._base import Engine, RetryHandler, SimpleRetryHandler, AdvancedRetryHandler
+from pnp.models import TaskSet, TaskModel
+from pnp.shared.async_ import ThreadSafeEvent, run_in_thread
+from pnp.utils import ReprMixin
+
+# Message kind of the statistics a shard reports to the parent
+_STATS = 'stats'
+# Message kind of the state of a shard the supervisor reports to the parent
+_STATE = 'state'
+# Command kind to trigger the pull of a task in a shard
+_TRIGGER = 'trigger'
+
+
+def _kill(pid: int) -> None:
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except ProcessLookupError:  # Already gone
+        pass
+
+
+class Shard(ReprMixin):
+    """A subset of the tasks running in a dedicated worker process. The state of the worker
+    process (`pid`, `alive`, `exitcode` and `restarts`) is reported by the supervisor."""
+
+    __REPR_FIELDS__ = ['index', 'pid', 'restarts', 'tasks']
+
+    def __init__(self, index: int, tasks: TaskSet, restart_handler: RetryHandler):
+        self.index = index
+        self.tasks = tasks
+        self.restart_handler = restart_handler
+        # Commands for the worker process (like triggering a pull)
+        self.commands = None  # type: Any
+        # Only known to the supervisor
+        self.process = None  # type: Any
+        self.pid = None  # type: Optional[int]
+        self.alive = False
+        self.exitcode = None  # type: Optional[int]
+        self.restarts = 0
+        # Counters per task as reported by the worker process
+        self.stats = {}  # type: Dict[str, Dict[str, int]]
+
+    @property
+    def name(self) -> str:
+        """Returns the name of the worker process."""
+        return 'pnp-shard-{}'.format(self.index)
+
+    @property
+    def state(self) -> Dict[str, Any]:
+        """Returns the state of the worker process."""
+        return dict(pid=self.pid, alive=self.alive, exitcode=self.exitcode, restarts=self.restarts)
+
+
+class _PipeHandler(logging.handlers.QueueHandler):
+    """Sends the log records through a `SimpleQueue`: Unlike a `Queue` it does not start a
+    feeder thread in the sending process."""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        queue = self.queue  # type: Any
+        queue.put(record)
+
+
+def _forward_logs(handler: logging.Handler) -> None:
+    """Sends all log records of this process to the parent: It knows how to handle them."""
+    for logger in [logging.getLogger()] + list(logging.Logger.manager.loggerDict.values()):
+        if not isinstance(logger, logging.Logger):
+            continue  # Placeholder
+        for old in list(logger.handlers):
+            logger.removeHandler(old)
+        logger.propagate = True
+    logging.getLogger().addHandler(handler)
+
+
+class ProcessEngine(Engine):
+    """
+    Distributes the tasks across `processes` worker processes (default is the number of cpu
+    cores). Each worker process runs an `AsyncEngine` with the given `retry_handler` and
+    `engine_args` (e.g. `queue_size` or `workers`) for its share of the tasks. This way
+    cpu-heavy tasks do not starve latency-sensitive ones.
+
+    Tasks are distributed evenly. Use `assignment` to pin tasks (by name) to a specific worker
+    process (by index). The worker processes are forked by a supervisor process. It is forked
+    before the engine starts any of its threads (a forked process inherits the locks held by
+    other threads) and never starts one on its own. A worker process that exits unexpectedly is
+    restarted by the supervisor as instructed by the `restart_handler` (default is to wait
+    10 seconds and to give up after 5 restarts in quick succession). The `retry_handler` is
+    only used for the pulls inside the worker processes. The log records of the worker
+    processes are handled by the logging configuration of the parent. The counters of the
+    workers are aggregated in the parent (see `stats`) and exposed as prometheus metrics.
+    Triggering a pull (see `trigger`) is forwarded to the worker process that runs it.
+
+    The worker processes are forked: Only available on posix compliant systems.
+    """
+
+    __REPR_FIELDS__ = ['processes', 'restart_handler', 'retry_handler']
+
+    # Seconds between two statistic reports of a worker process
+    REPORT_INTERVAL = 5.0
+
+    # Seconds to wait for the worker processes to stop gracefully before they are killed
+    STOP_TIMEOUT = 10.0
+
+    def __init__(
+            self, processes: Optional[int] = None, assignment: Optional[Dict[str, int]] = None,
+            retry_handler: Optional[RetryHandler] = None,
+            restart_handler: Optional[RetryHandler] = None, **engine_args: Any
+    ):
+        super().__init__()
+        self.processes = max(1, int(processes or os.cpu_count() or 1))
+        self.assignment = {
+            str(task): int(index) % self.processes for task, index in (assignment or {}).items()
+        }
+        self.retry_handler = retry_handler or SimpleRetryHandler()  # type: RetryHandler
+        self.restart_handler = restart_handler or AdvancedRetryHandler(
+            retry_wait=10, max_retries=5
+        )  # type: RetryHandler
+        self.engine_args = engine_args
+
+        self._shards = []  # type: List[Shard]
+        self._supervisor = None  # type: Any
+        self._watcher = None  # type: Optional[asyncio.Future[Any]]
+        self._queue = None  # type: Any
+        self._events = None  # type: Any
+        self._listeners = []  # type: List[threading.Thread]
+        self._collector = None  # type: Any
+        self._stopping = ThreadSafeEvent()
+
+    @property
+    def shards(self) -> List[Shard]:
+        """Returns the shards of the running engine."""
+        return list(self._shards)
+
+    def shard(self, tasks: TaskSet) -> List[TaskSet]:
+        """
+        Splits the tasks into one task set per worker process. Pinned tasks go to their worker
+        process first, the remaining tasks go to the worker process with the fewest tasks.
+
+        Examples:
+
+            >>> dut = ProcessEngine(processes=2, assignment={'c': 0})
+            >>> [sorted(subset) for subset in dut.shard(dict(a=1, b=2, c=3, d=4))]
+            [['b', 'c'], ['a', 'd']]
+        """
+        subsets = [{} for _ in range(self.processes)]  # type: List[TaskSet]
+        loads = [0] * self.processes
+        for name, task in tasks.items():
+            if name in self.assignment:
+                subsets[self.assignment[name]][name] = task
+                loads[self.assignment[name]] += 1
+        for name, task in tasks.items():
+            if name not in self.assignment:
+                index = loads.index(min(loads))
+                subsets[index][name] = task
+                loads[index] += 1
+        return subsets
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Returns the latest counters per task reported by the worker processes (see
+        `AsyncEngine.stats`)."""
+        res = {}  # type: Dict[str, Dict[str, int]]
+        for shard in self._shards:
+            res.update(shard.stats)
+        return res
+
+    async def _start(self, tasks: TaskSet) -> None:
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError as exc:
+            raise RuntimeError("The ProcessEngine requires a platform that supports fork") from exc
+
+        # Everything the supervisor and the worker processes need is created before it is
+        # forked: No thread is started before
+        self._stopping = ThreadSafeEvent()
+        self._queue = context.Queue()  # Log records and statistics of the worker processes
+        self._events = context.SimpleQueue()  # Log records and shard states of the supervisor
+        self._shards = [
+            Shard(index, subset, copy.deepcopy(self.restart_handler))
+            for index, subset in enumerate(self.shard(tasks)) if subset
+        ]
+        for shard in self._shards:
+            shard.commands = context.SimpleQueue()
+        self._supervisor = context.Process(
+            target=self._run_supervisor, args=(context,), name='pnp-shard-supervisor'
+        )
+        self._supervisor.start()
+
+        self._listeners = [
+            threading.Thread(
+                target=self._listen, args=(queue,), name='pnp-shard-listener', daemon=True
+            )
+            for queue in (self._queue, self._events)
+        ]
+        for listener in self._listeners:
+            listener.start()
+        self._register_metrics()
+        self._watcher = asyncio.ensure_future(self._wait_for_supervisor())
+
+    async def _wait_for_supervisor(self) -> None:
+        await run_in_thread(self._supervisor.join, name='pnp-shard-supervisor')
+        if self._stopping.is_set():
+            return  # Stop is already in progress
+        # All worker processes are done (or will not be restarted): So is the engine
+        self._watcher = None
+        await self.stop()
+
+    async def _stop(self) -> None:
+        self._stopping.set()
+        if self._supervisor is not None and self._supervisor.is_alive():
+            # Graceful: The supervisor stops the worker processes (and kills them if necessary)
+            self._supervisor.terminate()
+
+        watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            _, pending = await asyncio.wait([watcher], timeout=self.STOP_TIMEOUT + 5)
+            if pending:
+                self.logger.warning("Killing the supervisor and the worker processes")
+                for shard in self._shards:
+                    if shard.alive and shard.pid:
+                        _kill(shard.pid)
+                self._supervisor.kill()
+                await asyncio.wait(pending)
+
+        self._unregister_metrics()
+        for queue in (self._queue, self._events):
+            queue.put(None)  # Sentinel: Stop listening
+        for listener in self._listeners:
+            await run_in_thread(listener.join)
+        self._listeners = []
+        self._queue.close()
+        self._queue, self._events, self._supervisor = None, None, None
+
+    async def trigger(self, task: TaskModel) -> None:
+        """Forwards the trigger to the worker process that runs the pull of the task. Errors
+        while pulling are logged by the worker process."""
+        for shard in self._shards:
+            if task.name in shard.tasks:
+                if shard.exitcode is not None or self._stopping.is_set():
+                    raise RuntimeError(
+                        "Worker process '{}' of task '{}' is not running".format(
+                            shard.name, task.name
+                        )
+                    )
+                await run_in_thread(shard.commands.put, (_TRIGGER, task.name))
+                return
+        raise RuntimeError("Task '{}' is not running".format(task.name))
+
+    def _listen(self, queue: Any) -> None:
+        """Handles the log records, statistics and states sent by the supervisor and the worker
+        processes. Runs in a separate thread of the parent."""
+        while True:
+            item = queue.get()
+            if item is None:
+                break
+            if isinstance(item, logging.LogRecord):
+                logging.getLogger(item.name).handle(item)
+                continue
+            kind, index, data = item
+            for shard in self._shards:
+                if shard.index != index:
+                    continue
+                if kind == _STATS:
+                    shard.stats = data
+                elif kind == _STATE:
+                    for key, value in data.items():
+                        setattr(shard, key, value)
+
+    def _run_supervisor(self, context: Any) -> None:
+        """Entrypoint of the supervisor process: Forks the worker processes and restarts them
+        when they crash. It is single-threaded, so it is safe to fork from here at any time."""
+        events = self._events
+        _forward_logs(_PipeHandler(events))
+        logger = logging.getLogger(__name__)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # The parent is in charge to stop us
+
+        # Wakes up the supervisor when it is asked to stop
+        wakeup_r, wakeup_w = os.pipe()
+        os.set_blocking(wakeup_r, False)
+        os.set_blocking(wakeup_w, False)
+        stopping = []  # type: List[float]
+
+        supervisor = os.getpid()
+
+        def _on_term(*_: Any) -> None:
+            if os.getpid() != supervisor:
+                # A worker process that did not install its own handler yet
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                os.kill(os.getpid(), signal.SIGTERM)
+                return
+            if not stopping:
+                stopping.append(time.monotonic() + self.STOP_TIMEOUT)
+                os.write(wakeup_w, b'x')
+        signal.signal(signal.SIGTERM, _on_term)
+
+        def _report(shard: Shard) -> None:
+            events.put((_STATE, shard.index, shard.state))
+
+        def _spawn(shard: Shard) -> None:
+            shard.process = context.Process(
+                target=self._run_shard, args=(shard,), name=shard.name
+            )
+            shard.process.start()
+            shard.pid, shard.alive, shard.exitcode = int(shard.process.pid), True, None
+            _report(shard)
+            logger.info(
+                "Started worker process '%s' (pid %s) for tasks %s",
+                shard.name, shard.pid, list(shard.tasks)
+            )
+
+        def _reap(shard: Shard) -> None:
+            shard.alive, shard.exitcode = False, shard.process.exitcode
+            _report(shard)
+            if stopping or shard.exitcode == 0:
+                logger.info("Worker process '%s' exited", shard.name)
+                return
+            logger.error(
+                "Worker process '%s' (pid %s) exited unexpectedly with code %s",
+                shard.name, shard.pid, shard.exitcode
+            )
+            directive = loop.run_until_complete(shard.restart_handler.handle_error())
+            if directive.abort:
+                logger.error(
+                    "Worker process '%s' will not be restarted due to restart limitation",
+                    shard.name
+                )
+                return
+            logger.info(
+                "Worker process '%s' will restart in %s seconds", shard.name, directive.wait_for
+            )
+            restart_at[shard.index] = time.monotonic() + directive.wait_for
+
+        # The restart handlers are coroutines: A private loop does not start any threads
+        loop = asyncio.new_event_loop()
+        restart_at = {}  # type: Dict[int, float]
+        terminated, killed = False, False
+        for shard in self._shards:
+            _spawn(shard)
+
+        while True:
+            running = [shard for shard in self._shards if shard.alive]
+            if stopping:
+                restart_at.clear()
+                if not terminated:
+                    terminated = True
+                    for shard in running:
+                        shard.process.terminate()  # Graceful: The worker stops its engine
+                elif not killed and time.monotonic() >= stopping[0]:
+                    killed = True
+                    for shard in running:
+                        logger.warning("Killing worker process '%s'", shard.name)
+                        shard.process.kill()
+            if not running and not restart_at:
+                break
+
+            timeout = None  # type: Optional[float]
+            if stopping and not killed:
+                timeout = max(0.0, stopping[0] - time.monotonic())
+            elif restart_at:
+                timeout = max(0.0, min(restart_at.values()) - time.monotonic())
+            multiprocessing.connection.wait(
+                [shard.process.sentinel for shard in running] + [wakeup_r], timeout
+            )
+
+            for shard in running:
+                if not shard.process.is_alive():
+                    _reap(shard)
+            now = time.monotonic()
+            for shard in self._shards:
+                if not stopping and restart_at.get(shard.index, now + 1) <= now:
+                    del restart_at[shard.index]
+                    shard.restarts += 1
+                    _spawn(shard)
+        loop.close()
+
+    def _run_shard(self, shard: Shard) -> None:
+        """Entrypoint of the worker process."""
+        queue = self._queue
+        _forward_logs(logging.handlers.QueueHandler(queue))
+        # Ctrl+C reaches the whole process group: The parent is in charge to stop the worker
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+        # The loop of the parent is not running in this process: Start a fresh one
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        engine = AsyncEngine(retry_handler=self.retry_handler, **self.engine_args)
+        loop.add_signal_handler(signal.SIGTERM, lambda: loop.create_task(engine.stop()))
+
+        async def _pull_now(name: str) -> None:
+            try:
+                await shard.tasks[name].pull.instance.pull_now()
+            except Exception:  # pylint: disable=broad-except
+                logging.getLogger(__name__).exception(
+                    "Triggering the pull of task '%s' failed", name
+                )
+
+        def _schedule_pull_now(name: str) -> None:
+            loop.create_task(_pull_now(name))
+
+        def _receive_commands() -> None:
+            while True:
+                kind, name = shard.commands.get()
+                if kind == _TRIGGER:
+                    loop.call_soon_threadsafe(_schedule_pull_now, name)
+
+        async def _main() -> None:
+            stopped = asyncio.Event()
+
+            async def _on_stopped() -> None:
+                stopped.set()
+            engine.on_stopped_callback = _on_stopped
+
+            await engine.start(shard.tasks)
+            # Started after the engine: Anything the engine forks does not inherit the thread
+            threading.Thread(
+                target=_receive_commands, name='pnp-shard-commands', daemon=True
+            ).start()
+            while not stopped.is_set():
+                try:
+                    await asyncio.wait_for(stopped.wait(), self.REPORT_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                queue.put((_STATS, shard.index, engine.stats()))
+
+        try:
+            loop.run_until_complete(_main())
+        finally:
+            queue.close()
+            queue.join_thread()  # Make sure everything was sent to the parent
+
+    def _register_metrics(self) -> None:
+        try:
+            from prometheus_client import REGISTRY
+        except ImportError:  # pragma: no cover
+            return
+        self._collector = ShardCollector(self)
+        REGISTRY.register(self._collector)
+
+    def _unregister_metrics(self) -> None:
+        collector, self._collector = self._collector, None
+        if collector is not None:
+            from prometheus_client import REGISTRY
+            REGISTRY.unregister(collector)
+
+
+class ShardCollector:
+    """Exposes the state of the worker processes and the counters of their tasks as prometheus
+    metrics."""
+
+    def __init__(self, engine: ProcessEngine):
+        self.engine = engine
+
+    def collect(self) -> Iterator[Any]:
+        """Called by the prometheus client to collect the metrics."""
+        from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+        up = GaugeMetricFamily(
+            'pnp_shard_up', 'Whether the worker process is running', labels=['shard']
+        )
+        restarts = CounterMetricFamily(
+            'pnp_shard_restarts', 'Restarts of the worker process', labels=['shard']
+        )
+        for shard in self.engine.shards:
+            up.add_metric([shard.name], int(shard.alive))
+            restarts.add_metric([shard.name], shard.restarts)
+        yield up
+        yield restarts
+
+        payloads = CounterMetricFamily(
+            'pnp_task_payloads', 'Payloads emitted by the pull of the task', labels=['task']
+        )
+        failed = CounterMetricFamily(
+            'pnp_task_failed_pushes', 'Failed pushes of the task', labels=['task']
+        )
+        queued = GaugeMetricFamily(
+            'pnp_task_queued', 'Pushes of the task waiting to be executed', labels=['task']
+        )
+        for task, stats in self.engine.stats().items():
+            payloads.add_metric([task], stats.get('payloads', 0))
+            failed.add_metric([task], stats.get('failed', 0))
+            queued.add_metric([task], stats.get('queued', 0))
+        yield payloads
+        yield failed
+        yield queued
@@ -0,0 +1,168 @@
+"""Bounded payload queues to decouple pulls from their pushes."""
+
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Deque, Optional
+
+from pnp.utils import Loggable
+
+# Overflow policy: The producer has to wait until there is some space left in the queue
+OVERFLOW_BLOCK = 'block'
+# Overflow policy: The oldest queued item is discarded to make room for the new one
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+# Overflow policy: The new item is discarded
+OVERFLOW_DROP_NEWEST = 'drop_newest'
+
+OVERFLOW_POLICIES = [OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST]
+
+
+class PayloadQueue(asyncio.Queue, Loggable):  # type: ignore
+    """
+    An `asyncio.Queue` that knows how to handle an overflow. When the queue is full a new item
+    will be rejected (block), replaces the oldest item (drop_oldest) or is discarded
+    (drop_newest).
+
+    Producers on the event loop cannot be blocked: With the `block` policy their items wait in a
+    backlog (of up to `maxsize` items) and move into the queue in order as soon as there is
+    space. Only when the backlog is full as well new items are discarded. Producers in other
+    threads `reserve` space before they hand over their items: Their items count against
+    `maxsize` from the moment the space is reserved and are never discarded.
+
+    Examples:
+
+        >>> async def main():
+        ...     dut = PayloadQueue(maxsize=2, overflow=OVERFLOW_DROP_OLDEST)
+        ...     for i in range(4):
+        ...         dut.offer(i)
+        ...     return [dut.get_nowait() for _ in range(dut.qsize())], dut.dropped
+        >>> asyncio.new_event_loop().run_until_complete(main())
+        ([2, 3], 2)
+        >>> async def main():
+        ...     dut = PayloadQueue(maxsize=2, overflow=OVERFLOW_DROP_NEWEST)
+        ...     return [dut.offer(i) for i in range(3)], dut.dropped
+        >>> asyncio.new_event_loop().run_until_complete(main())
+        ([True, True, False], 1)
+        >>> async def main():
+        ...     dut = PayloadQueue(maxsize=2, overflow=OVERFLOW_BLOCK)
+        ...     offered = [dut.offer(i) for i in range(5)]
+        ...     return offered, dut.in_flight, [await dut.get() for _ in range(4)], dut.dropped
+        >>> asyncio.new_event_loop().run_until_complete(main())
+        ([True, True, True, True, False], 4, [0, 1, 2, 3], 1)
+        >>> async def main():
+        ...     dut = PayloadQueue(maxsize=2, overflow=OVERFLOW_BLOCK)
+        ...     reserved = dut.reserve(2), dut.reserve(1, timeout=0)  # Usually another thread
+        ...     dut.offer(0, reserved=True)
+        ...     return reserved, dut.pending, dut.qsize()
+        >>> asyncio.new_event_loop().run_until_complete(main())
+        ((True, False), 2, 1)
+    """
+
+    # Only every n-th drop is logged
+    DROP_LOG_EVERY = 1000
+
+    def __init__(self, maxsize: int = 0, overflow: str = OVERFLOW_BLOCK):
+        super().__init__(maxsize=maxsize)
+        self.overflow = str(overflow)
+        self.dropped = 0
+        # Items offered while the queue was full (block policy): They are queued in order
+        self._backlog = deque()  # type: Deque[Any]
+        # Space reserved by producers in other threads for items that are not offered yet
+        self._reserved = 0
+        self._space = threading.Condition()
+
+    @property
+    def in_flight(self) -> int:
+        """Returns the number of items that were put into the queue but are not marked as done
+        so far (queued, waiting in the backlog and currently processed ones)."""
+        return int(getattr(self, '_unfinished_tasks')) + len(self._backlog)
+
+    @property
+    def pending(self) -> int:
+        """Returns the number of items waiting to be processed: Queued ones, the ones in the
+        backlog and the ones other threads reserved space for."""
+        return self.qsize() + len(self._backlog) + self._reserved
+
+    def has_space(self) -> bool:
+        """Returns True if an item can be queued right away; otherwise False."""
+        return not self.full() and not self._backlog
+
+    def offer(self, item: Any, reserved: bool = False) -> bool:
+        """
+        Puts the item into the queue without waiting. If the queue is full the overflow policy
+        comes into play.
+
+        Args:
+            item: The item to queue.
+            reserved: Set to True if the producer reserved space for the item (see `reserve`).
+                Such an item is never discarded: It takes its reserved space and goes to the
+                backlog if the queue is full.
+
+        Returns:
+            True if the item was queued (or put into the backlog); otherwise False.
+        """
+        if reserved:
+            with self._space:
+                self._reserved -= 1
+            if not self.has_space():
+                # The reservation already counted the item: The backlog stays within maxsize
+                self._backlog.append(item)
+                return True
+
+        if self.has_space():
+            self.put_nowait(item)
+            return True
+
+        if self.overflow == OVERFLOW_DROP_OLDEST:
+            self.get_nowait()
+            self.task_done()
+            self.put_nowait(item)
+            self._on_drop()
+            return True
+
+        if self.overflow == OVERFLOW_BLOCK and len(self._backlog) < self.maxsize:
+            self._backlog.append(item)  # Older items first: Keeps the order
+            return True
+
+        self._on_drop()
+        return False
+
+    def _get(self) -> Any:
+        item = super()._get()  # type: ignore
+        if self._backlog:
+            self.put_nowait(self._backlog.popleft())
+        else:
+            with self._space:
+                self._space.notify_all()  # Wake up producers waiting in another thread
+        return item
+
+    def reserve(self, count: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks the calling thread until there is space for `count` more items (or the timeout
+        has passed) and reserves it. The items have to be offered with `reserved=True`
+        afterwards. Never call this from the thread that runs the event loop: Nobody would be
+        able to free some space.
+
+        Returns:
+            True if the space was reserved; otherwise False.
+        """
+        def _fits() -> bool:
+            # More items than the queue can hold fit into an empty queue
+            pending = self.pending
+            return self.maxsize <= 0 or pending + count <= self.maxsize or pending == 0
+
+        with self._space:
+            if not self._space.wait_for(_fits, timeout):
+                return False
+            self._reserved += count
+            return True
+
+    def _on_drop(self) -> None:
+        self.dropped += 1
+        if self.dropped % self.DROP_LOG_EVERY != 1 and self.DROP_LOG_EVERY > 1:
+            return  # Do not flood the log when bursting
+        self.logger.warning(
+            "Queue is full (maxsize=%s). Dropped an item due to overflow policy '%s' "
+            "(%s dropped so far)",
+            self.maxsize, self.overflow, self.dropped
+        )
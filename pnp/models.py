@@ -1,7 +1,7 @@
 """Data model."""
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, StrictBool
 
 from pnp.plugins.pull import Pull
 from pnp.plugins.push import Push
@@ -20,6 +20,12 @@ class PullModel(BaseModel):
         arbitrary_types_allowed = True
 
 
+# The push runs in a thread (default) or in a worker process
+EXECUTOR_THREAD = 'thread'
+EXECUTOR_PROCESS = 'process'
+EXECUTORS = [EXECUTOR_THREAD, EXECUTOR_PROCESS]
+
+
 class PushModel(BaseModel):
     """Model representing a push."""
 
@@ -35,6 +41,17 @@ class PushModel(BaseModel):
     # A list of push depdencies
     deps: List['PushModel'] = Field(default_factory=list)
 
+    # Maximum number of payloads processed by the push (and its dependencies) at the same time.
+    # None means unlimited
+    max_concurrency: Optional[int] = None
+
+    # If true payloads are processed one after another in the order they arrive. A selector
+    # expression computes a key: Only payloads with the same key are processed in order
+    ordered: Union[StrictBool, str] = False
+
+    # Where a synchronous push runs: In the thread pool or in a pool of worker processes
+    executor: str = EXECUTOR_THREAD
+
     class Config:
         """Pydantic configuration."""
         arbitrary_types_allowed = True
@@ -2,25 +2,20 @@
 
 import asyncio
 import inspect
-import multiprocessing as proc
+import time
 from abc import abstractmethod
-from datetime import datetime
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Optional, Set
 
-from schedule import Scheduler  # type: ignore
 from typeguard import typechecked
 
 from pnp.plugins import Plugin
-from pnp.shared.async_ import (
-    async_sleep_until_interrupt,
-    run_sync
-)
+from pnp.shared.async_ import ThreadSafeEvent, run_in_thread, run_sync
+from pnp.shared.scheduler import CronSchedule, ScheduledCall, get_scheduler
 from pnp.typing import Payload
 from pnp.utils import (
     parse_duration_literal,
     try_parse_bool,
-    DurationLiteral,
-    sleep_until_interrupt
+    DurationLiteral
 )
 
 
@@ -45,7 +40,7 @@ class Pull(Plugin):
         self._assert_pull_compat()
         self._assert_pull_now_compat()
 
-        self._stopped = proc.Event()
+        self._stopped = ThreadSafeEvent()
         self._callback: Optional[PullCallback] = None
 
     @property
@@ -53,6 +48,11 @@ class Pull(Plugin):
         """Returns True if the pull is considered stopped; otherwise False."""
         return self._stopped.is_set()
 
+    async def wait_stopped(self, timeout: Optional[float] = None) -> bool:
+        """Waits until the pull is stopped or the timeout expired. Returns True if the pull is
+        stopped; otherwise False."""
+        return await self._stopped.async_wait(timeout)
+
     @property
     def can_exit(self) -> bool:
         """Override this property when an exit of the pull can be expected. This
@@ -86,12 +86,14 @@ class Pull(Plugin):
             self._assert_fun_compat('_pull_now')
 
     async def pull(self) -> None:
-        """Performs the actual data pulling."""
+        """Performs the actual data pulling. A sync pull runs for a long time (most probably
+        until it is stopped), so it gets a thread on its own instead of blocking a worker of the
+        shared executor."""
         pull_fun = getattr(self, '_pull')
         if inspect.iscoroutinefunction(pull_fun):
             await pull_fun()
             return
-        await run_sync(pull_fun)
+        await run_in_thread(pull_fun, name='pnp-pull-{}'.format(self.name))
 
     async def pull_now(self) -> None:
         """Performs a pull now. Be careful: Not every pull does support this. Make sure to call
@@ -129,8 +131,8 @@ class SyncPull(Pull):
         self._stopped.set()
 
     def _sleep(self, sleep_time: float = 10) -> None:
-        """Call in subclass to perform some sleeping."""
-        sleep_until_interrupt(sleep_time, lambda: self.stopped, interval=0.5)
+        """Call in subclass to perform some sleeping. Returns early when the pull is stopped."""
+        self._stopped.wait(sleep_time)
 
 
 class AsyncPull(Pull):
@@ -147,10 +149,8 @@ class AsyncPull(Pull):
         self._stopped.set()
 
     async def _sleep(self, sleep_time: float = 10) -> None:
-        """Call in subclass to perform some sleeping."""
-        async def _interrupt() -> bool:
-            return self.stopped
-        await async_sleep_until_interrupt(sleep_time, _interrupt, interval=0.5)
+        """Call in subclass to perform some sleeping. Returns early when the pull is stopped."""
+        await self._stopped.async_wait(sleep_time)
 
 
 class SyncPullNowMixin:
@@ -203,11 +203,13 @@ class Polling(AsyncPull, AsyncPullNowMixin):
                 # ... or a cron-like expression is valid
                 from cronex import CronExpression  # type: ignore
                 self._cron_interval = CronExpression(interval)
+                self._cron_schedule = CronSchedule(self._cron_interval)
                 self.interval = self._cron_interval
                 self.is_cron = True
 
         self._is_running = False
-        self._scheduler: Optional[Scheduler] = None
+        self._scheduled = None  # type: Optional[ScheduledCall]
+        self._runs = set()  # type: Set[asyncio.Future[Any]]
         self._instant_run = try_parse_bool(instant_run, False)
 
     def _assert_polling_compat(self) -> None:
@@ -215,23 +217,20 @@ class Polling(AsyncPull, AsyncPullNowMixin):
         self._assert_fun_compat('_poll')
 
     async def _pull(self) -> None:
-        def _callback() -> None:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                asyncio.ensure_future(self._run_schedule())
-
-        self._scheduler = Scheduler()
-        self._configure_scheduler(self._scheduler, _callback)
+        if self.stopped:
+            return
 
         if self._instant_run:
-            self._scheduler.run_all()
+            self._spawn_run()
+        self._schedule_next(time.time())
 
-        while not self.stopped:
-            self._scheduler.run_pending()
-            await self._sleep(0.5)
+        await self.wait_stopped()
 
-        while self._is_running:  # Keep the loop alive until the job is finished
-            await asyncio.sleep(0.1)
+        call, self._scheduled = self._scheduled, None
+        if call is not None:
+            call.cancel()
+        if self._runs:  # Keep the loop alive until the job is finished
+            await asyncio.wait(list(self._runs))
 
     async def _pull_now(self) -> None:
         await self._run_now()
@@ -255,43 +254,54 @@ class Polling(AsyncPull, AsyncPullNowMixin):
 
     async def _run_schedule(self) -> None:
         try:
-            if self.is_cron:
-                dtime = datetime.now()
-                if not self._cron_interval.check_trigger((
-                        dtime.year, dtime.month, dtime.day,
-                        dtime.hour, dtime.minute
-                )):
-                    return  # It is not the time for the cron to trigger
-
             await self._run_now()
         except StopPollingError:
             await self._stop()
         except Exception:  # pragma: no cover, pylint: disable=broad-except
             self.logger.exception("Polling of '%s' failed", self.name)
 
-    def _configure_scheduler(self, scheduler: Scheduler, callback: Callable[[], None]) -> None:
+    def _next_run(self, last: float) -> Optional[float]:
         """
-        Configures the scheduler. You have to differ between "normal" intervals and
-        cron like expressions by checking `self.is_cron`.
+        Returns the point in time (unix timestamp) of the next scheduled poll after `last`. You
+        have to differ between "normal" intervals and cron like expressions by checking
+        `self.is_cron`.
 
-        Override in subclasses to fir the behaviour to your needs.
+        Override in subclasses to fit the behaviour to your needs.
 
         Args:
-            scheduler (schedule.Scheduler): The actual scheduler.
-            callback (callable): The callback to call when the time is right.
+            last (float): The point in time of the last scheduled poll (or the start).
 
         Returns:
-            None
+            The point in time of the next poll or None if the poll is not scheduled at all.
         """
         if self.is_cron:
-            # Scheduler always executes at the exact minute to check for cron triggering
-            scheduler.every().minute.at(":00").do(callback)
-        else:
-            # Only activate when an interval is specified
-            # If not the only way is to trigger the poll by the api `trigger` endpoint
-            if self._poll_interval:
-                # Scheduler executes every interval seconds to execute the poll
-                scheduler.every(self._poll_interval).seconds.do(callback)
+            return self._cron_schedule.next_fire(last)
+        # Only activate when an interval is specified
+        # If not the only way is to trigger the poll by the api `trigger` endpoint
+        if not self._poll_interval:
+            return None
+        due = last + self._poll_interval
+        now = time.time()
+        if due <= now:
+            # We are behind the schedule (e.g. the loop was blocked): Do not catch up
+            due = now + self._poll_interval
+        return due
+
+    def _schedule_next(self, last: float) -> None:
+        due = self._next_run(last)
+        if due is None or self.stopped:
+            self._scheduled = None
+            return
+        self._scheduled = get_scheduler().call_at(due, self._on_due, due)
+
+    def _on_due(self, due: float) -> None:
+        self._schedule_next(due)
+        self._spawn_run()
+
+    def _spawn_run(self) -> None:
+        run = asyncio.ensure_future(self._run_schedule())
+        self._runs.add(run)
+        run.add_done_callback(self._runs.discard)
 
     async def poll(self) -> Payload:
         """Performs polling."""
@@ -1,11 +1,9 @@
 """Home assistant related plugins."""
 
 import asyncio
-import json
-
-import asyncws
 
 from pnp.plugins.pull import AsyncPull
+from pnp.shared.hass import HassWebsocket, websocket_url
 from pnp.utils import make_list, include_or_exclude, wildcards_to_regex
 
 
@@ -36,10 +34,7 @@ class State(AsyncPull):
 
     @staticmethod
     def _sanitize_url(url):
-        res = str(url).replace('https://', 'wss://').replace('http://', 'ws://')
-        if res.endswith('/'):
-            return res[:-1]  # Remove last /
-        return res
+        return websocket_url(url)
 
     @staticmethod
     def _layout_message(message):
@@ -62,40 +57,8 @@ class State(AsyncPull):
             self.notify(payload)
 
     async def _receive_states(self):
-        self._websocket = await asyncws.connect('{self.url}/api/websocket'.format(**locals()))
-
-        while True:
-            message = await self._websocket.recv()
-            if message is None:
-                await self._websocket.close()
-                self._websocket = None
-                break
-            message = json.loads(message)
-            if message.get('type', '') == 'auth_required':
-                hass_version = message.get('ha_version')
-                self.logger.info(
-                    "Connected to Home Assistant %s websocket @ %s",
-                    hass_version, self.url
-                )
-                self.logger.debug("Authentication is required. Providing token")
-                await self._websocket.send(json.dumps({
-                    'type': 'auth',
-                    'access_token': self.token
-                }))
-            elif message.get('type', '') == 'auth_ok':
-                self.logger.info("Authentication is valid")
-                await self._websocket.send(json.dumps(
-                    {'id': 1, 'type': 'subscribe_events', 'event_type': 'state_changed'}
-                ))
-            elif message.get('type', '') == 'auth_invalid':
-                self.logger.info("Authentication is invalid. Aborting...")
-                await self._websocket.close()
-            elif message.get('type', '') == 'result':
-                pass
-            elif message.get('type', '') == 'event':
-                await self._emit(message)
-            else:
-                self.logger.warning("Got unexpected message '%s'", message)
+        self._websocket = HassWebsocket(self.url, self.token)
+        await self._websocket.listen(self._emit)
 
     async def _stop(self):
         await super()._stop()
@@ -1,6 +1,5 @@
 """Http related plugins."""
 
-import asyncio
 from typing import Union, Iterable, Any
 
 from pnp import validator
@@ -73,5 +72,4 @@ class Server(AsyncPull):
             callback=self._incoming
         ).attach(restapi.fastapi)
 
-        while not self.stopped:
-            await asyncio.sleep(0.1)
+        await self.wait_stopped()
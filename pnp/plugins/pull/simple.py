@@ -1,11 +1,12 @@
 """Simple pull plugins"""
 
 import sys
-from datetime import datetime
+import time
 
 from pnp import validator
 from pnp.config import load_pull_from_snippet
 from pnp.plugins.pull import AsyncPull, AsyncPullNowMixin, SyncPolling
+from pnp.shared.scheduler import CronSchedule
 from pnp.typing import Payload
 from pnp.utils import make_list, parse_duration_literal_float
 
@@ -62,15 +63,18 @@ class Cron(SyncPolling):
 
         from cronex import CronExpression
         self.jobs = [CronExpression(expression) for expression in self.expressions]
+        self._schedules = [CronSchedule(job) for job in self.jobs]
 
-    def _configure_scheduler(self, scheduler, callback):
-        scheduler.every().minute.at(":00").do(callback)
+    def _next_run(self, last):
+        # Wake up for the earliest trigger of all expressions
+        fire_times = [schedule.next_fire(last) for schedule in self._schedules]
+        return min((due for due in fire_times if due is not None), default=None)
 
     def _poll(self):
-        for job in self.jobs:
-            dtime = datetime.now()
-            if job.check_trigger((dtime.year, dtime.month, dtime.day, dtime.hour, dtime.minute)):
-                self.notify(job.comment)
+        now = time.time()
+        for schedule in self._schedules:
+            if schedule.fires_at(now):
+                self.notify(schedule.comment)
 
     async def _pull_now(self) -> None:
         for job in self.jobs:
@@ -1,7 +1,6 @@
 """Base stuff for pushes."""
 
 import asyncio
-import copy
 import functools
 import inspect
 from abc import abstractmethod
@@ -12,6 +11,7 @@ from pnp import validator
 from pnp.plugins import Plugin
 from pnp.shared.async_ import run_sync
 from pnp.typing import Envelope, Payload
+from pnp.utils import DurationLiteral, parse_duration_literal_float
 
 # Push function typing alias
 PushFunction = Union[Callable[..., Payload], Callable[..., Awaitable[Payload]]]
@@ -30,7 +30,6 @@ def enveloped(
     validator.is_function(fun=fun)
 
     def _call(self: 'Push', payload: Payload) -> Payload:
-        validator.is_instance(Push, self=self)
         envelope, real_payload = self.envelope_payload(payload)
         return fun(
             self,
@@ -49,28 +48,34 @@ def enveloped(
 
 def parse_envelope(value: str) -> PushFunction:
     """Decorator the parse the given value-key from the envelope. This is but a convenience
-    decorator / wrapper for `_parse_envelope_value` of the `PushBase` class."""
+    decorator / wrapper for `_parse_envelope_value` of the `PushBase` class.
+
+    Stacked `parse_envelope` decorators are merged into a single wrapper that parses all
+    values at once and calls the decorated function directly."""
 
     validator.is_instance(str, value=value)
 
     def _inner(fun: PushFunction) -> PushFunction:
         validator.is_function(fun=fun)
 
+        # functools.wraps copies the marker as well: Only merge with an actual parse_envelope
+        merged = getattr(fun, '__parse_envelope__', None)
+        if merged is not None and merged[0] is fun:
+            _, target, values = merged
+            values = (value,) + values
+        else:
+            target, values = fun, (value,)
+
         def _call(
                 self: 'Push', envelope: Optional[Envelope] = None, payload: Payload = None,
                 **kwargs: Any
         ) -> Payload:
-            validator.is_instance(Push, self=self)
-            parsed = self._parse_envelope_value(value, envelope=envelope)
-
-            new_kwargs = {
-                value: parsed,
-                'payload': payload
-            }
+            new_kwargs = {name: self._envelope_value(name, envelope) for name in values}
+            new_kwargs['payload'] = payload
             if envelope is not None:
                 new_kwargs['envelope'] = envelope
 
-            return fun(self, **{**new_kwargs, **kwargs})
+            return target(self, **{**new_kwargs, **kwargs})
 
         if asyncio.iscoroutinefunction(fun):
             @functools.wraps(fun)
@@ -79,9 +84,11 @@ def parse_envelope(value: str) -> PushFunction:
                     **kwargs: Any
             ) -> Payload:
                 return await _call(self, envelope, payload, **kwargs)
-            return _wrapper
+        else:
+            _wrapper = functools.wraps(fun)(_call)  # type: ignore
 
-        return functools.wraps(fun)(_call)
+        _wrapper.__parse_envelope__ = (_wrapper, target, values)  # type: ignore
+        return _wrapper
     return _inner
 
 
@@ -90,7 +97,6 @@ def drop_envelope(fun: PushFunction) -> PushFunction:
     make the linter happy again if necessary (unused-argument)."""
 
     def _call(self: 'Push', *args: Any, **kwargs: Any) -> Any:
-        validator.is_instance(Push, self=self)
         kwargs.pop('envelope', None)
         return fun(self, *args, **kwargs)
 
@@ -103,6 +109,27 @@ def drop_envelope(fun: PushFunction) -> PushFunction:
     return functools.wraps(fun)(_call)
 
 
+@functools.lru_cache(maxsize=None)
+def _attr_lookups(cls: type, name: str) -> Tuple[str, ...]:
+    """
+    Returns the attribute names to probe on instances of `cls` for the given name: The public,
+    protected and private variants including the name mangled private one.
+
+    Examples:
+
+        >>> class Foo:
+        ...     pass
+        >>> _attr_lookups(Foo, 'a')
+        ('a', '_a', '__a', '_Foo__a')
+        >>> _attr_lookups(Foo, '_a')
+        ('_a', 'a', '__a', '_Foo__a')
+    """
+    lookups = cast(List[str], utils.make_public_protected_private_attr_lookup(name))
+    privates = ['_{classname}{attrname}'.format(classname=cls.__name__, attrname=x)
+                for x in lookups if x.startswith('__') and not x.endswith('__')]
+    return tuple(lookups + privates)
+
+
 def _lookup(instance: object, lookups: Union[str, Iterable[str]]) -> Optional[Any]:
     """
     Will lookup the instance for the given attribute names in `lookups`.
@@ -155,11 +182,48 @@ class Push(Plugin):
     def __init__(self, **kwargs: Any) -> None:
         super().__init__(**kwargs)
         self._assert_push_compat()
+        # Envelope key -> (found attribute name, attribute lookups, parse function)
+        self._envelope_keys = {}  # type: Dict[str, Tuple[Optional[str], Tuple[str, ...], Any]]
 
     def _assert_push_compat(self) -> None:
         self._assert_abstract_compat((SyncPush, AsyncPush))
         self._assert_fun_compat('_push')
 
+    def _envelope_key(self, name: str) -> Tuple[Optional[str], Tuple[str, ...], Any]:
+        """Resolves the instance attribute and the `parse_<name>` function of the envelope key
+        once and remembers them for every subsequent payload."""
+        key = self._envelope_keys.get(name)
+        if key is None:
+            lookups = _attr_lookups(type(self), name)
+            attr = next((lookup for lookup in lookups if hasattr(self, lookup)), None)
+            public = cast(
+                Dict[str, str], utils.make_public_protected_private_attr_lookup(name, as_dict=True)
+            )['public']
+            parse_fun = _lookup(self, _attr_lookups(type(self), 'parse_' + public))
+            key = self._envelope_keys[name] = (attr, lookups, parse_fun)
+        return key
+
+    def _instance_value(self, name: str) -> Any:
+        attr, lookups, _ = self._envelope_key(name)
+        if attr is not None:
+            return getattr(self, attr, None)
+        return _lookup(self, lookups)  # The attribute might be set later on
+
+    def _envelope_value(self, name: str, envelope: Optional[Envelope]) -> Any:
+        """Fast path of `_parse_envelope_value` without custom parse / lookup functions."""
+        if envelope is None or name not in envelope:
+            return self._instance_value(name)
+
+        val = envelope[name]
+        parse_fun = self._envelope_key(name)[2]
+        if parse_fun is None:
+            return val
+        try:
+            return parse_fun(val)
+        except (ValueError, TypeError):
+            self.logger.exception("Cannot parse value for '%s' from envelope", name)
+            return self._instance_value(name)
+
     def _parse_envelope_value(
             self, name: str, envelope: Optional[Envelope] = None,
             parse_fun: Optional[Callable[[Any], Any]] = None,
@@ -191,24 +255,20 @@ class Push(Plugin):
         if instance_lookup_fun:
             validator.is_function(instance_lookup_fun=instance_lookup_fun)
 
-        lookups = cast(
-            Dict[str, str], utils.make_public_protected_private_attr_lookup(name, as_dict=True)
-        )
+        if parse_fun is None and instance_lookup_fun is None:
+            return self._envelope_value(name, envelope)
 
         if envelope is None or name not in envelope:
             return (
                 instance_lookup_fun(name)
                 if instance_lookup_fun is not None
-                else _lookup(self, list(lookups.values()))  # pylint: disable=no-member
+                else self._instance_value(name)
             )
 
         val = envelope[name]
         try:
             if parse_fun is None:
-                public_attr_name = lookups['public']  # pylint: disable=invalid-sequence-index
-                fun_base = 'parse_' + public_attr_name
-                parse_fun_names = utils.make_public_protected_private_attr_lookup(fun_base)
-                parse_fun = _lookup(self, parse_fun_names)
+                parse_fun = self._envelope_key(name)[2]
                 if parse_fun is None:
                     return val
             return parse_fun(val)
@@ -220,7 +280,7 @@ class Push(Plugin):
             return (
                 instance_lookup_fun(name)
                 if instance_lookup_fun is not None
-                else _lookup(self, list(lookups.values()))  # pylint: disable=no-member
+                else self._instance_value(name)
             )
 
     @staticmethod
@@ -249,20 +309,20 @@ class Push(Plugin):
             >>> SyncPush.envelope_payload({'envelope1': 'envelope', 'payload': 1234})
             ({'envelope1': 'envelope'}, 1234)
         """
-        payload = copy.deepcopy(payload)
-
+        # The payload is shared with other pushes: Do not change it, but build the envelope
         if not isinstance(payload, dict):
             return {}, payload
 
         if 'data' in payload:
-            real_payload = payload.pop('data')
+            key = 'data'
         elif 'payload' in payload:
-            real_payload = payload.pop('payload')
+            key = 'payload'
         else:
             return {}, payload  # There is no envelope
 
-        # We popped the real payload -> all what is left in payload is the envelope
-        return payload, real_payload
+        # All other keys besides the real payload are the envelope
+        envelope = {name: val for name, val in payload.items() if name != key}
+        return envelope, payload[key]
 
     async def push(self, payload: Payload) -> Payload:
         """Transforms the payload and/or pushes it to a sink."""
@@ -271,6 +331,18 @@ class Push(Plugin):
             return await push_fun(payload)
         return await run_sync(push_fun, payload)
 
+    async def stop(self) -> None:
+        """Is called by the engine when it stops (after all pending payloads were pushed).
+        Pushes that hold resources or buffer payloads may implement a `_stop` method to release
+        or flush them."""
+        stop_fun = getattr(self, '_stop', None)
+        if stop_fun is None:
+            return
+        if inspect.iscoroutinefunction(stop_fun):
+            await stop_fun()
+            return
+        await run_sync(stop_fun)
+
 
 class SyncPush(Push):
     """Base class for all synchronous push plugins."""
@@ -298,3 +370,104 @@ class AsyncPush(Push):
             payload: The payload.
         """
         raise NotImplementedError()  # pragma: no cover
+
+
+class BatchPush(AsyncPush):
+    """
+    Base class for pushes that write multiple payloads at once. Payloads are buffered and
+    handed over to `_push_batch` when `batch_size` payloads are buffered or the oldest buffered
+    payload waits for `batch_interval` (whatever comes first). Pending payloads are flushed when
+    the engine stops.
+
+    The push itself returns the payload as is, so dependent pushes are triggered right away and
+    do not wait for the batch to be written. A failed write is logged and does not fail the push
+    that filled the batch: Implementations may keep the payloads for the next batch.
+
+    Examples:
+
+        >>> import asyncio
+        >>> class Collect(BatchPush):
+        ...     def _push_batch(self, payloads):
+        ...         print(payloads)
+        >>> async def main():
+        ...     dut = Collect(name='doctest', batch_size=2)
+        ...     for i in range(3):
+        ...         await dut.push(i)
+        ...     await dut.stop()
+        >>> asyncio.new_event_loop().run_until_complete(main())
+        [0, 1]
+        [2]
+    """
+    __REPR_FIELDS__ = ['batch_size', 'batch_interval']
+
+    def __init__(
+            self, batch_size: int = 100, batch_interval: DurationLiteral = 1.0, **kwargs: Any
+    ):
+        """
+        Initializer.
+
+        Args:
+            batch_size: The maximum number of payloads to write at once.
+            batch_interval: The maximum time (duration literal) a payload is buffered before it
+                is written.
+        """
+        super().__init__(**kwargs)
+        self.batch_size = max(1, int(batch_size))
+        self.batch_interval = parse_duration_literal_float(batch_interval)
+        self._batch = []  # type: List[Payload]
+        self._timer = None  # type: Optional[asyncio.Future[Any]]
+        self._flush_lock = None  # type: Optional[asyncio.Lock]
+
+    async def _push(self, payload: Payload) -> Payload:
+        self._batch.append(payload)
+        if len(self._batch) >= self.batch_size:
+            # The batch is not the payload of this push: A failed write must not fail it
+            await self._flush_logged()
+        elif self._timer is None:
+            self._timer = asyncio.ensure_future(self._flush_later())
+        return payload
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.batch_interval)
+        self._timer = None
+        await self._flush_logged()
+
+    async def _flush_logged(self) -> None:
+        try:
+            await self.flush()
+        except Exception:  # pylint: disable=broad-except
+            self.logger.exception("Writing the batch failed")
+
+    async def flush(self) -> None:
+        """Writes the buffered payloads (if any) by calling `_push_batch`."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flush_lock is None:
+            # Created lazily to bind it to the running event loop
+            self._flush_lock = asyncio.Lock()
+
+        # Batches are written one after another to preserve the order of the payloads
+        async with self._flush_lock:
+            batch, self._batch = self._batch, []
+            if not batch:
+                return
+            self.logger.debug("Writing a batch of %s payloads", len(batch))
+            push_batch_fun = getattr(self, '_push_batch')
+            if inspect.iscoroutinefunction(push_batch_fun):
+                await push_batch_fun(batch)
+            else:
+                await run_sync(push_batch_fun, batch)
+
+    async def _stop(self) -> None:
+        await self.flush()
+
+    @abstractmethod
+    def _push_batch(self, payloads: List[Payload]) -> None:
+        """
+        Writes the given payloads at once. You may implement this as a coroutine as well.
+
+        Args:
+            payloads: The buffered payloads (in order of arrival).
+        """
+        raise NotImplementedError()  # pragma: no cover
@@ -1,10 +1,10 @@
 """Home assistant related push plugins"""
 
-from pnp.plugins.push import SyncPush
+from pnp.plugins.push import AsyncPush
 from pnp.shared.hass import HassApi
 
 
-class Service(SyncPush):
+class Service(AsyncPush):
     """
     Calls a home assistant service providing the payload as service-data.
 
@@ -14,7 +14,7 @@ class Service(SyncPush):
 
     __REPR_FIELDS__ = ['domain', 'service', 'timeout', 'url']
 
-    def __init__(self, url, token, domain, service, timeout=10, **kwargs):
+    def __init__(self, url, token, domain, service, timeout=10, pool_size=10, **kwargs):
         super().__init__(**kwargs)
         self.url = str(url)
         self.token = str(token)
@@ -23,16 +23,16 @@ class Service(SyncPush):
         self.timeout = timeout and int(timeout)
         if self.timeout <= 0:
             self.timeout = None  # Basically means no timeout
-        self._client = HassApi(self.url, self.token, self.timeout)
+        self._client = HassApi(self.url, self.token, self.timeout, pool_size=int(pool_size))
 
-    def _call(self, data):
+    async def _call(self, data):
         endpoint = 'services/{domain}/{service}'.format(
             domain=self.domain,
             service=self.service
         )
 
         try:
-            return self._client.call(endpoint, method='post', data=data)
+            return await self._client.async_call(endpoint, method='post', data=data)
         except RuntimeError as exc:
             raise RuntimeError(
                 "Failed to call the service {endpoint} @ {url}".format(
@@ -41,6 +41,9 @@ class Service(SyncPush):
                 )
             ) from exc
 
-    def _push(self, payload):
-        self._call(payload)
+    async def _push(self, payload):
+        await self._call(payload)
         return payload
+
+    async def _stop(self):
+        await self._client.close()
@@ -1,29 +1,44 @@
 """Http related push plugins."""
 
+import asyncio
 import json
 
-import requests
+import aiohttp
 
 from pnp import utils, validator
-from pnp.plugins.push import SyncPush, PushExecutionError, enveloped, parse_envelope
+from pnp.plugins.push import AsyncPush, PushExecutionError, enveloped, parse_envelope
+from pnp.shared.http import SESSIONS, origin
 
 
-class Call(SyncPush):
+class Call(AsyncPush):
     """
     Makes a request to a http resource.
 
+    Requests to the same host share a keep-alive session. At most `max_concurrency` requests
+    per host are issued by this push at the same time.
+
     See Also:
         https://github.com/HazardDede/pnp/blob/master/docs/plugins/push/http.Call/index.md
 
     """
-    __REPR_FIELDS__ = ['fail_on_error', 'method', 'provide_response', 'url']
+    __REPR_FIELDS__ = [
+        'fail_on_error', 'max_concurrency', 'method', 'provide_response', 'timeout', 'url'
+    ]
 
-    def __init__(self, url, method='GET', fail_on_error=False, provide_response=False, **kwargs):
+    def __init__(
+            self, url, method='GET', fail_on_error=False, provide_response=False, timeout=None,
+            max_concurrency=100, **kwargs
+    ):
         super().__init__(**kwargs)
         self.url = self._parse_url(url)
         self.method = self._parse_method(method)
         self.fail_on_error = self._parse_fail_on_error(fail_on_error)
         self.provide_response = bool(provide_response)
+        self.timeout = timeout and utils.parse_duration_literal_float(timeout)
+        if not self.timeout or self.timeout <= 0:
+            self.timeout = None  # Basically means no timeout
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._limits = {}  # Host -> semaphore
 
     @staticmethod
     def _parse_url(val):
@@ -39,30 +54,50 @@ class Call(SyncPush):
     def _parse_fail_on_error(val):
         return utils.try_parse_bool(val)
 
+    def _limit(self, url):
+        host = origin(url)
+        limit = self._limits.get(host)
+        if limit is None:
+            limit = asyncio.Semaphore(self.max_concurrency)
+            self._limits[host] = limit
+        return limit
+
     @enveloped
     @parse_envelope('url')
     @parse_envelope('method')
     @parse_envelope('fail_on_error')
-    def _push(self, url, method, fail_on_error, envelope, payload):  # pylint: disable=arguments-differ
+    async def _push(self, url, method, fail_on_error, envelope, payload):  # pylint: disable=arguments-differ
         if isinstance(payload, (dict, list, tuple)):
             try:
                 payload = json.dumps(payload)
             except:  # pylint: disable=bare-except
                 pass
-        resp = requests.request(method, url, data=str(payload))
-        if fail_on_error and not 200 <= resp.status_code <= 299:
-            raise PushExecutionError(
-                "{method} of '{url}' failed with status code = '{status_code}'".format(
-                    method=method,
-                    url=url,
-                    status_code=resp.status_code
-                )
-            )
-        if not self.provide_response:
-            return {'data': payload, **envelope} if envelope else payload
+
+        async with self._limit(url):
+            async with SESSIONS.get(url).request(
+                    method, url, data=str(payload),
+                    timeout=aiohttp.ClientTimeout(total=self.timeout)
+            ) as resp:
+                status_code = resp.status
+                if fail_on_error and not 200 <= status_code <= 299:
+                    raise PushExecutionError(
+                        "{method} of '{url}' failed with status code = '{status_code}'".format(
+                            method=method,
+                            url=url,
+                            status_code=status_code
+                        )
+                    )
+                if not self.provide_response:
+                    return {'data': payload, **envelope} if envelope else payload
+                text = await resp.text()
 
         try:
-            return dict(status_code=resp.status_code, is_json=True, data=resp.json())
+            return dict(status_code=status_code, is_json=True, data=json.loads(text))
         except ValueError:
             # No valid json, try text
-            return dict(status_code=resp.status_code, is_json=False, data=resp.text)
+            return dict(status_code=status_code, is_json=False, data=text)
+
+    async def _stop(self):
+        if not self._limits:
+            return  # Never called: Closing no hosts would close all sessions of the loop
+        await SESSIONS.close(*self._limits)
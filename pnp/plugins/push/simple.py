@@ -1,12 +1,11 @@
 """Basic push plugins."""
 
-from functools import partial
-from typing import Union, Any
+from typing import Any, Dict, List, Union
 
 from pnp import validator
-from pnp.plugins.push import enveloped, SyncPush, AsyncPush
-from pnp.shared.exc import TemplateError
-from pnp.utils import parse_duration_literal, make_list, parse_duration_literal_float
+from pnp.plugins.push import enveloped, AsyncPush, PushExecutionError
+from pnp.shared.templates import TEMPLATES, render
+from pnp.utils import make_list, parse_duration_literal_float
 
 
 class Echo(AsyncPush):
@@ -76,16 +75,23 @@ class Wait(AsyncPush):
         return payload
 
 
-class Execute(SyncPush):
+class Execute(AsyncPush):
     """
     Executes a command with given arguments in a shell of the operating system.
     Both `command` and `args` may include placeholders (e.g. `{{placeholder}}`) which are injected
     at runtime by passing the specified payload after selector transformation.
 
+    The command runs as an asyncio subprocess: Its output is consumed while it runs, a command
+    that exceeds the `timeout` (or fails otherwise) is killed. Use the `max_concurrency` setting
+    of the push to limit the number of commands running at the same time.
+
     Will return the exit code of the command and optionally the output from stdout and stderr.
     """
     __REPR_FIELDS__ = ['_args', '_capture', '_command', '_cwd', '_timeout']
 
+    # Output is read in chunks of this size: Lines may be of any length
+    READ_CHUNK_SIZE = 2 ** 16
+
     def __init__(self, command, args=None, cwd=None, capture=True, timeout="5s", **kwargs):
         super().__init__(**kwargs)
         self._command = str(command) if command else None
@@ -94,18 +100,10 @@ class Execute(SyncPush):
         if self._cwd:
             validator.is_directory(cwd=self._cwd)
         self._capture = bool(capture)
-        self._timeout = timeout and parse_duration_literal(timeout)
-
-    @staticmethod
-    def _render_jinja_template(template, subs):
-        from jinja2 import StrictUndefined
-        from jinja2 import Template
-        from jinja2.exceptions import UndefinedError
-        try:
-            tpl = Template(template, undefined=StrictUndefined)
-            return tpl.render(**(subs or {}))
-        except UndefinedError as exc:
-            raise TemplateError('Error when rendering template in TemplatedExecute') from exc
+        self._timeout = timeout and parse_duration_literal_float(timeout)
+        # The templates are compiled once and rendered for each payload
+        self._command_tpl = TEMPLATES.get(self._command or "")
+        self._args_tpl = [TEMPLATES.get(arg) for arg in self._args or []]
 
     @staticmethod
     def _parse_args(val):
@@ -114,7 +112,7 @@ class Execute(SyncPush):
             return None
         return [str(arg) for arg in args]
 
-    def _serialize_args(self, transform_fun=None, add_quotes=True):
+    def _serialize_args(self, subs, add_quotes=True):
         def escape_fun(arg):
             return str(arg).replace('"', '\\"')
 
@@ -123,56 +121,94 @@ class Execute(SyncPush):
                 return ''
             return '"{}"'.format(escape_fun(arg)) if add_quotes else str(arg)
 
-        args = self._args
-        if not args:
+        if not self._args_tpl:
             return None
-        if transform_fun:
-            args = [transform_fun(arg) for arg in args]
+        args = [render(arg, subs) for arg in self._args_tpl]
         # Do argument quoting
         args = [quotes_fun(arg) for arg in args]
         # Remove empty args
         args = [arg for arg in args if arg != '']
         return " ".join(args)
 
-    def _execute(self, command_str):
-        def _output(response):
-            return [line.strip('\n\r') for line in response]
+    def _add_line(self, name, line, lines):
+        line = line.decode(errors='replace').strip('\n\r')
+        self.logger.debug("[%s] %s", name, line)
+        lines.append(line)
+
+    async def _read_lines(self, stream, name, lines):
+        # Not readline(): It fails on lines exceeding the limit of the stream (64 KiB)
+        pending = bytearray()
+        while True:
+            chunk = await stream.read(self.READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            pending.extend(chunk)
+            *complete, rest = pending.split(b'\n')
+            for line in complete:
+                self._add_line(name, line, lines)
+            pending = rest
+        if pending:
+            self._add_line(name, pending, lines)
+
+    @staticmethod
+    def _kill(proc):
+        import os
+        import signal
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (AttributeError, ProcessLookupError):  # No process groups (windows) or gone
+            proc.kill()
+
+    async def _execute(self, command_str):
+        import asyncio
+        from asyncio.subprocess import PIPE, DEVNULL
 
-        import subprocess
         self.logger.info("Running command in shell: %s", command_str)
-        proc = subprocess.Popen(
-            args=command_str,
-            shell=True,
-            cwd=self._cwd,
-            universal_newlines=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+        output = PIPE if self._capture else DEVNULL
+        proc = await asyncio.create_subprocess_shell(
+            command_str, cwd=self._cwd, stdout=output, stderr=output,
+            # The shell and anything it spawns get a process group on their own: A timed out
+            # command is killed as a whole
+            start_new_session=True
         )
+
+        stdout = []  # type: List[str]
+        stderr = []  # type: List[str]
+        streams = []
+        if self._capture:
+            # Consume the output while the command is running: A full pipe would block it
+            streams = [
+                self._read_lines(proc.stdout, 'stdout', stdout),
+                self._read_lines(proc.stderr, 'stderr', stderr)
+            ]
         try:
-            if self._timeout:
-                proc.wait(timeout=int(self._timeout))
-
-            res = dict(return_code=proc.returncode)
-            if self._capture:
-                res['stdout'] = _output(proc.stdout)
-                res['stderr'] = _output(proc.stderr)
-            return res
+            await asyncio.wait_for(asyncio.gather(*streams, proc.wait()), self._timeout or None)
+        except asyncio.TimeoutError:
+            raise PushExecutionError(
+                "Command '{command_str}' did not finish within {timeout} seconds and was "
+                "killed".format(command_str=command_str, timeout=self._timeout)
+            ) from None
         finally:
-            proc.stdout.close()
-            proc.stderr.close()
+            if proc.returncode is None:
+                # Timed out, cancelled or reading the output failed: Do not leave it behind
+                self._kill(proc)
+                await proc.wait()
+
+        res = dict(return_code=proc.returncode)  # type: Dict[str, Any]
+        if self._capture:
+            res['stdout'] = stdout
+            res['stderr'] = stderr
+        return res
 
-    def _push(self, payload):
+    async def _push(self, payload):
         if isinstance(payload, dict):
             subs = payload
         else:
             subs = dict(data=payload, payload=payload)
 
-        command_str = self._render_jinja_template(self._command, subs=subs)
+        command_str = render(self._command_tpl, subs)
         if self._args:
-            args = self._serialize_args(
-                transform_fun=partial(self._render_jinja_template, subs=subs),
-                add_quotes=True
-            )
+            args = self._serialize_args(subs, add_quotes=True)
             command_str = "{command_str} {args}".format(command_str=command_str, args=args)
 
-        return self._execute(command_str)
+        return await self._execute(command_str)
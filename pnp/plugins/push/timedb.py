@@ -1,9 +1,123 @@
 """Time database related push plugins."""
 
-from pnp.plugins.push import SyncPush, enveloped
+import re
+import string
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+from pnp.plugins.push import BatchPush
+from pnp.typing import Payload
 
-class InfluxPush(SyncPush):
+# Renders a line protocol point out of the payload
+ProtocolTemplate = Callable[[Payload], str]
+
+
+# An accessor of a replacement field: `.name` (attribute) or `[key]` (item)
+_ACCESSOR = re.compile(r'\.([^.[]+)|\[([^\]]+)\]')
+
+
+def _split_field_name(field_name: str) -> Tuple[str, List[Tuple[bool, Any]]]:
+    """
+    Splits the field name of a replacement field into the name of the field and its accessors
+    (is attribute, key) the same way `str.format` does. Digit-only item keys are integers.
+
+    Examples:
+
+        >>> _split_field_name("payload.levels[0][room].name")
+        ('payload', [(True, 'levels'), (False, 0), (False, 'room'), (True, 'name')])
+        >>> _split_field_name("payload[0")
+        Traceback (most recent call last):
+        ...
+        ValueError: Invalid replacement field 'payload[0' in the protocol template
+    """
+    first = re.split(r'[.[]', field_name, maxsplit=1)[0]
+    accessors = []  # type: List[Tuple[bool, Any]]
+    pos = len(first)
+    while pos < len(field_name):
+        match = _ACCESSOR.match(field_name, pos)
+        if match is None:
+            raise ValueError(
+                "Invalid replacement field '{}' in the protocol template".format(field_name)
+            )
+        attr, key = match.groups()
+        if attr is not None:
+            accessors.append((True, attr))
+        else:
+            accessors.append((False, int(key) if key.isdigit() else key))
+        pos = match.end()
+    return first, accessors
+
+
+def _lookup_field(obj: Any, is_attr: bool, key: Any) -> Any:
+    if is_attr:
+        try:
+            return getattr(obj, key)
+        except AttributeError:
+            # Allows {payload.key} for dictionaries as well
+            if not isinstance(obj, Mapping) or key not in obj:
+                raise
+            return obj[key]
+    return obj[key]
+
+
+def compile_protocol(protocol: str) -> ProtocolTemplate:
+    """
+    Parses the line protocol template once and returns a function that renders it for a given
+    payload. The template follows the `str.format` syntax with `payload` being the only
+    available field. Attribute access falls back to item access for dictionaries.
+
+    Examples:
+
+        >>> fun = compile_protocol("{payload.metric},room={payload.room} value={payload.value:.1f}")
+        >>> fun({'metric': 'temp', 'room': 'living', 'value': 21})
+        'temp,room=living value=21.0'
+        >>> compile_protocol("{payload[levels][1]} value={payload.payload!r}")(
+        ...     {'levels': ['home', 'living'], 'payload': 'on'})
+        "living value='on'"
+        >>> compile_protocol("{value}")
+        Traceback (most recent call last):
+        ...
+        ValueError: Only the field 'payload' is allowed in the protocol template, but got 'value'
+    """
+    protocol = str(protocol)
+    parts = []  # type: List[Any]
+    for literal, field_name, format_spec, conversion in string.Formatter().parse(protocol):
+        if literal:
+            parts.append(literal)
+        if field_name is None:
+            continue
+        if '{' in (format_spec or ''):
+            # Nested replacement fields are rare: Leave them to str.format
+            return lambda payload: protocol.format(payload=payload)
+
+        first, accessors = _split_field_name(field_name)
+        if first != 'payload':
+            raise ValueError(
+                "Only the field 'payload' is allowed in the protocol template, "
+                "but got '{}'".format(field_name)
+            )
+        parts.append((accessors, conversion, format_spec or ''))
+
+    convert = {
+        None: lambda val: val, 'r': repr, 's': str, 'a': ascii
+    }  # type: Dict[Optional[str], Callable[[Any], Any]]
+
+    def _render(payload: Payload) -> str:
+        result = []
+        for part in parts:
+            if isinstance(part, str):
+                result.append(part)
+                continue
+            accessors, conversion, format_spec = part
+            value = payload
+            for is_attr, key in accessors:
+                value = _lookup_field(value, is_attr, key)
+            result.append(format(convert[conversion](value), format_spec))
+        return ''.join(result)
+    return _render
+
+
+class InfluxPush(BatchPush):
     """
     Pushes the given `payload` to an influx database using the line `protocol`.
     You have to specify `host`, `port`, `user`, `password` and the `database`.
@@ -12,12 +126,18 @@ class InfluxPush(SyncPush):
     payload. E.g. {payload.metric},room={payload.location} value={payload.value} assumes that
     payload contains metric, location and value.
 
+    Points are buffered and written at once (see `batch_size` and `batch_interval`). When a
+    write fails the points are kept (up to `retry_buffer_size`) and written with the next batch.
+
     See Also:
         https://github.com/HazardDede/pnp/blob/master/docs/plugins/push/timedb.InfluxPush/index.md
     """
-    __REPR_FIELDS__ = ['database', 'host', 'port', 'protocol', 'user']
+    __REPR_FIELDS__ = ['database', 'gzip', 'host', 'port', 'protocol', 'user']
 
-    def __init__(self, host, port, user, password, database, protocol, **kwargs):
+    def __init__(
+            self, host, port, user, password, database, protocol, gzip=False,
+            retry_buffer_size=10000, **kwargs
+    ):
         super().__init__(**kwargs)
         self.host = str(host)
         self.port = int(port)
@@ -25,14 +145,45 @@ class InfluxPush(SyncPush):
         self.password = str(password)
         self.database = str(database)
         self.protocol = str(protocol)
+        self.gzip = bool(gzip)
+        self.retry_buffer_size = max(0, int(retry_buffer_size))
+        self._template = compile_protocol(self.protocol)
+        self._client = None
+        self._retry = []  # type: List[str]
+
+    @property
+    def client(self):
+        """Returns the influx client. It is created once and then reused by all writes."""
+        if self._client is None:
+            from influxdb import InfluxDBClient
+            self._client = InfluxDBClient(
+                self.host, self.port, self.user, self.password, self.database, gzip=self.gzip
+            )
+        return self._client
 
-    @enveloped
-    def _push(self, envelope, payload):  # pylint: disable=arguments-differ
-        points = [self.protocol.format(payload=payload)]
-        self.logger.debug("Writing '%s' to influxdb", str(points))
+    async def _push(self, payload):
+        _, real_payload = self.envelope_payload(payload)
+        # Render the point right away: A broken payload will fail this push and not the batch
+        await super()._push(self._template(real_payload))
+        return payload
 
-        from influxdb import InfluxDBClient
-        client = InfluxDBClient(self.host, self.port, self.user, self.password, self.database)
-        client.write(points, {'db': self.database}, 204, 'line')
+    def _push_batch(self, payloads):
+        points, self._retry = self._retry + payloads, []
+        self.logger.debug("Writing %s points to influxdb", len(points))
+        try:
+            self.client.write(points, {'db': self.database}, 204, 'line')
+        except Exception:
+            # Keep the most recent points for the next try
+            self._retry = points[max(0, len(points) - self.retry_buffer_size):]
+            dropped = len(points) - len(self._retry)
+            if dropped:
+                self.logger.warning(
+                    "Retry buffer is full. Dropped %s points that could not be written", dropped
+                )
+            raise
 
-        return {'data': payload, **envelope} if envelope else payload
+    async def _stop(self):
+        await super()._stop()
+        client, self._client = self._client, None
+        if client is not None:
+            client.close()
@@ -1,26 +1,53 @@
 """Home assistant related user-defined functions."""
 
+from pnp import validator
 from pnp.plugins.udf import UserDefinedFunction
-from pnp.shared.hass import HassApi
+from pnp.shared.hass import HassApi, HassStateMirror
 
 
 class State(UserDefinedFunction):
     """
     Fetches the state of an entity from home assistant by a rest-api request.
 
+    In `websocket` mode all entity states are mirrored locally and kept up to date via the
+    websocket api. A lookup is then a simple in-memory read. Until the mirror is ready (or
+    if the entity is not mirrored) the rest-api is used.
+
     See Also:
         https://github.com/HazardDede/pnp/blob/master/docs/plugins/udf/hass.State/index.md
     """
-    __REPR_FIELDS__ = ['timeout', 'url']
+    __REPR_FIELDS__ = ['mode', 'timeout', 'url']
+
+    MODE_REST = 'rest'
+    MODE_WEBSOCKET = 'websocket'
+    MODES = [MODE_REST, MODE_WEBSOCKET]
 
-    def __init__(self, url, token, timeout=10, **kwargs):
+    def __init__(self, url, token, timeout=10, pool_size=10, mode=MODE_REST, **kwargs):
         super().__init__(**kwargs)
         self.url = str(url)
         self.token = str(token)
         self.timeout = timeout and int(timeout)
         if self.timeout <= 0:
             self.timeout = None  # Basically means no timeout
-        self._client = HassApi(self.url, self.token, self.timeout)
+        self._client = HassApi(self.url, self.token, self.timeout, pool_size=int(pool_size))
+        validator.one_of(self.MODES, mode=str(mode))
+        self.mode = str(mode)
+        self._mirror = HassStateMirror(self._client) if self.mode == self.MODE_WEBSOCKET else None
+
+    def _fetch(self, entity_id):
+        if self._mirror is not None:
+            self._mirror.start()
+            response = self._mirror.get(entity_id)
+            if response is not None:
+                return response
+
+        endpoint = 'states/{entity_id}'.format(**locals())
+        try:
+            return self._client.call(endpoint)
+        except RuntimeError as exc:
+            raise RuntimeError(
+                "Failed to fetch the state for {entity_id} @ {self.url}".format(**locals())
+            ) from exc
 
     def action(self, entity_id, attribute=None):  # pylint: disable=arguments-differ
         """
@@ -37,14 +64,7 @@ class State(UserDefinedFunction):
         """
         entity_id = str(entity_id)
         attribute = attribute and str(attribute)
-        endpoint = 'states/{entity_id}'.format(**locals())
-
-        try:
-            response = self._client.call(endpoint)
-        except RuntimeError as exc:
-            raise RuntimeError(
-                "Failed to fetch the state for {entity_id} @ {self.url}".format(**locals())
-            ) from exc
+        response = self._fetch(entity_id)
 
         if attribute:
             return response.get('attributes', {}).get(str(attribute))
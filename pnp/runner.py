@@ -17,8 +17,14 @@ class Runner(Loggable):
         self.app = app
 
     async def _main_loop(self) -> None:
-        while self.app.engine.is_running:
-            await asyncio.sleep(0.1)
+        stopped = asyncio.Event()
+
+        async def _on_stopped() -> None:
+            stopped.set()
+        self.app.engine.on_stopped_callback = _on_stopped
+
+        if self.app.engine.is_running:
+            await stopped.wait()
 
     def run(self) -> None:
         """Run the application."""
@@ -1,13 +1,105 @@
 """Utility classes for the building block 'selector'."""
 
-from typing import List, Callable, Dict, Any, Iterable
+import ast
+import dis
+import functools
+import time
+from types import CodeType
+from typing import List, Callable, Dict, Any, Iterable, Optional, Set
 
 from typeguard import typechecked
 
 from pnp import validator
 from pnp.models import UDFModel
 from pnp.typing import SelectorExpression, Payload
-from pnp.utils import Singleton, safe_eval, FallbackBox, EvaluationError
+from pnp.utils import Singleton, PayloadView, EvaluationError
+
+# The actual selector function: Accepts the (viewed) payload and returns the selected result
+SelectorFunction = Callable[[Payload], Payload]
+
+
+def _identity(payload: Payload) -> Payload:
+    return payload
+
+
+def _referenced_names(code: CodeType) -> Set[str]:
+    """Returns all global names the code (including nested lambdas and comprehensions) looks
+    up. Attribute names are not included."""
+    names = {
+        instr.argval for instr in dis.get_instructions(code)
+        if instr.opname in ('LOAD_NAME', 'LOAD_GLOBAL')
+    }
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names |= _referenced_names(const)
+    return names
+
+
+def _isinstance(obj: Any, classinfo: Any) -> bool:
+    # The selector sees a view of the payload: Check the actual object
+    if isinstance(obj, PayloadView):
+        obj = PayloadView.unwrap(obj)
+    return isinstance(obj, classinfo)
+
+
+def _unwrapped_args(fun: Callable[..., Any]) -> Callable[..., Any]:
+    """User-defined functions get the actual objects instead of views on the payload. So they can
+    check for `dict`, serialize arguments or use them as cache keys."""
+    @functools.wraps(fun)
+    def _wrapper(*args: Any, **kwargs: Any) -> Any:
+        return fun(
+            *[PayloadView.unwrap(arg) for arg in args],
+            **{key: PayloadView.unwrap(val) for key, val in kwargs.items()}
+        )
+    return _wrapper
+
+
+class CompiledSelector:
+    """
+    A selector compiled to a callable that accepts the payload and returns the selected result.
+    Besides that it knows whether it calls any user-defined functions and measures how long an
+    evaluation takes. Both decide if the selector is cheap enough to be evaluated inline on the
+    event loop (see `inline`).
+
+    Examples:
+
+        >>> dut = CompiledSelector(lambda payload: payload['a'])
+        >>> dut({'a': 42})
+        42
+        >>> dut.inline
+        True
+        >>> CompiledSelector(lambda payload: payload, calls_udf=True).inline
+        False
+    """
+
+    # When evaluations take longer than this (in seconds, on average) the selector is considered
+    # slow and should not block the event loop
+    INLINE_THRESHOLD = 0.001
+    # Weight of the latest measurement for the moving average of the evaluation time
+    SMOOTHING = 0.2
+
+    def __init__(self, fun: SelectorFunction, calls_udf: bool = False):
+        self.fun = fun
+        self.calls_udf = bool(calls_udf)
+        self.avg_duration = 0.0
+
+    @property
+    def inline(self) -> bool:
+        """Returns True if the selector is cheap enough to be evaluated on the event loop;
+        otherwise False (it calls user-defined functions or was measured to be slow)."""
+        return not self.calls_udf and self.avg_duration < self.INLINE_THRESHOLD
+
+    def __call__(self, payload: Payload) -> Payload:
+        start = time.perf_counter()
+        try:
+            # The selector sees a lazy read-only view on the payload -> this makes dot
+            # accessible dictionaries possible without copying or converting the whole payload
+            # upfront. Anything selected from the view is handed out as the original object
+            return PayloadView.unwrap(self.fun(PayloadView.wrap(payload)))
+        finally:
+            # Races between concurrent evaluations are fine: It is just a rough estimate
+            elapsed = time.perf_counter() - start
+            self.avg_duration += self.SMOOTHING * (elapsed - self.avg_duration)
 
 
 class PayloadSelector(Singleton):
@@ -20,7 +112,20 @@ class PayloadSelector(Singleton):
     def __init__(self: 'PayloadSelector') -> None:  # pylint: disable=super-init-not-called
         self._suppress_literal = object()
         self._custom = {}  # type: Dict[str, Callable[..., Any]]
+        # Selector expression -> compiled code (None if the expression does not compile)
+        self._compiled = {}  # type: Dict[str, Optional[CodeType]]
+        # Selector (or its representation if complex) -> compiled selector callable
+        self._selectors = {}  # type: Dict[str, CompiledSelector]
+        # The selector returned for no selector at all
+        self._identity = CompiledSelector(_identity)
+        # The globals namespace for evaluation. Is built once and then shared by all
+        # evaluations. Only registering a custom global will change it.
+        self._globals = {'__builtins__': {}}  # type: Dict[str, Any]
         self._register_globals()
+        self._globals.update(self._custom)
+        self._globals.update({alias: self.suppress for alias in self.suppress_aliases})
+        # Names that are known to be cheap to call. Anything else is a user-defined function
+        self._builtins = frozenset(self._globals)
 
     @property
     def suppress(self) -> Any:
@@ -46,7 +151,7 @@ class PayloadSelector(Singleton):
         self._custom["hasattr"] = hasattr
         self._custom["hash"] = hash
         self._custom["int"] = int
-        self._custom["isinstance"] = isinstance
+        self._custom["isinstance"] = _isinstance
         self._custom["len"] = len
         self._custom["list"] = list
         self._custom["max"] = max
@@ -84,7 +189,9 @@ class PayloadSelector(Singleton):
             None.
         """
         if name not in self._custom:  # Overriding a already existing custom will silently fail!
+            fun = _unwrapped_args(fun)
             self._custom[name] = fun
+            self._globals[name] = fun
 
     def register_udfs(self, udfs: Iterable[UDFModel]) -> None:
         """Register the given user-definied function."""
@@ -92,64 +199,131 @@ class PayloadSelector(Singleton):
         for udf in udfs:
             self.register_custom_global(udf.name, udf.callable)
 
-    def _eval_wrapper(self, selector: str, payload: Payload) -> Payload:
-        suppress_kwargs = {alias: self.suppress for alias in self.suppress_aliases}
-        return safe_eval(
-            source=selector,
-            payload=payload,
-            data=payload,
-            **suppress_kwargs,
-            **self._custom
-        )
+    def _compile(self, selector: str) -> CodeType:
+        """Compiles the selector expression once. Subsequent calls are served by the cache."""
+        try:
+            code = self._compiled[selector]
+        except KeyError:
+            try:
+                code = compile(selector, '<selector>', 'eval')
+            except (SyntaxError, ValueError):
+                code = None
+            self._compiled[selector] = code
+
+        if code is None:
+            raise EvaluationError("Failed to evaluate '{selector}'".format(**locals()))
+        return code
 
-    @staticmethod
-    def _isalambda(v: Any) -> bool:
-        lambda_ = lambda: 0
-        return isinstance(v, type(lambda_)) and v.__name__ == lambda_.__name__
+    def _calls_udf(self, code: CodeType) -> bool:
+        """Returns True if the code looks up any name that is not a builtin global (which has
+        to be a user-defined function or is unknown at all)."""
+        return bool(_referenced_names(code) - self._builtins - {'payload', 'data'})
 
-    def _e(self, snippet: SelectorExpression, payload: Payload) -> Payload:
-        # There might be nested dicts or lists inside the complex structure... Eval them recursively
+    def _compile_expression(self, source: str, udfs: List[bool]) -> SelectorFunction:
+        """Compiles a simple selector expression to a callable."""
+        code = self._compile(source)
+        udfs.append(self._calls_udf(code))
+        namespace = self._globals
+
+        def _expression(payload: Payload) -> Payload:
+            try:
+                return eval(  # pylint: disable=eval-used
+                    code, namespace, {'payload': payload, 'data': payload}
+                )
+            except Exception as exc:  # pylint: disable=broad-except
+                raise EvaluationError(
+                    "Failed to evaluate '{source}'".format(source=source)
+                ) from exc
+        return _expression
+
+    def _compile_complex(self, snippet: Any, udfs: List[bool]) -> SelectorFunction:
+        """Analyses a complex (dict / list) selector once: Literals become constants,
+        lambdas are compiled. The result is a single callable that assembles the output structure
+        directly."""
+        # There might be nested dicts or lists inside the complex structure... compile them
+        # recursively
         if isinstance(snippet, dict):
-            return {self._e(k, payload): self._e(v, payload) for k, v in snippet.items()}
+            items = [
+                (self._compile_complex(k, udfs), self._compile_complex(v, udfs))
+                for k, v in snippet.items()
+            ]
+            return lambda payload: {key(payload): val(payload) for key, val in items}
         if isinstance(snippet, list):
-            return [self._e(i, payload) for i in snippet]
+            elements = [self._compile_complex(item, udfs) for item in snippet]
+            return lambda payload: [element(payload) for element in elements]
 
         # Test if the snippet constructs a lambda
         # -> assumes to be callable code with payload argument
+        source = str(snippet)
         try:
-            possible_fun = self._eval_wrapper(str(snippet), payload)
-        except EvaluationError as eve:
-            if str(snippet).startswith('lambda'):
-                raise EvaluationError("Your lambda is errorneous: '{snippet}'".format(
-                    **locals())) from eve
-            # Evaluation failed -> assume that is string literal (dict key/value or list item)
-            return snippet
-
-        if not self._isalambda(possible_fun):
-            return snippet  # Cannot be executed. So assume it is not a selector expression
-
-        # It is a callable. Lets modify globals and call it :-)
-        suppress_kwargs = {alias: self.suppress for alias in self.suppress_aliases}
-        customs = self._custom
-        for k, v in {**suppress_kwargs, **customs}.items():
-            possible_fun.__globals__[k] = v
+            is_lambda = isinstance(ast.parse(source, mode='eval').body, ast.Lambda)
+        except (SyntaxError, ValueError):
+            is_lambda = False
+
+        if not is_lambda:
+            if source.startswith('lambda'):
+                raise EvaluationError("Your lambda is errorneous: '{snippet}'".format(**locals()))
+            # Not executable. So assume it is a literal (dict key/value or list item)
+            return lambda payload: snippet
+
         try:
-            return possible_fun(payload)
-        except Exception as exc:
-            raise EvaluationError("Error when running the selector lambda: '{snippet}'".format(
+            code = self._compile(source)
+            # The lambda is created with our globals: Just call it later on :-)
+            fun = eval(code, self._globals, {})  # pylint: disable=eval-used
+        except Exception as exc:  # pylint: disable=broad-except
+            raise EvaluationError("Your lambda is errorneous: '{snippet}'".format(
                 **locals())) from exc
 
-    def eval_selector(self, selector: SelectorExpression, payload: Payload) -> Payload:
-        """Applies the specified selector to the given payload."""
-        # Wrap payload inside a Box -> this makes dot accessable dictionaries possible
-        # We create a dictionary cause payload might not be an actual dictionary.
-        # This way wrapping with Box will always work ;-)
-        payload = FallbackBox({'base': payload}).base
+        def _lambda(payload: Payload) -> Payload:
+            try:
+                return fun(payload)
+            except Exception as exc:
+                raise EvaluationError(
+                    "Error when running the selector lambda: '{snippet}'".format(snippet=snippet)
+                ) from exc
+        udfs.append(self._calls_udf(code))
+        return _lambda
+
+    def compile_selector(self, selector: SelectorExpression) -> CompiledSelector:
+        """
+        Compiles the given selector to a callable that accepts the payload and returns the
+        selected result. Compilation happens only once per selector expression.
+
+        Examples:
+
+            >>> dut = PayloadSelector.instance
+            >>> fun = dut.compile_selector({'value': 'lambda p: p * 2', 'unit': 'cm'})
+            >>> fun(21)
+            {'value': 42, 'unit': 'cm'}
+            >>> dut.compile_selector({'value': 'lambda p: p * 2', 'unit': 'cm'}) is fun
+            True
+            >>> fun.calls_udf
+            False
+        """
         if selector is None:
-            return payload
+            return self._identity
+
+        # A complex selector is keyed by its representation: Unlike make_hashable it keeps the
+        # order of list items
+        key = selector if isinstance(selector, str) else repr(selector)
+        try:
+            return self._selectors[key]
+        except KeyError:
+            pass
 
+        udfs = []  # type: List[bool]
         if isinstance(selector, (list, dict)):
-            return self._e(selector, payload)  # Complex. Need additional magic
+            fun = self._compile_complex(selector, udfs)  # Complex. Need additional magic
+        else:
+            # No complex structure. We assume that is an expression
+            fun = self._compile_expression(str(selector), udfs)
 
-        # No complex structure. We assume that is an expression and we try to evaluate it
-        return self._eval_wrapper(str(selector), payload)
+        compiled = CompiledSelector(fun, calls_udf=any(udfs))
+        self._selectors[key] = compiled
+        return compiled
+
+    def eval_selector(self, selector: SelectorExpression, payload: Payload) -> Payload:
+        """Applies the specified selector to the given payload."""
+        if selector is None:
+            return payload
+        return self.compile_selector(selector)(payload)
@@ -1,52 +1,160 @@
 """Asyncio helper."""
 
 import asyncio
-from typing import Callable, Any, Coroutine
+import concurrent.futures
+import threading
+from typing import Callable, Any, Dict, Hashable, Optional, Tuple
 
-from pnp import validator
 from pnp.typing import T
-from pnp.utils import StopCycleError
 
-SleepInterruptPredicate = Callable[[], Coroutine[Any, Any, bool]]
-SleepInterruptCallback = Callable[[], Coroutine[Any, Any, None]]
 
-
-async def async_interruptible_sleep(
-    wait: float, callback: SleepInterruptCallback, interval: float = 0.1
-) -> None:
+class ThreadSafeEvent:
     """
-    Waits the specified amount of time. The waiting can be interrupted when the callback raises a
-    `StopCycleError`. The argument `interval` defines after how much waiting time the callback
-    should be called to determine if the sleep should be interrupted or not.
+    An event that can be set from any thread. It can be waited for from within any event loop
+    (`async_wait`) or from any thread (`wait`). Setting the event wakes up all waiters right
+    away: Nobody has to check a flag periodically.
+
+    Examples:
+
+        >>> dut = ThreadSafeEvent()
+        >>> async def main():
+        ...     timer = threading.Timer(0.1, dut.set)  # Set from another thread
+        ...     timer.start()
+        ...     before = await dut.async_wait(0.01)
+        ...     return before, await dut.async_wait(5), dut.wait(5)
+        >>> asyncio.new_event_loop().run_until_complete(main())
+        (False, True, True)
     """
-    wait = float(wait)
-    interval = float(interval)
 
-    complete_cycles = int(wait // interval)
-    try:
-        for _ in range(0, complete_cycles):
-            await callback()  # Should raise a StopCycleError error when waiting should be aborted
-            await asyncio.sleep(interval)
+    def __init__(self) -> None:
+        self._flag = threading.Event()
+        self._waiters = {}  # type: Dict[asyncio.AbstractEventLoop, asyncio.Event]
 
-        await asyncio.sleep(wait % interval)
-    except StopCycleError:
-        pass
+    def is_set(self) -> bool:
+        """Returns True if the event is set; otherwise False."""
+        return self._flag.is_set()
+
+    def set(self) -> None:
+        """Sets the event and wakes up all waiters."""
+        self._flag.set()
+        for loop, event in list(self._waiters.items()):
+            if loop.is_closed():
+                self._waiters.pop(loop, None)
+                continue
+            loop.call_soon_threadsafe(event.set)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks the calling thread until the event is set or the timeout expired. Returns True
+        if the event is set; otherwise False."""
+        return self._flag.wait(timeout)
 
+    async def async_wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits until the event is set or the timeout expired. Returns True if the event is
+        set; otherwise False."""
+        loop = asyncio.get_event_loop()
+        event = self._waiters.get(loop)
+        if event is None:
+            event = asyncio.Event()
+            self._waiters[loop] = event
+        if self._flag.is_set():
+            # Set before this loop was known to the event (or concurrently)
+            event.set()
+        return await async_wait_event(event, timeout)
 
-async def async_sleep_until_interrupt(
-    sleep_time: float, interrupt_fun: SleepInterruptPredicate, interval: float = 0.1
-) -> None:
-    """Call this method to sleep an interruptable sleep until the interrupt co-routine returns
-    True."""
-    validator.is_function(interrupt_fun=interrupt_fun)
 
-    async def callback() -> None:
-        if await interrupt_fun():
-            raise StopCycleError()
-    await async_interruptible_sleep(sleep_time, callback, interval=interval)
+async def async_wait_event(event: asyncio.Event, timeout: Optional[float] = None) -> bool:
+    """Waits until the asyncio event is set or the timeout expired. Returns True if the event is
+    set; otherwise False."""
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    return event.is_set()
 
 
-async def run_sync(func: Callable[..., T], *args: Any) -> T:
-    """Runs sync code in an async compatible non-blocking way using an executor."""
+async def run_sync(
+        func: Callable[..., T], *args: Any, executor: Optional[concurrent.futures.Executor] = None
+) -> T:
+    """Runs sync code in an async compatible non-blocking way using an executor (default is the
+    default executor of the event loop)."""
     loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, func, *args)
+    return await loop.run_in_executor(executor, func, *args)
+
+
+async def run_in_thread(func: Callable[..., T], *args: Any, name: Optional[str] = None) -> T:
+    """Runs long-running sync code in a dedicated (daemon) thread instead of occupying a
+    worker of the shared executor. Awaiting the coroutine waits for the thread to finish."""
+    loop = asyncio.get_event_loop()
+    future = loop.create_future()
+
+    def _set_result(result: Any) -> None:
+        if not future.done():
+            future.set_result(result)
+
+    def _set_exception(exc: BaseException) -> None:
+        if not future.done():
+            future.set_exception(exc)
+
+    def _target() -> None:
+        try:
+            result = func(*args)
+        except BaseException as exc:  # pylint: disable=broad-except
+            loop.call_soon_threadsafe(_set_exception, exc)
+        else:
+            loop.call_soon_threadsafe(_set_result, result)
+
+    threading.Thread(target=_target, name=name, daemon=True).start()
+    return await future  # type: ignore
+
+
+class KeyedLock:
+    """
+    Serializes the coroutines asking for the same key in the order they asked. Different keys
+    do not block each other. A lock is discarded as soon as no one holds or waits for its key.
+
+    Examples:
+
+        >>> async def main():
+        ...     locks, order = KeyedLock(), []
+        ...     async def work(key, item):
+        ...         await locks.acquire(key)
+        ...         try:
+        ...             await asyncio.sleep(0.01 if item == 1 else 0)
+        ...             order.append(item)
+        ...         finally:
+        ...             locks.release(key)
+        ...     await asyncio.gather(work('a', 1), work('a', 2), work('b', 3))
+        ...     return order, len(locks)
+        >>> asyncio.new_event_loop().run_until_complete(main())
+        ([3, 1, 2], 0)
+    """
+
+    def __init__(self) -> None:
+        # Key -> (lock, number of holders and waiters)
+        self._locks = {}  # type: Dict[Hashable, Tuple[asyncio.Lock, int]]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    async def acquire(self, key: Hashable) -> None:
+        """Acquires the lock of the given key. Does not yield to the event loop if the key is
+        not locked."""
+        lock, users = self._locks.get(key) or (asyncio.Lock(), 0)
+        self._locks[key] = (lock, users + 1)
+        try:
+            await lock.acquire()
+        except BaseException:
+            self._forget(key)
+            raise
+
+    def release(self, key: Hashable) -> None:
+        """Releases the lock of the given key."""
+        self._locks[key][0].release()
+        self._forget(key)
+
+    def _forget(self, key: Hashable) -> None:
+        lock, users = self._locks[key]
+        if users <= 1:
+            del self._locks[key]
+        else:
+            self._locks[key] = (lock, users - 1)
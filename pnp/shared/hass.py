@@ -1,35 +1,82 @@
 """Home assistant related utility classes."""
 
+import asyncio
 import json
+import threading
 import urllib.parse as urlparse
-from typing import Any, Optional
+from typing import Any, Optional, Dict, Tuple, Callable, Awaitable
 
 from typeguard import typechecked
 
-from pnp.utils import ReprMixin
+from pnp.shared.http import SESSIONS
+from pnp.utils import ReprMixin, Loggable
+
+# Signature of the callback that is called for every websocket event message
+EventCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Signature of the callback that is called when the subscription is established
+SubscribedCallback = Callable[[], Awaitable[None]]
+
+
+def websocket_url(url: str) -> str:
+    """
+    Converts the url of a home assistant instance to the related websocket url.
+
+    Examples:
+
+        >>> websocket_url('http://hass:8123/')
+        'ws://hass:8123'
+        >>> websocket_url('https://hass:8123')
+        'wss://hass:8123'
+    """
+    res = str(url).replace('https://', 'wss://').replace('http://', 'ws://')
+    if res.endswith('/'):
+        return res[:-1]  # Remove last /
+    return res
 
 
 class HassApi(ReprMixin):
-    """Utility class to communicate with home assistant via the rest-api."""
+    """
+    Utility class to communicate with home assistant via the rest-api.
+
+    Synchronous calls (`call`) share a keep-alive `requests.Session`, asynchronous calls
+    (`async_call`) the `aiohttp` session of the home assistant host. At most `pool_size`
+    connections are used at the same time.
+    """
 
     METHOD_GET = 'get'
     METHOD_POST = 'post'
     ALLOWED_METHODS = [METHOD_GET, METHOD_POST]
 
-    __REPR_FIELDS__ = ["base_url", "timeout"]
+    __REPR_FIELDS__ = ["base_url", "pool_size", "timeout"]
 
     @typechecked
-    def __init__(self, base_url: str, token: str, timeout: Optional[int] = None):
+    def __init__(
+            self, base_url: str, token: str, timeout: Optional[float] = None, pool_size: int = 10
+    ):
         self.base_url = base_url
         self.token = token
-        self.timeout = timeout and int(timeout)
+        self.timeout = timeout and float(timeout)
+        self.pool_size = max(1, int(pool_size))
+        self._session = None  # type: Any
+        self._limit = None  # type: Optional[asyncio.Semaphore]
 
-    @typechecked
-    def call(self, endpoint: str, method: str = METHOD_GET, data: Any = None) -> Any:
-        """Calls the specified endpoint (without prefix api) using the given method.
-        You can optionally pass data to the request which will be json encoded."""
-        from requests import get, post
+    @property
+    def session(self) -> Any:
+        """Returns the keep-alive session for synchronous calls."""
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+        return self._session
 
+    def _prepare(
+            self, endpoint: str, method: str, data: Any
+    ) -> Tuple[str, str, Dict[str, str], Any]:
         method = str(method).lower()
         if method not in self.ALLOWED_METHODS:
             raise ValueError(
@@ -47,14 +94,182 @@ class HassApi(ReprMixin):
         if data is not None:
             data = json.dumps(data)
 
+        return method, url, headers, data
+
+    @staticmethod
+    def _raise_error(url: str, status_code: int, text: str) -> None:
+        raise RuntimeError("Failed to call endpoint {url}"
+                           "\nHttp Code: {status_code}"
+                           "\nMessage: {text}".format(**locals()))
+
+    @typechecked
+    def call(self, endpoint: str, method: str = METHOD_GET, data: Any = None) -> Any:
+        """Calls the specified endpoint (without prefix api) using the given method.
+        You can optionally pass data to the request which will be json encoded."""
+        method, url, headers, data = self._prepare(endpoint, method, data)
+
         if method == self.METHOD_GET:
-            response = get(url, headers=headers, timeout=self.timeout, data=data)
+            response = self.session.get(url, headers=headers, timeout=self.timeout, data=data)
         else:
-            response = post(url, headers=headers, timeout=self.timeout, data=data)
+            response = self.session.post(url, headers=headers, timeout=self.timeout, data=data)
 
         if response.status_code != 200:
-            raise RuntimeError("Failed to call endpoint {url}"
-                               "\nHttp Code: {response.status_code}"
-                               "\nMessage: {response.text}".format(**locals()))
+            self._raise_error(url, response.status_code, response.text)
 
         return response.json()
+
+    async def async_call(self, endpoint: str, method: str = METHOD_GET, data: Any = None) -> Any:
+        """The asynchronous counterpart of `call`."""
+        import aiohttp
+
+        method, url, headers, data = self._prepare(endpoint, method, data)
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.pool_size)
+
+        async with self._limit:
+            async with SESSIONS.get(url).request(
+                    method.upper(), url, headers=headers, data=data,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout)
+            ) as response:
+                text = await response.text()
+                if response.status != 200:
+                    self._raise_error(url, response.status, text)
+                return json.loads(text)
+
+    async def close(self) -> None:
+        """Closes the sessions (sync and async)."""
+        session, self._session = self._session, None
+        if session is not None:
+            session.close()
+        await SESSIONS.close(self.base_url)
+
+
+class HassWebsocket(Loggable):
+    """Connects to the home assistant websocket api, authenticates and subscribes to
+    `state_changed` events."""
+
+    def __init__(self, url: str, token: str):
+        self.url = websocket_url(url)
+        self.token = str(token)
+        self._websocket = None  # type: Any
+
+    async def listen(
+            self, on_event: EventCallback, on_subscribed: Optional[SubscribedCallback] = None
+    ) -> None:
+        """Listens for state changes until the connection is closed. Every event message is
+        passed to `on_event`. `on_subscribed` is called as soon as the subscription is
+        confirmed."""
+        import asyncws
+        self._websocket = await asyncws.connect('{self.url}/api/websocket'.format(**locals()))
+
+        while True:
+            message = await self._websocket.recv()
+            if message is None:
+                await self.close()
+                break
+            message = json.loads(message)
+            if message.get('type', '') == 'auth_required':
+                hass_version = message.get('ha_version')
+                self.logger.info(
+                    "Connected to Home Assistant %s websocket @ %s",
+                    hass_version, self.url
+                )
+                self.logger.debug("Authentication is required. Providing token")
+                await self._websocket.send(json.dumps({
+                    'type': 'auth',
+                    'access_token': self.token
+                }))
+            elif message.get('type', '') == 'auth_ok':
+                self.logger.info("Authentication is valid")
+                await self._websocket.send(json.dumps(
+                    {'id': 1, 'type': 'subscribe_events', 'event_type': 'state_changed'}
+                ))
+            elif message.get('type', '') == 'auth_invalid':
+                self.logger.info("Authentication is invalid. Aborting...")
+                await self._websocket.close()
+            elif message.get('type', '') == 'result':
+                if on_subscribed is not None and message.get('success', True):
+                    await on_subscribed()
+            elif message.get('type', '') == 'event':
+                await on_event(message)
+            else:
+                self.logger.warning("Got unexpected message '%s'", message)
+
+    async def close(self) -> None:
+        """Closes the websocket connection."""
+        websocket, self._websocket = self._websocket, None
+        if websocket is not None:
+            await websocket.close()
+
+
+class HassStateMirror(Loggable):
+    """
+    Keeps a local mirror of all entity states of home assistant. The mirror is seeded by a
+    single request of all states and is kept up to date by listening for state changes on the
+    websocket api. It runs in a background thread with its own event loop and reconnects on its
+    own when the connection drops.
+    """
+
+    # Seconds to wait before reconnecting to the websocket api
+    RECONNECT_DELAY = 5
+
+    def __init__(self, api: HassApi):
+        self._api = api
+        self._states = {}  # type: Dict[str, Dict[str, Any]]
+        self._ready = threading.Event()
+        self._thread = None  # type: Optional[threading.Thread]
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        """Returns True if the mirror is seeded and in sync with home assistant."""
+        return self._ready.is_set()
+
+    def start(self) -> None:
+        """Starts mirroring in a background thread (if not already started)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=lambda: asyncio.new_event_loop().run_until_complete(self._run()),
+                name='pnp-hass-mirror', daemon=True
+            )
+            self._thread.start()
+
+    def get(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the mirrored state object of the given entity. Returns None when the entity
+        is unknown or the mirror is not ready."""
+        if not self._ready.is_set():
+            return None
+        return self._states.get(entity_id)
+
+    async def _run(self) -> None:
+        while True:
+            websocket = HassWebsocket(self._api.base_url, self._api.token)
+            try:
+                await websocket.listen(self._on_event, self._on_subscribed)
+            except Exception:  # pylint: disable=broad-except
+                self.logger.exception("Mirroring the states of home assistant failed")
+            self._ready.clear()
+            await asyncio.sleep(self.RECONNECT_DELAY)
+
+    async def _on_subscribed(self) -> None:
+        # State changes will queue up in the websocket until the seeding is done
+        states = await self._api.async_call('states')
+        self._states = {state['entity_id']: state for state in states}
+        self._ready.set()
+        self.logger.info("Mirrored %s entity states", len(self._states))
+
+    async def _on_event(self, message: Dict[str, Any]) -> None:
+        data = message.get('event', {}).get('data', {})
+        entity_id = data.get('entity_id')
+        new_state = data.get('new_state')
+        if entity_id is None:
+            return
+        if new_state is None:
+            self._states.pop(entity_id, None)  # Entity was removed
+            return
+        current = self._states.get(entity_id)
+        if current and current.get('last_updated', '') > new_state.get('last_updated', ''):
+            return  # Already seeded with a more recent state
+        self._states[entity_id] = new_state
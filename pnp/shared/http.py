@@ -0,0 +1,81 @@
+"""Http related utility classes."""
+
+import asyncio
+from typing import Any, Dict, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from pnp.utils import Loggable
+
+
+def origin(url: str) -> str:
+    """
+    Returns the origin (scheme, host and port) of the given url.
+
+    Examples:
+
+        >>> origin('https://www.example.com:8123/api/states?a=b')
+        'https://www.example.com:8123'
+        >>> origin('http://localhost/foo')
+        'http://localhost'
+    """
+    parts = urlsplit(str(url))
+    return '{parts.scheme}://{parts.netloc}'.format(parts=parts)
+
+
+class ClientSessionPool(Loggable):
+    """
+    Hands out a shared `aiohttp.ClientSession` per host (origin) and event loop. Connections
+    of a session are kept alive and reused by any subsequent request to the same host.
+
+    Examples:
+
+        >>> async def main():
+        ...     pool = ClientSessionPool()
+        ...     session = pool.get('http://localhost:8080/foo')
+        ...     same = pool.get('http://localhost:8080/bar') is session
+        ...     other = pool.get('http://localhost:8081/foo') is session
+        ...     await pool.close()
+        ...     return same, other, session.closed
+        >>> asyncio.new_event_loop().run_until_complete(main())
+        (True, False, True)
+    """
+
+    def __init__(self) -> None:
+        self._sessions = {}  # type: Dict[Tuple[asyncio.AbstractEventLoop, str], Any]
+
+    def get(self, url: str) -> aiohttp.ClientSession:
+        """Returns the session for the host of the given url. Has to be called from within a
+        running event loop."""
+        loop = asyncio.get_event_loop()
+        key = (loop, origin(url))
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            self._discard_stale()
+            # No overall connection limit: Concurrency is limited by the callers per host
+            session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0))
+            self._sessions[key] = session
+        return session
+
+    def _discard_stale(self) -> None:
+        """Forgets any session that belongs to an event loop that was closed."""
+        for key in [key for key in self._sessions if key[0].is_closed()]:
+            del self._sessions[key]
+
+    async def close(self, *urls: str) -> None:
+        """Closes the sessions of the given urls (hosts) or all sessions of the current event
+        loop if no url is given."""
+        loop = asyncio.get_event_loop()
+        hosts = {origin(url) for url in urls}
+        for key in list(self._sessions):
+            session_loop, host = key
+            if session_loop is not loop or (hosts and host not in hosts):
+                continue
+            session = self._sessions.pop(key)
+            self.logger.debug("Closing client session for '%s'", host)
+            await session.close()
+
+
+# Shared by everyone in this process
+SESSIONS = ClientSessionPool()
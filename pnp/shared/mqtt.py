@@ -1,8 +1,10 @@
 """MQTT related utility classes."""
 
+import atexit
 import json
 import logging
-from typing import Optional, Any
+import threading
+from typing import Optional, Any, Dict, Set, Tuple
 
 from pnp.typing import Payload
 from pnp.utils import try_parse_int
@@ -10,8 +12,158 @@ from pnp.utils import try_parse_int
 _LOGGER = logging.getLogger(__name__)
 
 
+class MQTTConnection:
+    """
+    A long-lived connection to a mqtt broker. The connection is established on the first
+    publish and is automatically re-established when it drops. The number of messages that
+    were handed over to the client but are not published yet is limited by `max_inflight`: A
+    publish will block when the window is exhausted.
+
+    Do not create instances directly, but use `MQTTConnection.get(...)` to share a connection
+    with anyone else publishing to the same broker.
+    """
+
+    # Seconds to wait for the broker connection or a free slot in the in-flight window
+    TIMEOUT = 10
+    # Maximum number of messages handed over to the client but not published yet
+    MAX_INFLIGHT = 100
+
+    _pool = {}  # type: Dict[Tuple[str, int, Optional[str]], MQTTConnection]
+    _pool_lock = threading.Lock()
+
+    def __init__(
+            self, host: str, port: int = 1883, user: Optional[str] = None,
+            password: Optional[str] = None
+    ):
+        self.host = str(host)
+        self.port = int(port)
+        self.user = user and str(user)
+        self.password = password and str(password)
+        self._client = None  # type: Any
+        self._connected = threading.Event()
+        self._lock = threading.Condition()
+        self._pending = set()  # type: Set[int]
+        self._early = set()  # type: Set[int]
+
+    @classmethod
+    def get(
+            cls, host: str, port: int = 1883, user: Optional[str] = None,
+            password: Optional[str] = None
+    ) -> 'MQTTConnection':
+        """Returns the process-wide shared connection for the given broker and user."""
+        key = (str(host), int(port), user and str(user))
+        with cls._pool_lock:
+            connection = cls._pool.get(key)
+            if connection is None:
+                connection = cls(host, port, user, password)
+                cls._pool[key] = connection
+            return connection
+
+    @classmethod
+    def close_all(cls) -> None:
+        """Disconnects all pooled connections."""
+        with cls._pool_lock:
+            connections, cls._pool = list(cls._pool.values()), {}
+        for connection in connections:
+            connection.close()
+
+    def _connect(self) -> Any:
+        with self._lock:
+            if self._client is None:
+                self._client = self._create_client()
+            return self._client
+
+    def _create_client(self) -> Any:
+        import paho.mqtt.client as paho
+        client = paho.Client()
+        if self.user:
+            client.username_pw_set(self.user, self.password)
+        client.max_inflight_messages_set(self.MAX_INFLIGHT)
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_publish = self._on_publish
+        # The network loop of paho will (re-)connect in the background
+        client.connect_async(self.host, self.port)
+        client.loop_start()
+        return client
+
+    def _on_connect(self, client: Any, userdata: Any, flags: Any, rc: int) -> None:
+        _ = client, userdata, flags  # Fake usage
+        if rc == 0:
+            _LOGGER.debug("Connected to mqtt broker @ %s:%s", self.host, self.port)
+            self._connected.set()
+        else:
+            _LOGGER.error(
+                "Connecting to mqtt broker @ %s:%s failed (rc=%s)", self.host, self.port, rc
+            )
+
+    def _on_disconnect(self, client: Any, userdata: Any, rc: int) -> None:
+        _ = client, userdata  # Fake usage
+        self._connected.clear()
+        if rc != 0:
+            _LOGGER.warning(
+                "Lost connection to mqtt broker @ %s:%s (rc=%s). Reconnecting...",
+                self.host, self.port, rc
+            )
+        with self._lock:
+            # Whatever is still pending is lost (qos=0) or will be re-sent by paho on its own
+            self._pending.clear()
+            self._early.clear()
+            self._lock.notify_all()
+
+    def _on_publish(self, client: Any, userdata: Any, mid: int) -> None:
+        _ = client, userdata  # Fake usage
+        with self._lock:
+            if mid in self._pending:
+                self._pending.discard(mid)
+            else:
+                self._early.add(mid)  # Published before we noticed the message id
+            self._lock.notify_all()
+
+    def publish(self, topic: str, payload: Any, qos: int = 0, retain: bool = False) -> None:
+        """Publishes the message. Blocks until the broker is connected and there is a free
+        slot in the in-flight window."""
+        client = self._connect()
+        if not self._connected.wait(self.TIMEOUT):
+            raise RuntimeError(
+                "Not connected to mqtt broker @ {self.host}:{self.port}".format(self=self)
+            )
+
+        with self._lock:
+            if not self._lock.wait_for(
+                    lambda: len(self._pending) < self.MAX_INFLIGHT, self.TIMEOUT
+            ):
+                raise RuntimeError(
+                    "Too many messages in-flight to mqtt broker @ {self.host}:{self.port}"
+                    .format(self=self)
+                )
+            info = client.publish(topic, payload=payload, qos=qos, retain=retain)
+            if info.rc != 0:
+                import paho.mqtt.client as paho
+                raise RuntimeError(
+                    "Publishing to mqtt broker @ {self.host}:{self.port} failed: {error}"
+                    .format(self=self, error=paho.error_string(info.rc))
+                )
+            if info.mid in self._early:
+                self._early.discard(info.mid)
+            else:
+                self._pending.add(info.mid)
+
+    def close(self) -> None:
+        """Disconnects from the broker."""
+        client, self._client = self._client, None
+        if client is not None:
+            client.disconnect()
+            client.loop_stop()
+        self._connected.clear()
+
+
+atexit.register(MQTTConnection.close_all)
+
+
 class MQTTBase:
-    """MQTT base class for publishing message to a mqtt broker."""
+    """MQTT base class for publishing message to a mqtt broker. All instances publishing to the
+    same broker (and user) share a single connection."""
 
     def __init__(
         self, host: str, port: int = 1883, user: Optional[str] = None,
@@ -44,23 +196,11 @@ class MQTTBase:
         if isinstance(payload, (dict, list, tuple)):
             payload = json.dumps(payload)
 
-        auth = None
-        if self.user:
-            auth = dict(username=self.user, password=self.password)
-
         if qos is None:
             qos = self.qos
 
-        import paho.mqtt.publish as publish
-        publish.single(
-            topic=topic,
-            payload=payload,
-            hostname=self.host,
-            port=self.port,
-            retain=retain,
-            auth=auth,
-            qos=qos
-        )
+        connection = MQTTConnection.get(self.host, self.port, self.user, self.password)
+        connection.publish(topic=topic, payload=payload, qos=qos, retain=retain)
         _LOGGER.debug(
             "Published message on '%s' @ %s:%s with qos=%s. Payload='%s'",
             topic, self.host, self.port, qos, payload
@@ -0,0 +1,98 @@
+"""Process pool related utility classes."""
+
+import asyncio
+import concurrent.futures
+import itertools
+import multiprocessing
+from typing import Any, Dict, Optional
+
+from pnp.shared.async_ import run_in_thread
+from pnp.utils import Loggable, PY37
+
+# Objects to call in the worker processes (by key). Set by the initializer of a worker process
+_INSTANCES = {}  # type: Dict[int, Any]
+_KEYS = itertools.count()
+
+
+def _init(key: int, instance: Any) -> None:
+    _INSTANCES[key] = instance
+
+
+def _call(key: int, method: str, *args: Any) -> Any:
+    return getattr(_INSTANCES[key], method)(*args)
+
+
+class ProcessOffload(Loggable):
+    """
+    Calls the methods of an object in a pool of `processes` worker processes (default is
+    `DEFAULT_PROCESSES`). The worker processes are started on demand by a fork server: The fork
+    server is a fresh single-threaded process, so the workers never inherit locks held by the
+    threads of the caller.
+
+    Each worker process gets its own copy of the object once when it starts (the object has to
+    be picklable). Any state it builds up (e.g. a loaded model) lives as long as the worker
+    process does - and takes up its memory in each of them: Size the pool by the memory a copy
+    takes, not only by the number of cpu cores. Only the arguments and the result of a call are
+    pickled per call.
+
+    Only available on posix compliant systems.
+
+    Examples:
+
+        >>> from collections import Counter
+        >>> async def main():
+        ...     dut = ProcessOffload(Counter(), processes=1)
+        ...     try:
+        ...         return [await dut.call('update', 'ab') for _ in range(2)] + [
+        ...             await dut.call('most_common')
+        ...         ]
+        ...     finally:
+        ...         await dut.close()
+        >>> asyncio.new_event_loop().run_until_complete(main())
+        [None, None, [('a', 2), ('b', 2)]]
+    """
+
+    # Number of worker processes if not given otherwise: Each one holds a copy of the object
+    DEFAULT_PROCESSES = 2
+
+    def __init__(self, instance: Any, processes: Optional[int] = None):
+        self.processes = max(1, int(processes or self.DEFAULT_PROCESSES))
+        self._key = next(_KEYS)
+        self._pool = None  # type: Optional[concurrent.futures.ProcessPoolExecutor]
+        self._pool = self._create(instance)
+
+    def _create(self, instance: Any) -> concurrent.futures.ProcessPoolExecutor:
+        if not PY37:
+            # No initializer and no context: The workers are forked and inherit the object
+            _INSTANCES[self._key] = instance
+            return concurrent.futures.ProcessPoolExecutor(self.processes)
+        try:
+            context = multiprocessing.get_context('forkserver')
+        except ValueError as exc:
+            raise RuntimeError(
+                "Offloading to processes requires a platform that supports fork"
+            ) from exc
+        # Nothing is started yet: The worker processes are started by the first calls
+        return concurrent.futures.ProcessPoolExecutor(
+            self.processes, mp_context=context, initializer=_init,
+            initargs=(self._key, instance)
+        )
+
+    @property
+    def pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        """Returns the process pool."""
+        if self._pool is None:
+            raise RuntimeError("The process offload is already closed")
+        return self._pool
+
+    async def call(self, method: str, *args: Any) -> Any:
+        """Calls the method of the object with the given arguments in a worker process."""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.pool, _call, self._key, method, *args)
+
+    async def close(self) -> None:
+        """Shuts down the worker processes (after pending calls are done)."""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            await run_in_thread(pool.shutdown)
+        _INSTANCES.pop(self._key, None)
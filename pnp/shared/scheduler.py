@@ -0,0 +1,190 @@
+"""Scheduling related utility classes."""
+
+import asyncio
+import bisect
+import heapq
+import itertools
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
+from weakref import WeakKeyDictionary
+
+from pnp.utils import Loggable
+
+
+class ScheduledCall:
+    """A callback that is scheduled to be called at a specific point in time."""
+
+    __slots__ = ('due', 'callback', 'args', 'cancelled')
+
+    def __init__(self, due: float, callback: Callable[..., None], args: Tuple[Any, ...]):
+        self.due = due
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        """Cancels the call. Does nothing if it was already called."""
+        self.cancelled = True
+
+
+class Scheduler(Loggable):
+    """
+    Calls callbacks at specific points in time (unix timestamps). All scheduled calls of an
+    event loop are kept in a single heap and only one timer is armed: It fires when the
+    earliest call is due. Nothing wakes up in between.
+
+    Examples:
+
+        >>> async def main():
+        ...     dut = Scheduler(asyncio.get_event_loop())
+        ...     res, now = [], time.time()
+        ...     dut.call_at(now + 0.2, res.append, 'second')
+        ...     dut.call_at(now + 0.1, res.append, 'first')
+        ...     dut.call_at(now + 0.1, res.append, 'never').cancel()
+        ...     await asyncio.sleep(0.3)
+        ...     return res, len(dut)
+        >>> asyncio.new_event_loop().run_until_complete(main())
+        (['first', 'second'], 0)
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self._heap = []  # type: List[Tuple[float, int, ScheduledCall]]
+        self._counter = itertools.count()
+        self._timer = None  # type: Optional[asyncio.TimerHandle]
+        self._timer_due = None  # type: Optional[float]
+
+    def __len__(self) -> int:
+        return sum(1 for _, _, call in self._heap if not call.cancelled)
+
+    def call_at(self, due: float, callback: Callable[..., None], *args: Any) -> ScheduledCall:
+        """Calls the callback with the given arguments when the point in time `due` (unix
+        timestamp) is reached. Has to be called from within the thread of the event loop."""
+        call = ScheduledCall(float(due), callback, args)
+        heapq.heappush(self._heap, (call.due, next(self._counter), call))
+        if self._timer_due is None or call.due < self._timer_due:
+            self._arm()
+        return call
+
+    def _arm(self) -> None:
+        """(Re-)Arms the timer for the earliest call that is not cancelled."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer, self._timer_due = None, None
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return
+        self._timer_due = self._heap[0][0]
+        self._timer = self.loop.call_later(max(0.0, self._timer_due - time.time()), self._fire)
+
+    def _fire(self) -> None:
+        self._timer, self._timer_due = None, None
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, call = heapq.heappop(self._heap)
+            if call.cancelled:
+                continue
+            call.cancelled = True  # Already called: Cancelling has no effect anymore
+            try:
+                call.callback(*call.args)
+            except Exception:  # pylint: disable=broad-except
+                self.logger.exception("Scheduled call of '%s' failed", call.callback)
+        self._arm()
+
+
+class CronSchedule:
+    """
+    Computes the points in time (unix timestamps) when a cron expression fires. The fire times
+    of a day are computed once: Asking for the next fire time afterwards is a binary search.
+    Cron expressions are evaluated in local time.
+
+    Examples:
+
+        >>> dut = CronSchedule('*/15 8-9 * * 1-5 hello')  # Quarter hours from 8 to 10, mon-fri
+        >>> dut.comment
+        'hello'
+        >>> def _ts(*args): return datetime(*args).timestamp()
+        >>> datetime.fromtimestamp(dut.next_fire(_ts(2020, 6, 5, 8, 20)))  # Friday
+        datetime.datetime(2020, 6, 5, 8, 30)
+        >>> datetime.fromtimestamp(dut.next_fire(_ts(2020, 6, 5, 9, 45)))  # Next monday
+        datetime.datetime(2020, 6, 8, 8, 0)
+        >>> dut.fires_at(_ts(2020, 6, 8, 8, 0, 30)), dut.fires_at(_ts(2020, 6, 8, 8, 1))
+        (True, False)
+        >>> print(CronSchedule('0 0 30 2 *').next_fire(_ts(2020, 1, 1)))  # Never
+        None
+    """
+
+    # An expression that does not fire within this many days won't fire at all
+    MAX_DAYS = 366 * 8
+
+    def __init__(self, expression: Union[str, Any]):
+        if isinstance(expression, str):
+            from cronex import CronExpression  # type: ignore
+            expression = CronExpression(expression)
+        self.expression = expression
+        minutes, hours = expression.numerical_tab[0], expression.numerical_tab[1]
+        # Special atoms (e.g. periodic ones) have no plain values: Any minute / hour may match
+        self._exact = bool(minutes) and bool(hours)
+        self._minutes = sorted(minutes) or list(range(60))  # type: Sequence[int]
+        self._hours = sorted(hours) or list(range(24))  # type: Sequence[int]
+        self._day = None  # type: Optional[date]
+        self._day_times = []  # type: List[float]
+
+    @property
+    def comment(self) -> str:
+        """Returns the comment of the cron expression (anything after the five fields)."""
+        return str(self.expression.comment)
+
+    def _fire_times(self, day: date) -> List[float]:
+        if day != self._day:
+            check = self.expression.check_trigger
+            candidates = [(hour, minute) for hour in self._hours for minute in self._minutes]
+            if self._exact:
+                # Every candidate satisfies hour and minute: Only the day has to match
+                if not check((day.year, day.month, day.day) + candidates[0]):
+                    candidates = []
+            else:
+                candidates = [
+                    (hour, minute) for hour, minute in candidates
+                    if check((day.year, day.month, day.day, hour, minute))
+                ]
+            self._day_times = [
+                datetime(day.year, day.month, day.day, hour, minute).timestamp()
+                for hour, minute in candidates
+            ]
+            self._day = day
+        return self._day_times
+
+    def next_fire(self, after: float) -> Optional[float]:
+        """Returns the first point in time after `after` when the expression fires. Returns None
+        if the expression never fires."""
+        day = datetime.fromtimestamp(after).date()
+        for offset in range(self.MAX_DAYS):
+            times = self._fire_times(day + timedelta(days=offset))
+            index = bisect.bisect_right(times, after)
+            if index < len(times):
+                return times[index]
+        return None
+
+    def fires_at(self, timestamp: float) -> bool:
+        """Returns True if the expression fires in the minute of the given point in time."""
+        minute = datetime.fromtimestamp(timestamp).replace(second=0, microsecond=0)
+        times = self._fire_times(minute.date())
+        index = bisect.bisect_left(times, minute.timestamp())
+        return index < len(times) and times[index] == minute.timestamp()
+
+
+_SCHEDULERS = WeakKeyDictionary()  # type: WeakKeyDictionary[asyncio.AbstractEventLoop, Scheduler]
+
+
+def get_scheduler() -> Scheduler:
+    """Returns the scheduler of the current event loop. Every engine (and every worker process
+    of an engine) runs a single event loop: All its tasks share the same scheduler."""
+    loop = asyncio.get_event_loop()
+    scheduler = _SCHEDULERS.get(loop)
+    if scheduler is None:
+        scheduler = Scheduler(loop)
+        _SCHEDULERS[loop] = scheduler
+    return scheduler
@@ -0,0 +1,105 @@
+"""Jinja2 templating related utility classes."""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from jinja2 import BaseLoader, Environment, StrictUndefined, Template
+from jinja2.bccache import Bucket, BytecodeCache
+from jinja2.exceptions import UndefinedError
+
+from pnp.shared.exc import TemplateError
+
+
+class _SourceLoader(BaseLoader):
+    """The name of a template is its source. This way `Environment.get_template` can be used
+    to cache templates created from strings."""
+
+    def get_source(
+            self, environment: Environment, template: str
+    ) -> Tuple[str, Optional[str], Callable[[], bool]]:
+        return template, None, lambda: True
+
+
+class MemoryBytecodeCache(BytecodeCache):
+    """
+    Keeps the bytecode of the least recently used `size` templates in memory. Templates that
+    were evicted from the template cache of the environment don't need to be re-compiled.
+    """
+
+    def __init__(self, size: int = 1000):
+        self.size = max(1, int(size))
+        self._cache = OrderedDict()  # type: OrderedDict[str, bytes]
+        self._lock = threading.Lock()
+
+    def load_bytecode(self, bucket: Bucket) -> None:
+        with self._lock:
+            code = self._cache.get(bucket.key)
+            if code is None:
+                return
+            self._cache.move_to_end(bucket.key)
+        bucket.bytecode_from_string(code)
+
+    def dump_bytecode(self, bucket: Bucket) -> None:
+        code = bucket.bytecode_to_string()
+        with self._lock:
+            self._cache[bucket.key] = code
+            self._cache.move_to_end(bucket.key)
+            while len(self._cache) > self.size:
+                self._cache.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+class TemplateCache:
+    """
+    Compiles jinja2 templates once and hands out the compiled template for every subsequent
+    request of the same source. Undefined variables raise an error when rendering.
+
+    Examples:
+
+        >>> cache = TemplateCache()
+        >>> tpl = cache.get("Hello {{name}}")
+        >>> cache.get("Hello {{name}}") is tpl
+        True
+        >>> cache.render("Hello {{name}}", name="World")
+        'Hello World'
+        >>> cache.render("Hello {{name}}")
+        Traceback (most recent call last):
+        ...
+        pnp.shared.exc.TemplateError: Error when rendering template 'Hello {{name}}'
+    """
+
+    def __init__(self, size: int = 400, bytecode_size: int = 1000):
+        self.size = max(1, int(size))
+        self.environment = Environment(
+            loader=_SourceLoader(),
+            undefined=StrictUndefined,
+            cache_size=self.size,
+            bytecode_cache=MemoryBytecodeCache(bytecode_size),
+            auto_reload=False
+        )
+
+    def get(self, source: str) -> Template:
+        """Returns the compiled template of the given source."""
+        return self.environment.get_template(str(source))
+
+    def render(self, source: str, **subs: Any) -> str:
+        """Renders the template of the given source using the substitutions."""
+        return render(self.get(source), subs)
+
+
+def render(template: Template, subs: Optional[Dict[str, Any]] = None) -> str:
+    """Renders the compiled template. Undefined variables raise a `TemplateError`."""
+    try:
+        return template.render(**(subs or {}))
+    except UndefinedError as exc:
+        raise TemplateError(
+            "Error when rendering template '{}'".format(template.name)
+        ) from exc
+
+
+# Shared by everyone in this process
+TEMPLATES = TemplateCache()
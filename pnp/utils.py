@@ -1,6 +1,7 @@
 """Utility / helper functions, classes, decorators, ..."""
 
 # pylint: disable=too-many-lines
+import copy
 import inspect
 import logging
 import os
@@ -9,10 +10,13 @@ import sys
 import time
 from base64 import b64encode
 from collections import OrderedDict
+from collections.abc import ItemsView, KeysView, Mapping, MappingView, Sequence, ValuesView
 from datetime import datetime, timedelta
 from functools import wraps
 from threading import Timer
-from typing import (Union, Any, Optional, Iterable, Pattern, Dict, Callable, cast, Set, List)
+from typing import (
+    Union, Any, Optional, Iterable, Pattern, Dict, Callable, cast, Set, List, NoReturn
+)
 
 from binaryornot.check import is_binary  # type: ignore
 from box import Box, BoxKeyError  # type: ignore
@@ -37,10 +41,6 @@ class EvaluationError(Exception):
     """Is raised when a selector expression cannot be evaluated."""
 
 
-class StopCycleError(Exception):
-    """A callback of interruptable_sleep should call this, when the sleep should be interrupted."""
-
-
 def make_list(item_or_items: Any) -> Optional[List[Any]]:
     """
     Makes a list out of the given items.
@@ -122,7 +122,7 @@ def make_hashable(obj: Any) -> Any:
         >>> make_hashable({1: {2: [3, 4, 5]}})
         frozenset({(1, frozenset({(2, frozenset({3, 4, 5}))}))})
     """
-    if isinstance(obj, dict):
+    if isinstance(obj, Mapping):
         return frozenset({
             make_hashable(k): make_hashable(v)
             for k, v in obj.items()
@@ -264,65 +264,6 @@ def is_iterable_but_no_str(candidate: Any) -> bool:
     return hasattr(candidate, '__iter__') and not isinstance(candidate, (str, bytes))
 
 
-def interruptable_sleep(wait: float, callback: Callable[[], None], interval: float = 0.5) -> None:
-    """
-    Waits the specified amount of time. The waiting can be interrupted when the callback raises a
-    `StopCycleError`. The argument `interval` defines after how much wait time the callback
-    should be called.
-
-    Examples:
-
-        # Does perform two cycles of 0.2 secs and one 0.1
-        >>> interruptable_sleep(0.5, lambda: print("Cycle"), 0.2)
-        Cycle
-        Cycle
-        >>> i = 0
-        >>> def callback():
-        ...     global i
-        ...     if i == 2:
-        ...         raise StopCycleError()
-        ...     print("Cycle")
-        ...     i = i + 1
-        >>> interruptable_sleep(0.5, callback, 0.1)  # Aborts the wait after 2 cycles
-        Cycle
-        Cycle
-
-    Args:
-        wait (float): Wait for this amount of time, if not interrupted (same semantics as in
-            `time.sleep(wait)`.
-        callback: Callback that should raise an `StopCycleError` if the sleeps should be
-            interrupted.
-        interval (float): How often the callback should be called.
-
-    Returns:
-        None
-    """
-    def _cycles() -> int:
-        return int(float(wait) // float(interval))
-
-    complete_cycles = _cycles()
-    try:
-        for _ in range(0, complete_cycles):
-            callback()  # Should raise a StopCycleError error when waiting should be aborted
-            time.sleep(interval)
-
-        time.sleep(wait % interval)
-    except StopCycleError:
-        pass
-
-
-def sleep_until_interrupt(sleep_time: float, interrupt_fun: Callable[[], bool],
-                          interval: float = 0.5) -> None:
-    """Call this method to sleep an interruptable sleep until the interrupt function returns
-    True."""
-    validator.is_function(interrupt_fun=interrupt_fun)
-
-    def callback() -> None:
-        if interrupt_fun():
-            raise StopCycleError()
-    interruptable_sleep(sleep_time, callback, interval=interval)
-
-
 def make_public_protected_private_attr_lookup(attr_name: str, as_dict: bool = False) \
         -> Union[Dict[str, str], List[str]]:
     """
@@ -945,6 +886,297 @@ class FallbackBox(Box):  # type: ignore
             raise kerr
 
 
+def _raise_frozen(self: Any, *args: Any, **kwargs: Any) -> NoReturn:
+    raise TypeError(
+        "'{}' is frozen and shared between pushes. Copy it (copy.copy / dict / list) before "
+        "changing it".format(type(self).__name__)
+    )
+
+
+# Replaces the mutating methods of dict / list: Their signatures differ from each other
+_frozen_error = _raise_frozen  # type: Any
+
+
+class FrozenDict(dict):  # type: ignore
+    """An immutable dictionary. Copying it (`copy.copy` or `copy.deepcopy`) will return a
+    mutable `dict`. See `freeze`."""
+    __slots__ = []  # type: List[str]
+
+    __setitem__ = __delitem__ = _frozen_error
+    clear = pop = popitem = setdefault = update = _frozen_error
+    __ior__ = _frozen_error
+
+    def __copy__(self) -> Dict[Any, Any]:
+        return dict(self)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Dict[Any, Any]:
+        return {copy.deepcopy(k, memo): copy.deepcopy(v, memo) for k, v in self.items()}
+
+    def __reduce__(self) -> Any:
+        return type(self), (dict(self),)
+
+
+class FrozenList(list):  # type: ignore
+    """An immutable list. Copying it (`copy.copy` or `copy.deepcopy`) will return a
+    mutable `list`. See `freeze`."""
+    __slots__ = []  # type: List[str]
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _frozen_error
+    append = clear = extend = insert = pop = remove = reverse = sort = _frozen_error
+
+    def __copy__(self) -> List[Any]:
+        return list(self)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> List[Any]:
+        return [copy.deepcopy(item, memo) for item in self]
+
+    def __reduce__(self) -> Any:
+        return type(self), (list(self),)
+
+
+def freeze(obj: Any) -> Any:
+    """
+    Converts the given payload into an immutable representation that can be safely shared
+    by multiple pushes and selectors without copying it over and over again. Dictionaries and
+    lists (nested ones as well) are converted into `FrozenDict` and `FrozenList`; tuples are
+    frozen item by item. Any other object is returned as is. An already frozen payload
+    is returned without any conversion.
+
+    Examples:
+
+        >>> frozen = freeze({'a': [1, {'b': 2}]})
+        >>> frozen
+        {'a': [1, {'b': 2}]}
+        >>> isinstance(frozen, dict), isinstance(frozen['a'], list)
+        (True, True)
+        >>> frozen['a'][1]['b'] = 3
+        Traceback (most recent call last):
+        ...
+        TypeError: 'FrozenDict' is frozen and shared between pushes. Copy it (copy.copy / dict / \
+list) before changing it
+        >>> freeze(frozen) is frozen
+        True
+        >>> import copy
+        >>> thawed = copy.deepcopy(frozen)
+        >>> type(thawed), type(thawed['a']), type(thawed['a'][1])
+        (<class 'dict'>, <class 'list'>, <class 'dict'>)
+    """
+    if isinstance(obj, (FrozenDict, FrozenList)):
+        return obj
+    if isinstance(obj, dict):
+        return FrozenDict((key, freeze(val)) for key, val in obj.items())
+    if isinstance(obj, list):
+        return FrozenList(freeze(item) for item in obj)
+    if isinstance(obj, tuple) and type(obj) is tuple:  # pylint: disable=unidiomatic-typecheck
+        return tuple(freeze(item) for item in obj)
+    return obj
+
+
+def _safe_attr_name(key: Any) -> str:
+    """Converts a key into something that is accessible as an attribute (like Box does)."""
+    name = re.sub('[^a-zA-Z0-9_]', '_', str(key).strip().replace(' ', '_')).strip('_')
+    return re.sub('_+', '_', name)
+
+
+class PayloadView:
+    """
+    A lazy read-only view on a (nested) payload. Like the `FallbackBox` it provides dot access
+    to dictionary keys and the fallback from int / float keys to str keys. But nothing is
+    copied or converted upfront: Nested dictionaries and lists are wrapped on access. So memory
+    and cpu scale with the parts of the payload that are actually accessed.
+
+    Use `PayloadView.wrap(payload)` to create a view and `PayloadView.unwrap(result)` to get
+    the original objects back.
+
+    Examples:
+
+        >>> d = {'devices': {'1': {'instances': {'0': 'instance0', 1: 'instance1'}}}}
+        >>> dut = PayloadView.wrap(d)
+        >>> dut.devices[1].instances[0]
+        'instance0'
+        >>> dut.devices[1].instances[1]
+        'instance1'
+        >>> dut['devices']['1'].instances
+        {'0': 'instance0', 1: 'instance1'}
+        >>> PayloadView.unwrap(dut.devices) is d['devices']
+        True
+        >>> dut.unknown
+        Traceback (most recent call last):
+        ...
+        AttributeError: unknown
+        >>> PayloadView.wrap([{'a': 1}, {'a': 2}])[1].a
+        2
+        >>> PayloadView.wrap(42)  # Scalars are passed as is
+        42
+    """
+    __slots__ = ['_obj']
+    _obj: Any
+
+    def __init__(self, obj: Any):
+        object.__setattr__(self, '_obj', obj)
+
+    @classmethod
+    def wrap(cls, obj: Any) -> Any:
+        """Wraps dictionaries and lists; any other object is returned as is."""
+        if isinstance(obj, dict):
+            return DictView(obj)
+        if isinstance(obj, list):
+            return ListView(obj)
+        return obj
+
+    @classmethod
+    def unwrap(cls, obj: Any) -> Any:
+        """Returns the original object of a view. Views inside of lists, tuples or dictionaries
+        are unwrapped as well."""
+        if isinstance(obj, PayloadView):
+            return object.__getattribute__(obj, '_obj')
+        if isinstance(obj, MappingView):
+            mapping = getattr(obj, '_mapping', None)
+            if isinstance(mapping, PayloadView):
+                # keys() / values() / items() of a view: The same of the original dictionary
+                original = object.__getattribute__(mapping, '_obj')
+                if isinstance(obj, KeysView):
+                    return original.keys()
+                if isinstance(obj, ValuesView):
+                    return original.values()
+                if isinstance(obj, ItemsView):
+                    return original.items()
+            return obj
+        if isinstance(obj, (FrozenDict, FrozenList)):
+            return obj  # Cannot contain any views
+        if isinstance(obj, dict):
+            return {cls.unwrap(k): cls.unwrap(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [cls.unwrap(item) for item in obj]
+        if isinstance(obj, tuple):
+            return tuple(cls.unwrap(item) for item in obj)
+        return obj
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise TypeError("'{}' is read-only".format(type(self).__name__))
+
+    def __len__(self) -> int:
+        return len(self._obj)
+
+    def __contains__(self, item: Any) -> bool:
+        return PayloadView.unwrap(item) in self._obj
+
+    def __eq__(self, other: Any) -> bool:
+        return bool(self._obj == PayloadView.unwrap(other))
+
+    def __ne__(self, other: Any) -> bool:
+        return not self == other
+
+    __hash__ = None  # type: ignore
+
+    def __bool__(self) -> bool:
+        return bool(self._obj)
+
+    def __repr__(self) -> str:
+        return repr(self._obj)
+
+    def __str__(self) -> str:
+        return str(self._obj)
+
+
+class DictView(PayloadView, Mapping):  # type: ignore
+    """Lazy read-only view on a dictionary. See `PayloadView`."""
+    __slots__ = []  # type: List[str]
+
+    def __getitem__(self, item: Any) -> Any:
+        try:
+            return PayloadView.wrap(self._obj[item])
+        except KeyError:
+            if isinstance(item, (int, float)):
+                return PayloadView.wrap(self._obj[str(item)])
+            raise
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('__'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            pass
+        # Keys that are not valid attribute names: `my key` is accessible via `my_key`
+        for key in self._obj:
+            if isinstance(key, str) and _safe_attr_name(key) == name:
+                return self[key]
+        raise AttributeError(name)
+
+    def __iter__(self) -> Any:
+        return iter(self._obj)
+
+    def __or__(self, other: Any) -> Any:
+        other = PayloadView.unwrap(other)
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        res = dict(self._obj)
+        res.update(other)
+        return DictView(res)
+
+    def __ror__(self, other: Any) -> Any:
+        other = PayloadView.unwrap(other)
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        res = dict(other)
+        res.update(self._obj)
+        return DictView(res)
+
+    def copy(self) -> Dict[Any, Any]:
+        """Returns a mutable shallow copy of the dictionary."""
+        return dict(self._obj)
+
+    def to_dict(self) -> Dict[Any, Any]:
+        """Returns a mutable deep copy of the dictionary."""
+        return copy.deepcopy(dict(self._obj))
+
+
+class ListView(PayloadView, Sequence):  # type: ignore
+    """Lazy read-only view on a list. See `PayloadView`."""
+    __slots__ = []  # type: List[str]
+
+    def __getitem__(self, item: Any) -> Any:
+        if isinstance(item, slice):
+            return ListView(self._obj[item])
+        return PayloadView.wrap(self._obj[item])
+
+    def __iter__(self) -> Any:
+        return (PayloadView.wrap(item) for item in self._obj)
+
+    def __add__(self, other: Any) -> Any:
+        return ListView(list(self._obj) + list(PayloadView.unwrap(other)))
+
+    def __radd__(self, other: Any) -> Any:
+        return ListView(list(PayloadView.unwrap(other)) + list(self._obj))
+
+    def __mul__(self, other: Any) -> Any:
+        return ListView(list(self._obj) * other)
+
+    __rmul__ = __mul__
+
+    # Ordering like the original list: sorted(), min() and max() work on lists of lists
+    def __lt__(self, other: Any) -> bool:
+        return bool(self._obj < PayloadView.unwrap(other))
+
+    def __le__(self, other: Any) -> bool:
+        return bool(self._obj <= PayloadView.unwrap(other))
+
+    def __gt__(self, other: Any) -> bool:
+        return bool(self._obj > PayloadView.unwrap(other))
+
+    def __ge__(self, other: Any) -> bool:
+        return bool(self._obj >= PayloadView.unwrap(other))
+
+    def copy(self) -> List[Any]:
+        """Returns a mutable shallow copy of the list."""
+        return list(self._obj)
+
+    def to_list(self) -> List[Any]:
+        """Returns a mutable deep copy of the list."""
+        return copy.deepcopy(list(self._obj))
+
+
 class Debounce:
     """
     Defers a function execution until `wait` seconds have elapsed since the last time it was
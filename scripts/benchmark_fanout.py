@@ -0,0 +1,86 @@
+"""Compares the cost of fanning out large payloads to many pushes between the current tree and a
+baseline revision (e.g. the last one that copied the payload for each push and once again for
+its envelope). Both run the very same pushes against the very same payload stream.
+
+Usage:
+
+    python scripts/benchmark_fanout.py <baseline revision>
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESOURCE = os.path.join(ROOT, 'tests/resources/zway/all_device_data.json')
+FAN_OUT = 10
+ROUNDS = 20
+
+
+def bench() -> float:
+    """Runs the benchmark against the importable pnp and returns the elapsed seconds."""
+    from pnp.engines import PushExecutor
+    from pnp.models import PushModel
+    from pnp.plugins.push import AsyncPush, enveloped
+
+    class EnvelopedNop(AsyncPush):
+        """Splits envelope and payload and returns the payload."""
+
+        @enveloped
+        async def _push(self, envelope, payload):  # pylint: disable=arguments-differ
+            _ = envelope  # Fake usage
+            return payload
+
+    with open(RESOURCE, 'r') as fp:
+        data = fp.read()
+    # Parsing is not part of the measurement: Every round gets a payload of its own
+    stream = [{'data': json.loads(data), 'topic': 'zway/devices'} for _ in range(ROUNDS)]
+    pushes = [PushModel(instance=EnvelopedNop(name='nop_{}'.format(i))) for i in range(FAN_OUT)]
+    executor = PushExecutor()
+
+    async def fan_out() -> None:
+        # Like the engine does: Each push of the task gets the same payload
+        for payload in stream:
+            await asyncio.gather(*[executor.execute('bench', payload, push) for push in pushes])
+
+    loop = asyncio.new_event_loop()
+    elapsed = timeit.timeit(lambda: loop.run_until_complete(fan_out()), number=1)
+    if hasattr(executor, 'close'):
+        loop.run_until_complete(executor.close())
+    loop.close()
+    return elapsed
+
+
+def run(path: str) -> float:
+    """Runs the benchmark in a separate interpreter against the pnp found in the given path."""
+    env = dict(os.environ, PYTHONPATH=path)
+    output = subprocess.check_output(
+        [sys.executable, os.path.abspath(__file__), '--bench'], env=env, cwd=path
+    )
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def main() -> None:
+    """Runs the benchmark against the baseline revision and the current tree."""
+    if sys.argv[1:] == ['--bench']:
+        print(bench())
+        return
+    if len(sys.argv) != 2:
+        sys.exit(__doc__)
+
+    with tempfile.TemporaryDirectory() as baseline:
+        archive = subprocess.check_output(['git', 'archive', sys.argv[1], 'pnp'], cwd=ROOT)
+        subprocess.run(['tar', '-x', '-C', baseline], input=archive, check=True)
+        with open(RESOURCE, 'r') as fp:
+            size = len(fp.read())
+        print("Payload: {} bytes, fan-out: {} pushes, {} rounds".format(size, FAN_OUT, ROUNDS))
+        print("Baseline ({}): {:.4f}s".format(sys.argv[1], run(baseline)))
+        print("Current tree:  {:.4f}s".format(run(ROOT)))
+
+
+if __name__ == '__main__':
+    main()
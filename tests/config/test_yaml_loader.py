@@ -202,3 +202,38 @@ def test_yaml_tag_env_with_envvar_not_set():
         config = dut.load_config(path_to_config('yaml_tag_env/config.yaml'))
 
 
+def test_mk_push_concurrency_and_ordering():
+    from pnp.config._yaml import Schemas
+
+    input = {
+        'name': 'pytest',
+        'push': [Schemas.Push.validate({
+            'plugin': 'pnp.plugins.push.simple.Echo',
+            'max_concurrency': 2,
+            'executor': 'process',
+            'deps': [{'plugin': 'pnp.plugins.push.simple.Echo', 'ordered': 'data.topic'}]
+        })]
+    }
+    input['push'][0]['deps'] = [Schemas.Push.validate(dep) for dep in input['push'][0]['deps']]
+    push, = _mk_push(Box(input))
+    assert push.max_concurrency == 2
+    assert push.ordered is False
+    assert push.executor == 'process'
+    dep, = push.deps
+    assert dep.max_concurrency is None
+    assert dep.ordered == 'data.topic'
+    assert dep.executor == 'thread'
+
+    with pytest.raises(Exception, match="max_concurrency has to be positive"):
+        Schemas.Push.validate({'plugin': 'pnp.plugins.push.simple.Echo', 'max_concurrency': 0})
+
+
+@pytest.mark.parametrize("ordered", ['yes', '1', 'true'])
+def test_push_model_ordered_strings_are_selectors(ordered):
+    from pnp.models import PushModel
+    from pnp.plugins.push.simple import Echo
+    push = PushModel(instance=Echo(name='pytest'), ordered=ordered)
+    assert push.ordered == ordered
+    assert PushModel(instance=Echo(name='pytest'), ordered=True).ordered is True
+    with pytest.raises(Exception):
+        Schemas.Push.validate({'plugin': 'pnp.plugins.push.simple.Echo', 'executor': 'gpu'})
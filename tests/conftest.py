@@ -1,3 +1,4 @@
+import asyncio
 import os
 import socket
 from contextlib import contextmanager
@@ -58,3 +59,17 @@ async def api_client_async(*endpoints: Endpoint) -> AsyncClient:
 
     async with AsyncClient(app=rest.fastapi, base_url="http://test") as testclient:
         yield testclient
+
+
+#
+# Engine related
+#
+
+def run_engine(engine, tasks):
+    """Starts the engine in a new event loop and blocks until it stopped."""
+    async def _run():
+        await engine.start(tasks)
+        while engine.is_running:
+            await asyncio.sleep(0.1)
+
+    asyncio.new_event_loop().run_until_complete(_run())
@@ -1,4 +1,6 @@
 import asyncio
+import concurrent.futures
+import threading
 import time
 from functools import partial
 from threading import Thread
@@ -7,22 +9,11 @@ import pytest
 
 from pnp.engines import AsyncEngine, NoRetryHandler
 from pnp.models import TaskModel, PullModel, PushModel
+from pnp.plugins.pull import SyncPull
 from pnp.plugins.pull.simple import Count
+from pnp.plugins.push import AsyncPush, BatchPush, SyncPush
 from pnp.plugins.push.simple import Echo
-
-
-def _run_engine(engine, tasks):
-    async def run_engine():
-        try:
-            await engine.start(tasks)
-            while engine.is_running:
-                await asyncio.sleep(0.1)
-        except:
-            import traceback
-            traceback.print_exc()
-
-    loop = asyncio.new_event_loop()
-    loop.run_until_complete(run_engine())
+from tests.conftest import run_engine
 
 
 @pytest.mark.asyncio
@@ -34,7 +25,7 @@ async def test_async_engine_for_smoke():
         pull=PullModel(instance=Count(name='count', from_cnt=0, wait=0.5)),
         pushes=[PushModel(instance=Echo(name='echo'), selector=None, deps=deps, unwrap=False)]
     )}
-    t = Thread(target=partial(_run_engine, engine=engine, tasks=tasks))
+    t = Thread(target=partial(run_engine, engine=engine, tasks=tasks))
     try:
         t.start()
         time.sleep(1)
@@ -49,3 +40,206 @@ def test_async_engine_repr():
     dut = AsyncEngine(retry_handler=NoRetryHandler())
     assert repr(dut) == "AsyncEngine(is_running=False, retry_handler=NoRetryHandler())"
     assert str(dut) == "AsyncEngine(is_running=False, retry_handler=NoRetryHandler())"
+
+
+class Collect(AsyncPush):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.payloads = []
+
+    async def _push(self, payload):
+        await asyncio.sleep(0.01)
+        self.payloads.append(payload)
+        return payload
+
+
+def _counting_tasks(push, deps=None):
+    return {'pytest': TaskModel(
+        name="pytest",
+        pull=PullModel(instance=Count(name='count', from_cnt=1, to_cnt=5, interval=0.01)),
+        pushes=[PushModel(instance=push, selector=None, deps=deps or [], unwrap=False)]
+    )}
+
+
+def test_async_engine_processes_queued_payloads():
+    push, dep = Collect(name='collect'), Collect(name='dep')
+    deps = [PushModel(instance=dep, selector="payload * 10", deps=[], unwrap=False)]
+    engine = AsyncEngine(retry_handler=NoRetryHandler(), queue_size=2, workers=1)
+    run_engine(engine, _counting_tasks(push, deps))
+
+    assert push.payloads == [1, 2, 3, 4, 5]
+    assert dep.payloads == [10, 20, 30, 40, 50]
+
+
+def test_async_engine_invalid_overflow_policy():
+    with pytest.raises(ValueError):
+        AsyncEngine(queue_overflow='unknown')
+
+
+def test_async_engine_sync_pull_handoff():
+    class Burst(SyncPull):
+        @property
+        def can_exit(self):
+            return True
+
+        def _pull(self):
+            for i in range(100):
+                self.notify(i)
+
+    push = Collect(name='collect')
+    tasks = {'pytest': TaskModel(
+        name="pytest",
+        pull=PullModel(instance=Burst(name='burst')),
+        pushes=[PushModel(instance=push, selector=None, deps=[], unwrap=False)]
+    )}
+    engine = AsyncEngine(retry_handler=NoRetryHandler(), queue_size=5, workers=1)
+    run_engine(engine, tasks)
+
+    assert push.payloads == list(range(100))
+
+
+def test_async_engine_sync_pull_block_bounds_the_queue():
+    class Burst(SyncPull):
+        @property
+        def can_exit(self):
+            return True
+
+        def _pull(self):
+            for i in range(2000):
+                self.notify(i)
+
+    class Peak(AsyncPush):
+        peak = 0
+        payloads = []
+
+        async def _push(self, payload):
+            await asyncio.sleep(0)
+            self.peak = max(self.peak, engine._queues['pytest'].pending, len(engine._handoff))
+            self.payloads.append(payload)
+            return payload
+
+    push = Peak(name='peak')
+    tasks = {'pytest': TaskModel(
+        name="pytest",
+        pull=PullModel(instance=Burst(name='burst')),
+        pushes=[PushModel(instance=push, selector=None, deps=[], unwrap=False)]
+    )}
+    engine = AsyncEngine(retry_handler=NoRetryHandler(), queue_size=5, workers=1)
+    run_engine(engine, tasks)
+
+    assert push.payloads == list(range(2000))
+    assert push.peak <= 5
+
+
+def test_async_engine_async_pull_backlog_keeps_order_and_is_bounded():
+    from pnp.plugins.pull import AsyncPull
+
+    class AsyncBurst(AsyncPull):
+        @property
+        def can_exit(self):
+            return True
+
+        async def _pull(self):
+            for i in range(10):
+                self.notify(i)  # On the event loop: Cannot wait for space
+
+    push = Collect(name='collect')
+    tasks = {'pytest': TaskModel(
+        name="pytest",
+        pull=PullModel(instance=AsyncBurst(name='burst')),
+        pushes=[PushModel(instance=push, selector=None, deps=[], unwrap=False)]
+    )}
+    run_engine(AsyncEngine(retry_handler=NoRetryHandler(), queue_size=2, workers=1), tasks)
+
+    # Two queued, two in the backlog: The rest is dropped
+    assert push.payloads == [0, 1, 2, 3]
+
+
+def test_async_engine_fan_out_shares_frozen_payload():
+    class Once(SyncPull):
+        @property
+        def can_exit(self):
+            return True
+
+        def _pull(self):
+            self.notify({'data': {'values': [1, 2, 3]}, 'topic': 'pytest'})
+
+    pushes = [Collect(name='collect{}'.format(i)) for i in range(3)]
+    tasks = {'pytest': TaskModel(
+        name="pytest",
+        pull=PullModel(instance=Once(name='once')),
+        pushes=[PushModel(instance=push) for push in pushes]
+    )}
+    run_engine(AsyncEngine(retry_handler=NoRetryHandler()), tasks)
+
+    first, second, third = [push.payloads[0] for push in pushes]
+    assert first is second is third
+    assert first == {'data': {'values': [1, 2, 3]}, 'topic': 'pytest'}
+    with pytest.raises(TypeError, match="is frozen"):
+        first['data']['values'].append(4)
+
+
+def test_async_engine_flushes_batch_pushes_on_stop():
+    class Batches(BatchPush):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.batches = []
+
+        def _push_batch(self, payloads):
+            self.batches.append(payloads)
+
+    push, dep = Batches(name='batch', batch_size=2, batch_interval=60), Batches(name='dep')
+    deps = [PushModel(instance=dep, selector="payload * 10", deps=[], unwrap=False)]
+    run_engine(AsyncEngine(retry_handler=NoRetryHandler(), workers=1), _counting_tasks(push, deps))
+
+    assert push.batches == [[1, 2], [3, 4], [5]]
+    assert dep.batches == [[10, 20, 30, 40, 50]]
+
+
+def test_async_engine_leaves_the_default_executor_alone():
+    class Once(SyncPull):
+        @property
+        def can_exit(self):
+            return True
+
+        def _pull(self):
+            self.notify(1)
+
+    tasks = {'pytest': TaskModel(
+        name="pytest",
+        pull=PullModel(instance=Once(name='once')),
+        pushes=[PushModel(instance=Collect(name='collect'))]
+    )}
+
+    async def main():
+        loop = asyncio.get_event_loop()
+        default = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        loop.set_default_executor(default)
+        engine = AsyncEngine(retry_handler=NoRetryHandler())
+        await engine.start(tasks)
+        assert engine._executor is not default
+        while engine.is_running:
+            await asyncio.sleep(0.05)
+        # The executor of the engine is shut down: The default executor is still usable
+        res = await loop.run_in_executor(None, threading.current_thread)
+        default.shutdown()
+        return res
+
+    assert not asyncio.new_event_loop().run_until_complete(main()).name.startswith('pnp')
+
+
+def test_async_engine_runs_sync_pushes_in_its_executor():
+    class Where(SyncPush):
+        threads = []
+
+        def _push(self, payload):
+            self.threads.append(threading.current_thread().name)
+            return payload
+
+    run_engine(AsyncEngine(retry_handler=NoRetryHandler()), _counting_tasks(Where(name='sync')))
+    assert Where.threads and all(name.startswith('pnp-executor') for name in Where.threads)
+
+
+def test_async_engine_executor_workers_have_to_be_positive():
+    with pytest.raises(ValueError, match="executor_workers has to be positive"):
+        AsyncEngine(executor_workers=0)
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import os
+
+import pytest
+
+from pnp.engines import ProcessEngine, NoRetryHandler, SimpleRetryHandler
+from pnp.models import TaskModel, PullModel, PushModel
+from pnp.plugins.pull.simple import Count
+from pnp.plugins.push import AsyncPush
+from tests.conftest import run_engine
+
+
+class Record(AsyncPush):
+    """Appends the payload and the pid of the worker process to a file."""
+
+    def __init__(self, path, crash_marker=None, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.crash_marker = crash_marker
+
+    async def _push(self, payload):
+        if self.crash_marker and not os.path.exists(self.crash_marker):
+            open(self.crash_marker, 'w').close()
+            os._exit(3)
+        self.logger.info("Recording %s", payload)
+        with open(self.path, 'a') as fp:
+            fp.write("{} {}\n".format(os.getpid(), payload))
+        return payload
+
+
+def _tasks(tmp_path, names, **push_args):
+    return {name: TaskModel(
+        name=name,
+        pull=PullModel(instance=Count(name=name, from_cnt=1, to_cnt=5, interval=0.01)),
+        pushes=[PushModel(instance=Record(path=str(tmp_path / name), name=name, **push_args))]
+    ) for name in names}
+
+
+def _records(tmp_path, name):
+    with open(str(tmp_path / name)) as fp:
+        return [line.split() for line in fp.read().splitlines()]
+
+
+def test_process_engine_shards_tasks(tmp_path, caplog):
+    caplog.set_level(logging.INFO)
+    dut = ProcessEngine(processes=2, retry_handler=NoRetryHandler())
+    run_engine(dut, _tasks(tmp_path, ['a', 'b']))
+
+    pids = set()
+    for name in ('a', 'b'):
+        records = _records(tmp_path, name)
+        assert [payload for _, payload in records] == ['1', '2', '3', '4', '5']
+        pids |= {pid for pid, _ in records}
+    assert len(pids) == 2 and str(os.getpid()) not in pids
+
+    # Statistics and log records are sent to the parent
+    assert dut.stats()['a']['payloads'] == 5
+    assert dut.stats()['b']['failed'] == 0
+    assert {shard.name for shard in dut.shards} == {'pnp-shard-0', 'pnp-shard-1'}
+    recorded = [rec for rec in caplog.records if rec.getMessage().startswith('[a] Recording')]
+    assert len(recorded) == 5
+    assert recorded[0].processName == 'pnp-shard-0'
+
+
+def test_process_engine_restarts_crashed_worker(tmp_path):
+    marker = str(tmp_path / 'crashed')
+    # The retry handler of the pulls does not affect the restarts
+    dut = ProcessEngine(
+        processes=1, retry_handler=NoRetryHandler(),
+        restart_handler=SimpleRetryHandler(retry_wait=0)
+    )
+    run_engine(dut, _tasks(tmp_path, ['a'], crash_marker=marker))
+
+    assert os.path.exists(marker)
+    shard, = dut.shards
+    assert shard.restarts == 1
+    assert [payload for _, payload in _records(tmp_path, 'a')] == ['1', '2', '3', '4', '5']
+
+
+def test_process_engine_no_restart(tmp_path):
+    marker = str(tmp_path / 'crashed')
+    dut = ProcessEngine(
+        processes=1, retry_handler=SimpleRetryHandler(retry_wait=0),
+        restart_handler=NoRetryHandler()
+    )
+    run_engine(dut, _tasks(tmp_path, ['a'], crash_marker=marker))
+
+    shard, = dut.shards
+    assert shard.restarts == 0
+    assert not shard.alive and shard.exitcode != 0
+    assert not os.path.exists(str(tmp_path / 'a'))
+
+
+def test_process_engine_repr():
+    dut = ProcessEngine(processes=2, retry_handler=NoRetryHandler())
+    assert repr(dut) == (
+        "ProcessEngine(is_running=False, processes=2, restart_handler=AdvancedRetryHandler("
+        "max_retries=5, reset_retry_threshold=60, retry_count=0, retry_wait=10), "
+        "retry_handler=NoRetryHandler())"
+    )
+
+
+def test_process_engine_graceful_stop(tmp_path):
+    from prometheus_client import REGISTRY
+
+    tasks = {'endless': TaskModel(
+        name='endless',
+        pull=PullModel(instance=Count(name='endless', interval=0.01)),
+        pushes=[PushModel(instance=Record(path=str(tmp_path / 'endless'), name='endless'))]
+    )}
+    dut = ProcessEngine(processes=2, retry_handler=NoRetryHandler())
+
+    async def run():
+        await dut.start(tasks)
+        await asyncio.sleep(0.5)
+        assert REGISTRY.get_sample_value('pnp_shard_up', {'shard': 'pnp-shard-0'}) == 1
+        await dut.stop()
+
+    asyncio.new_event_loop().run_until_complete(run())
+    shard, = dut.shards  # Only one task: The second worker process is not needed
+    assert not shard.alive and shard.exitcode == 0
+    assert len(_records(tmp_path, 'endless')) > 0
+    assert REGISTRY.get_sample_value('pnp_shard_up', {'shard': 'pnp-shard-0'}) is None
+
+
+@pytest.mark.asyncio
+async def test_process_engine_forwards_trigger_to_the_worker(tmp_path):
+    from pnp.plugins.pull.simple import CustomPolling
+
+    tasks = {'a': TaskModel(
+        name='a',
+        pull=PullModel(instance=CustomPolling(name='a', interval=None, scheduled_callable=lambda: 42)),
+        pushes=[PushModel(instance=Record(path=str(tmp_path / 'a'), name='a'))]
+    )}
+    dut = ProcessEngine(processes=1, retry_handler=NoRetryHandler())
+    await dut.start(tasks)
+    try:
+        await dut.trigger(tasks['a'])
+        for _ in range(50):
+            if (tmp_path / 'a').exists():
+                break
+            await asyncio.sleep(0.1)
+        (pid, payload), = _records(tmp_path, 'a')
+        assert payload == '42' and pid != str(os.getpid())
+    finally:
+        await dut.stop()
+
+    with pytest.raises(RuntimeError, match="is not running"):
+        await dut.trigger(tasks['a'])
@@ -2,6 +2,7 @@ import pytest
 
 from pnp.engines import PushExecutor
 from pnp.models import PushModel
+from pnp.plugins.push import SyncPush
 from pnp.plugins.push.simple import Nop
 
 
@@ -85,3 +86,248 @@ async def test_push_executor_unwrap_selector():
         call_cnt += 1
     await dut.execute("id", input, push, result_callback=callback)
     assert call_cnt == 3
+
+
+@pytest.mark.asyncio
+async def test_push_executor_selector_inline_or_offloaded():
+    import threading
+    from pnp.selector import PayloadSelector
+
+    threads = []
+
+    def where_am_i(payload):
+        threads.append(threading.current_thread())
+        return payload
+
+    PayloadSelector().register_custom_global('where_am_i', where_am_i)
+    dut = PushExecutor()
+
+    # A cheap selector is evaluated directly on the event loop...
+    cheap = PushModel(instance=Nop(name='pytest'), selector="data.a", unwrap=False, deps=[])
+    await dut.execute("id", dict(a=1), cheap)
+    assert PayloadSelector().compile_selector("data.a").inline
+
+    # ... a selector calling a user-defined function is offloaded to the executor
+    udf = PushModel(instance=Nop(name='pytest'), selector="where_am_i(data)", unwrap=False, deps=[])
+    await dut.execute("id", 42, udf)
+    assert udf.instance.last_payload == 42
+    assert threads == [threads[0]] and threads[0] is not threading.current_thread()
+
+
+class Recorder(Nop):
+    calls = []
+
+    async def _push(self, payload):
+        Recorder.calls.append((self.name, payload))
+        return payload
+
+
+@pytest.mark.asyncio
+async def test_push_plan_depth_first():
+    from pnp.engines import PushPlan
+
+    Recorder.calls = []
+    grand_child = PushModel(instance=Recorder(name='grand_child'), selector="data.upper()")
+    child1 = PushModel(instance=Recorder(name='child1'), deps=[grand_child])
+    child2 = PushModel(instance=Recorder(name='child2'), selector="SUPPRESS if data == 'b' else data")
+    root = PushModel(instance=Recorder(name='root'), unwrap=True, deps=[child1, child2])
+
+    dut = PushPlan(root)
+    assert len(dut) == 4
+    await dut.run('pytest', ['a', 'b'])
+    assert Recorder.calls == [
+        ('root', 'a'), ('child1', 'a'), ('grand_child', 'A'), ('child2', 'a'),
+        ('root', 'b'), ('child1', 'b'), ('grand_child', 'B')
+    ]
+
+    # The plan does not touch the models anymore
+    root.deps = []
+    Recorder.calls = []
+    await dut.run('pytest', 'c')
+    assert [name for name, _ in Recorder.calls] == ['root', 'child1', 'grand_child', 'child2']
+
+
+class Slow(Nop):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.running = 0
+        self.max_running = 0
+        self.done = []
+
+    async def _push(self, payload):
+        import asyncio
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        # The first payload of each key takes the longest
+        await asyncio.sleep(0.05 if payload['seq'] == 0 else 0.01)
+        self.running -= 1
+        self.done.append((payload['topic'], payload['seq']))
+        return payload
+
+
+def _messages():
+    return [dict(topic=topic, seq=seq) for seq in range(3) for topic in ('a', 'b')]
+
+
+@pytest.mark.asyncio
+async def test_push_plan_max_concurrency():
+    import asyncio
+    from pnp.engines import PushPlan
+
+    push = PushModel(instance=Slow(name='pytest'), max_concurrency=2)
+    dut = PushPlan(push)
+    await asyncio.gather(*[dut.run('pytest', msg) for msg in _messages()])
+    assert push.instance.max_running == 2
+    assert len(push.instance.done) == 6
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ordered,max_running", [(True, 1), ("data.topic", 2)])
+async def test_push_plan_ordered(ordered, max_running):
+    import asyncio
+    from pnp.engines import PushPlan
+
+    push = PushModel(instance=Slow(name='pytest'), ordered=ordered)
+    dut = PushPlan(push)
+    await asyncio.gather(*[dut.run('pytest', msg) for msg in _messages()])
+    assert push.instance.max_running == max_running
+    for topic in ('a', 'b'):
+        assert [seq for tpc, seq in push.instance.done if tpc == topic] == [0, 1, 2]
+    assert len(dut._order_locks) == 0
+
+
+@pytest.mark.asyncio
+async def test_push_plan_ordered_offloaded_key():
+    import asyncio
+    import threading
+    from pnp.engines import PushPlan
+
+    push = PushModel(instance=Slow(name='pytest'), ordered='data.topic')
+    dut = PushPlan(push)
+    threads = set()
+    select = dut._order_key.fun
+
+    def _slow_key(payload):
+        import time
+        threads.add(threading.get_ident())
+        # The key of the first payloads takes the longest
+        time.sleep(0.03 if payload['seq'] == 0 else 0)
+        return select(payload)
+    dut._order_key.fun = _slow_key
+    dut._order_key.calls_udf = True  # Never inline
+
+    await asyncio.gather(*[dut.run('pytest', msg) for msg in _messages()])
+    assert threading.get_ident() not in threads
+    for topic in ('a', 'b'):
+        assert [seq for tpc, seq in push.instance.done if tpc == topic] == [0, 1, 2]
+    assert len(dut._order_locks) == 0
+
+
+@pytest.mark.asyncio
+async def test_push_plan_dependency_with_limits():
+    import asyncio
+    from pnp.engines import PushPlan
+
+    dep = PushModel(instance=Slow(name='dep'), ordered=True)
+    root = PushModel(instance=Nop(name='root'), deps=[dep])
+    dut = PushPlan(root)
+    await asyncio.gather(*[dut.run('pytest', msg) for msg in _messages()])
+    assert dep.instance.max_running == 1
+    assert dep.instance.done == [(msg['topic'], msg['seq']) for msg in _messages()]
+
+
+class Warm(SyncPush):
+    """Counts the calls per worker process."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    def _push(self, payload):
+        import os
+        self.calls += 1
+        return dict(pid=os.getpid(), calls=self.calls, size=len(payload))
+
+
+@pytest.mark.asyncio
+async def test_push_plan_process_executor():
+    import os
+    from pnp.engines import PushPlan
+
+    dep = Recorder(name='dep')
+    push = PushModel(
+        instance=Warm(name='warm'), executor='process', max_concurrency=1,
+        deps=[PushModel(instance=dep)]
+    )
+    dut = PushPlan(push)
+    Recorder.calls = []
+    try:
+        await dut.run('pytest', b'x' * 1024)
+        await dut.run('pytest', b'y' * 10)
+    finally:
+        await dut.close()
+
+    (_, first), (_, second) = Recorder.calls
+    assert first['pid'] == second['pid'] != os.getpid()
+    assert (first['calls'], first['size']) == (1, 1024)
+    assert (second['calls'], second['size']) == (2, 10)
+    assert push.instance.calls == 0  # The instance of the main process is untouched
+
+
+def test_push_plan_process_executor_async_push():
+    from pnp.engines import PushPlan
+
+    with pytest.raises(ValueError, match="Only synchronous pushes can run in worker processes"):
+        PushPlan(PushModel(instance=Recorder(name='async'), executor='process'))
+
+
+@pytest.mark.asyncio
+async def test_push_executor_reuses_the_plan(mocker):
+    import pnp.engines._base as base
+    compile_spy = mocker.spy(base.PushPlan, '_compile')
+    push_instance = Nop(name='pytest')
+    push = PushModel(instance=push_instance, selector=None, deps=[], unwrap=False)
+    other = PushModel(instance=push_instance, selector=None, deps=[], unwrap=False)
+
+    dut = PushExecutor()
+    for i in range(3):
+        await dut.execute("id", i, push)
+    assert compile_spy.call_count == 1
+    await dut.execute("id", 3, other)
+    assert compile_spy.call_count == 2
+    assert push_instance.last_payload == 3
+
+
+@pytest.mark.asyncio
+async def test_push_executor_freezes_the_payload():
+    push_instance = Nop(name='pytest')
+    push = PushModel(instance=push_instance, selector=None, deps=[], unwrap=False)
+    await PushExecutor().execute("id", {'a': [1]}, push)
+    with pytest.raises(TypeError, match="is frozen"):
+        push_instance.last_payload['a'].append(2)
+
+
+@pytest.mark.asyncio
+async def test_push_executor_close(mocker):
+    dut = PushExecutor()
+    push = PushModel(instance=Nop(name='pytest'), selector=None, deps=[], unwrap=False)
+    await dut.execute("id", 'payload', push)
+    plan = dut._plans[id(push)][1]
+    close = mocker.spy(plan, 'close')
+    await dut.close()
+    assert close.call_count == 1
+    assert not dut._plans
+
+
+@pytest.mark.asyncio
+async def test_push_executor_evicts_least_recently_used_plans(mocker):
+    dut = PushExecutor()
+    mocker.patch.object(dut, 'MAX_PLANS', 2)
+    dut._plans.clear()
+    pushes = [
+        PushModel(instance=Nop(name='pytest'), selector=None, deps=[], unwrap=False)
+        for _ in range(3)
+    ]
+    for push in pushes:
+        await dut.execute("id", 'payload', push)
+    assert [push for push, _ in dut._plans.values()] == pushes[1:]
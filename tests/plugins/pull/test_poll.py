@@ -53,3 +53,36 @@ def test_poll_with_cron_expression():
     assert dut.is_cron
     assert isinstance(dut._cron_interval, CronExpression)
     assert dut._cron_interval.string_tab == ['*/1', '*', '*', '*', '*']
+
+
+@pytest.mark.asyncio
+async def test_poll_instant_run_and_immediate_stop():
+    events = []
+    def callback(plugin, payload):
+        events.append(payload)
+
+    dut = CustomPolling(name='pytest', interval="1h", instant_run=True, scheduled_callable=lambda: 42)
+    runner = await make_runner(dut, callback)
+    async with start_runner(runner):
+        time.sleep(0.2)
+        start = time.time()
+
+    assert events == [42]
+    assert time.time() - start < 0.5
+
+
+def test_poll_next_run():
+    dut = CustomPolling(name='pytest', interval="10s", scheduled_callable=lambda: None)
+    now = time.time()
+    assert dut._next_run(now) == now + 10
+    assert now + 10 <= dut._next_run(now - 60) < now + 11  # Behind the schedule
+
+    dut = CustomPolling(name='pytest', interval="*/1 * * * *", scheduled_callable=lambda: None)
+    assert dut._next_run(120.5) == 180
+
+    dut = CustomPolling(name='pytest', interval="0 12 * * *", scheduled_callable=lambda: None)
+    last = datetime(2020, 6, 5, 12, 0).timestamp()
+    assert datetime.fromtimestamp(dut._next_run(last)) == datetime(2020, 6, 6, 12, 0)
+
+    dut = CustomPolling(name='pytest', interval=None, scheduled_callable=lambda: None)
+    assert dut._next_run(now) is None
@@ -35,3 +35,48 @@ def test_compat_no_pull_method():
 
     with pytest.raises(TypeError, match="Can't instantiate abstract class"):
         NoPullMethodAsync(name='pytest')
+
+
+@pytest.mark.asyncio
+async def test_sync_pull_runs_in_dedicated_thread():
+    import threading
+
+    class ThreadName(SyncPull):
+        def _pull(self):
+            self.notify(threading.current_thread().name)
+
+    class Crash(SyncPull):
+        def _pull(self):
+            raise ValueError("Crash on purpose!")
+
+    names = []
+    dut = ThreadName(name='pytest')
+    dut.callback(lambda plugin, payload: names.append(payload))
+    await dut.pull()
+    assert names == ['pnp-pull-pytest']
+
+    with pytest.raises(ValueError, match="Crash on purpose!"):
+        await Crash(name='pytest').pull()
+
+
+@pytest.mark.asyncio
+async def test_stop_wakes_up_sleeping_pulls_immediately():
+    import asyncio
+    import time
+
+    class AsyncSleeper(AsyncPull):
+        async def _pull(self):
+            await self._sleep(60)
+
+    class SyncSleeper(SyncPull):
+        def _pull(self):
+            self._sleep(60)
+
+    for dut in (AsyncSleeper(name='pytest'), SyncSleeper(name='pytest')):
+        pull = asyncio.ensure_future(dut.pull())
+        await asyncio.sleep(0.1)
+        start = time.time()
+        await dut.stop()
+        await asyncio.wait_for(pull, 1)
+        assert time.time() - start < 0.5
+        assert await dut.wait_stopped(0)
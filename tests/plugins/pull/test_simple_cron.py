@@ -18,3 +18,28 @@ async def test_cron_every_minute():
 
     assert len(res) == 3
     assert res[0] == 'every minute'
+
+
+def test_cron_sleeps_until_the_earliest_trigger():
+    from datetime import datetime
+
+    dut = simple.Cron(expressions=['0 12 * * * noon', '30 8 * * * morning', '0 0 30 2 * never'], name='pytest')
+    last = datetime(2020, 6, 5, 9, 0).timestamp()
+    assert datetime.fromtimestamp(dut._next_run(last)) == datetime(2020, 6, 5, 12, 0)
+    last = datetime(2020, 6, 5, 12, 0).timestamp()
+    assert datetime.fromtimestamp(dut._next_run(last)) == datetime(2020, 6, 6, 8, 30)
+
+    assert simple.Cron(expressions='0 0 30 2 * never', name='pytest')._next_run(last) is None
+
+
+@pytest.mark.asyncio
+async def test_cron_only_emits_the_due_expressions(mocker):
+    from datetime import datetime
+
+    res = list()
+    dut = simple.Cron(expressions=['0 12 * * * noon', '*/1 * * * * every minute'], name='pytest')
+    dut.callback(lambda sender, payload: res.append(payload))
+
+    mocker.patch('time.time', return_value=datetime(2020, 6, 5, 12, 0, 1).timestamp())
+    await dut.poll()
+    assert res == ['noon', 'every minute']
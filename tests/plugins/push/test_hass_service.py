@@ -1,5 +1,6 @@
 import json
 
+import aiohttp
 import pytest
 
 from pnp.plugins.push.hass import Service
@@ -13,43 +14,40 @@ TIMEOUT = 10
 
 
 class HassResponseDummy:
-    def __init__(self, status_code=200):
-        self._status_code = int(status_code)
+    def __init__(self, status=200):
+        self.status = int(status)
 
-    @property
-    def status_code(self):
-        return self._status_code
+    async def text(self):
+        if self.status == 200:
+            return json.dumps({})
+        return json.dumps({'message': 'Payment required'})
 
-    @property
-    def text(self):
-        import json
-        return json.dumps(self.json())
+    async def __aenter__(self):
+        return self
 
-    def json(self):
-        if self.status_code == 200:
-            return {}
-        raise RuntimeError("Accessing json() is prohibited when status_code <> 200")
+    async def __aexit__(self, *args):
+        pass
 
 
 @pytest.mark.asyncio
 async def test_valid_call(monkeypatch):
     called = False
 
-    def call_validator(url, *args, headers=None, timeout=None, data=None, **kwargs):
+    def call_validator(session, method, url, headers=None, timeout=None, data=None):
+        assert method == 'POST'
         assert url == "{hass_url}/api/services/{domain}/{service}".format(
             hass_url=HASS_URL, domain=DOMAIN, service=SERVICE)
         assert headers == {
             'Authorization': 'Bearer {token}'.format(token=HA_TOKEN),
             'content-type': 'application/json',
         }
-        assert timeout == TIMEOUT
+        assert timeout.total == TIMEOUT
         assert data == json.dumps(DATA)
         nonlocal called
         called = True
         return HassResponseDummy()
 
-    import requests
-    monkeypatch.setattr(requests, 'post', call_validator)
+    monkeypatch.setattr(aiohttp.ClientSession, 'request', call_validator)
 
     dut = Service(name='pytest', url=HASS_URL, token=HA_TOKEN, timeout=TIMEOUT, domain=DOMAIN, service=SERVICE)
 
@@ -62,8 +60,7 @@ async def test_errornous_call(monkeypatch):
     def call_validator(*args, **kwargs):
         return HassResponseDummy(402)
 
-    import requests
-    monkeypatch.setattr(requests, 'post', call_validator)
+    monkeypatch.setattr(aiohttp.ClientSession, 'request', call_validator)
 
     dut = Service(name='pytest', url=HASS_URL, token=HA_TOKEN, timeout=TIMEOUT, domain=DOMAIN, service=SERVICE)
 
@@ -1,5 +1,7 @@
+import json
+
+import aiohttp
 import pytest
-import requests
 
 from pnp.plugins.push import PushExecutionError
 from pnp.plugins.push.http import Call
@@ -10,18 +12,18 @@ async def http_call(
         response_data="data", status_code=200, call_assert_fun=None, **kwargs
 ):
     class ResponseMock:
-        @property
-        def status_code(self):
-            return status_code
+        status = status_code
+
+        async def text(self):
+            return json.dumps(response_data)
 
-        @property
-        def text(self):
-            return ""
+        async def __aenter__(self):
+            return self
 
-        def json(self):
-            return response_data
+        async def __aexit__(self, *args):
+            pass
 
-    def call_validator(method, url, data=None):
+    def call_validator(session, method, url, data=None, timeout=None):
         if call_assert_fun is None:
             assert method == call_method
             assert url == call_url
@@ -31,7 +33,7 @@ async def http_call(
 
         return ResponseMock()
 
-    mp.setattr(requests, 'request', call_validator)
+    mp.setattr(aiohttp.ClientSession, 'request', call_validator)
     dut = Call(name='pytest', url=call_url, method=call_method, **kwargs)
 
     return await dut.push(call_data)
@@ -91,3 +93,44 @@ async def test_call_with_envelope_override(monkeypatch):
             monkeypatch, call_data=dict(data="payload", fail_on_error=True), status_code=500,
             call_assert_fun=assert_fail_on_error
         )
+
+
+@pytest.mark.asyncio
+async def test_call_shares_session_per_host(monkeypatch):
+    class ResponseMock:
+        status = 200
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            pass
+
+    sessions = []
+
+    def record(session, method, url, data=None, timeout=None):
+        assert timeout.total == 5
+        sessions.append(session)
+        return ResponseMock()
+
+    monkeypatch.setattr(aiohttp.ClientSession, 'request', record)
+    dut = Call(name='pytest', url='http://localhost:1234/foo', timeout='5s')
+    await dut.push('payload')
+    await dut.push(dict(data='payload', url='http://localhost:1234/bar'))
+    await dut.push(dict(data='payload', url='http://localhost:4321/foo'))
+    assert sessions[0] is sessions[1] and sessions[0] is not sessions[2]
+
+    await dut.stop()
+    assert all(session.closed for session in sessions)
+
+
+@pytest.mark.asyncio
+async def test_call_stop_without_requests_keeps_other_sessions():
+    from pnp.shared.http import SESSIONS
+
+    other = SESSIONS.get('http://localhost:1234/foo')
+    dut = Call(name='pytest', url='http://localhost:4321/foo')
+    assert dut.timeout is None
+    await dut.stop()
+    assert not other.closed
+    await SESSIONS.close('http://localhost:1234')
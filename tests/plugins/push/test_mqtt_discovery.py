@@ -3,19 +3,19 @@ import json
 import pytest
 
 from pnp.plugins.push.mqtt import Discovery
+from pnp.shared.mqtt import MQTTConnection
 
 
 @pytest.mark.asyncio
 async def test_push_mqtt_discovery(monkeypatch):
     call_cnt = 0
     calls = []
-    def call_validator(*args, **kwargs):
+    def call_validator(connection, **kwargs):
         nonlocal call_cnt
         call_cnt += 1
-        calls.append(kwargs)
+        calls.append(dict(kwargs, host=connection.host, port=connection.port))
 
-    import paho.mqtt.publish
-    monkeypatch.setattr(paho.mqtt.publish, 'single', call_validator)
+    monkeypatch.setattr(MQTTConnection, 'publish', call_validator)
 
     config = {'friendly_name': 'pytest_sensor'}
     dut = Discovery(
@@ -34,7 +34,7 @@ async def test_push_mqtt_discovery(monkeypatch):
     payload = calls[0].pop('payload')
     assert calls[0] == {
         'topic': 'pytest/sensor/12345/pytest_sensor/config',
-        'hostname': 'doesnotmatter', 'port': 1883, 'retain': True, 'auth': None, 'qos': 0
+        'host': 'doesnotmatter', 'port': 1883, 'retain': True, 'qos': 0
     }
     assert json.loads(payload) == {
         "friendly_name": "pytest_sensor",
@@ -45,7 +45,7 @@ async def test_push_mqtt_discovery(monkeypatch):
     assert calls[1] == {
         'topic': 'pytest/sensor/12345/pytest_sensor/state',
         'payload': 10,
-        'hostname': 'doesnotmatter', 'port': 1883, 'retain': True, 'auth': None, 'qos': 0
+        'host': 'doesnotmatter', 'port': 1883, 'retain': True, 'qos': 0
     }
 
 
@@ -53,13 +53,12 @@ async def test_push_mqtt_discovery(monkeypatch):
 async def test_push_mqtt_discovery_envelope_override(monkeypatch):
     call_cnt = 0
     calls = []
-    def call_validator(*args, **kwargs):
+    def call_validator(connection, **kwargs):
         nonlocal call_cnt
         call_cnt += 1
-        calls.append(kwargs)
+        calls.append(dict(kwargs, host=connection.host, port=connection.port))
 
-    import paho.mqtt.publish
-    monkeypatch.setattr(paho.mqtt.publish, 'single', call_validator)
+    monkeypatch.setattr(MQTTConnection, 'publish', call_validator)
 
     config = {'friendly_name': 'pytest_sensor'}
     dut = Discovery(
@@ -78,7 +77,7 @@ async def test_push_mqtt_discovery_envelope_override(monkeypatch):
     payload = calls[0].pop('payload')
     assert calls[0] == {
         'topic': 'pytest/sensor/node_override/object_override/config',
-        'hostname': 'doesnotmatter', 'port': 1883, 'retain': True, 'auth': None, 'qos': 0,
+        'host': 'doesnotmatter', 'port': 1883, 'retain': True, 'qos': 0,
     }
     assert json.loads(payload) == {
         "friendly_name": "pytest_sensor",
@@ -89,7 +88,7 @@ async def test_push_mqtt_discovery_envelope_override(monkeypatch):
     assert calls[1] == {
         'topic': 'pytest/sensor/node_override/object_override/state',
         'payload': 10,
-        'hostname': 'doesnotmatter', 'port': 1883, 'retain': True, 'auth': None, 'qos': 0
+        'host': 'doesnotmatter', 'port': 1883, 'retain': True, 'qos': 0
     }
 
 
@@ -97,13 +96,12 @@ async def test_push_mqtt_discovery_envelope_override(monkeypatch):
 async def test_push_mqtt_config_vars(monkeypatch):
     call_cnt = 0
     calls = []
-    def call_validator(*args, **kwargs):
+    def call_validator(connection, **kwargs):
         nonlocal call_cnt
         call_cnt += 1
-        calls.append(kwargs)
+        calls.append(dict(kwargs, host=connection.host, port=connection.port))
 
-    import paho.mqtt.publish
-    monkeypatch.setattr(paho.mqtt.publish, 'single', call_validator)
+    monkeypatch.setattr(MQTTConnection, 'publish', call_validator)
 
     config = {'friendly_name': 'pytest_sensor', 'object_id': '{{var::object_id}}', 'node_id': '{{var::node_id}}'}
     dut = Discovery(
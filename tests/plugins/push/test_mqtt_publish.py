@@ -1,22 +1,22 @@
-import paho.mqtt.publish
 import pytest
 
 from pnp.plugins.push.mqtt import Publish
+from pnp.shared.mqtt import MQTTConnection
 
 
 @pytest.mark.asyncio
 async def test_mqtt_push(monkeypatch):
 
-    def call_validator(**kwargs):
+    def call_validator(connection, **kwargs):
         assert kwargs.get('topic') == 'test/foo/bar'
-        assert kwargs.get('hostname') == 'localhost'
-        assert kwargs.get('port') == 1883
+        assert connection.host == 'localhost'
+        assert connection.port == 1883
         assert kwargs.get('payload') == "This is the payload"
         assert not kwargs.get('retain')
-        assert kwargs.get('auth') is None
+        assert connection.user is None
         assert kwargs.get('qos') == 0
 
-    monkeypatch.setattr(paho.mqtt.publish, 'single', call_validator)
+    monkeypatch.setattr(MQTTConnection, 'publish', call_validator)
 
     dut = Publish(name='pytest', host='localhost', topic='test/foo/bar')
     await dut.push("This is the payload")
@@ -38,16 +38,16 @@ def test_mqtt_push_with_qos():
 @pytest.mark.asyncio
 async def test_mqtt_push_with_envelope_override(monkeypatch):
 
-    def call_validator(**kwargs):
+    def call_validator(connection, **kwargs):
         assert kwargs.get('topic') == 'override'
-        assert kwargs.get('hostname') == 'localhost'
-        assert kwargs.get('port') == 1883
+        assert connection.host == 'localhost'
+        assert connection.port == 1883
         assert kwargs.get('payload') == "This is the payload"
         assert kwargs.get('retain')
-        assert kwargs.get('auth') is None
+        assert connection.user is None
         assert kwargs.get('qos') == 2
 
-    monkeypatch.setattr(paho.mqtt.publish, 'single', call_validator)
+    monkeypatch.setattr(MQTTConnection, 'publish', call_validator)
 
     dut = Publish(name='pytest', host='localhost', topic='test/foo/bar')
     await dut.push(dict(data="This is the payload", topic='override', retain=True, qos=2))
@@ -60,15 +60,15 @@ async def test_mqtt_push_with_envelope_override(monkeypatch):
 @pytest.mark.asyncio
 async def test_mqtt_push_with_credentials(monkeypatch):
 
-    def call_validator(**kwargs):
+    def call_validator(connection, **kwargs):
         assert kwargs.get('topic') == 'test/foo/bar'
-        assert kwargs.get('hostname') == 'localhost'
-        assert kwargs.get('port') == 1883
+        assert connection.host == 'localhost'
+        assert connection.port == 1883
         assert kwargs.get('payload') == "This is the payload"
         assert not kwargs.get('retain')
-        assert kwargs.get('auth') == {"username": "foo", "password": "bar"}
+        assert (connection.user, connection.password) == ("foo", "bar")
 
-    monkeypatch.setattr(paho.mqtt.publish, 'single', call_validator)
+    monkeypatch.setattr(MQTTConnection, 'publish', call_validator)
 
     dut = Publish(name='pytest', host='localhost', topic='test/foo/bar', user="foo", password="bar")
     await dut.push("This is the payload")
@@ -78,18 +78,18 @@ async def test_mqtt_push_with_credentials(monkeypatch):
 async def test_mqtt_push_in_multi_mode(monkeypatch):
     call_count = 0
 
-    def call_validator(**kwargs):
+    def call_validator(connection, **kwargs):
         nonlocal call_count
         call_count += 1
-        assert kwargs.get('hostname') == 'localhost'
-        assert kwargs.get('port') == 1883
+        assert connection.host == 'localhost'
+        assert connection.port == 1883
         assert not kwargs.get('retain')
-        assert kwargs.get('auth') is None
+        assert connection.user is None
         assert kwargs.get('qos') == 0
         assert kwargs.get('topic') == 'test/foo/bar/attr{}'.format(str(call_count))
         assert kwargs.get('payload') == "payload{}".format(str(call_count))
 
-    monkeypatch.setattr(paho.mqtt.publish, 'single', call_validator)
+    monkeypatch.setattr(MQTTConnection, 'publish', call_validator)
 
     dut = Publish(name='pytest', host='localhost', topic='test/foo/bar', multi=True)
     await dut.push({"attr1": "payload1", "attr2": "payload2", "attr3": "payload3"})
@@ -100,10 +100,10 @@ async def test_mqtt_push_in_multi_mode(monkeypatch):
 
 @pytest.mark.asyncio
 async def test_mqtt_push_in_multi_mode_without_dict(monkeypatch):
-    def call_validator(**kwargs):
+    def call_validator(connection, **kwargs):
         assert False
 
-    monkeypatch.setattr(paho.mqtt.publish, 'single', call_validator)
+    monkeypatch.setattr(MQTTConnection, 'publish', call_validator)
 
     dut = Publish(name='pytest', host='localhost', topic='test/foo/bar', multi=True)
     with pytest.raises(TypeError):
@@ -114,7 +114,7 @@ async def test_mqtt_push_in_multi_mode_without_dict(monkeypatch):
 async def test_mqtt_push_in_multi_mode_with_error_not_aborting_other(monkeypatch):
     call_count = 0
 
-    def call_validator(**kwargs):
+    def call_validator(connection, **kwargs):
         nonlocal call_count
         call_count += 1
         if call_count == 2:
@@ -122,7 +122,7 @@ async def test_mqtt_push_in_multi_mode_with_error_not_aborting_other(monkeypatch
         assert kwargs.get('topic') == 'test/foo/bar/attr{}'.format(str(call_count))
         assert kwargs.get('payload') == "payload{}".format(str(call_count))
 
-    monkeypatch.setattr(paho.mqtt.publish, 'single', call_validator)
+    monkeypatch.setattr(MQTTConnection, 'publish', call_validator)
 
     dut = Publish(name='pytest', host='localhost', topic='test/foo/bar', multi=True)
     await dut.push({"attr1": "payload1", "attr2": "payload2", "attr3": "payload3"})
@@ -1,6 +1,11 @@
+import asyncio
+
 import pytest
 
-from pnp.plugins.push import SyncPush, Push, AsyncPush
+from pnp import utils
+from pnp.plugins.push import (
+    SyncPush, Push, AsyncPush, BatchPush, enveloped, parse_envelope, drop_envelope
+)
 
 
 class Foo(SyncPush):
@@ -84,3 +89,132 @@ def test_compat_no_pull_method():
 
     with pytest.raises(TypeError, match="Can't instantiate abstract class"):
         NoPushMethodAsync(name='pytest')
+
+
+class Stacked(AsyncPush):
+    def __init__(self):
+        super().__init__(name='pytest')
+        self.a = 1
+        self.__b = 2
+        self.calls = []
+
+    def _parse_a(self, value):
+        return int(value)
+
+    @enveloped
+    @parse_envelope('a')
+    @parse_envelope('b')
+    @parse_envelope('c')
+    @drop_envelope
+    async def _push(self, a, b, c, payload):  # pylint: disable=arguments-differ
+        self.calls.append((a, b, c, payload))
+        return payload
+
+
+@pytest.mark.asyncio
+async def test_parse_envelope_stacked_decorators(mocker):
+    dut = Stacked()
+    assert dut._push.__wrapped__.__parse_envelope__[2] == ('a', 'b', 'c')
+
+    assert await dut.push(dict(a='42', c='c', payload='one')) == 'one'
+    lookup = mocker.spy(utils, 'make_public_protected_private_attr_lookup')
+    assert await dut.push('two') == 'two'
+    assert await dut.push(dict(a='nan', b=3, data='three')) == 'three'
+    assert dut.calls == [(42, 2, 'c', 'one'), (1, 2, None, 'two'), (1, 3, None, 'three')]
+    # Lookups are resolved by the first push
+    assert lookup.call_count == 0
+
+
+def test_parse_envelope_merges_stacked_decorators():
+    def _push(self, a, b, payload, envelope=None):
+        return a, b, payload
+
+    merged = parse_envelope('a')(parse_envelope('b')(_push))
+    wrapper, target, values = merged.__parse_envelope__
+    assert wrapper is merged
+    assert target is _push  # The merged wrapper calls the function directly
+    assert values == ('a', 'b')
+    assert merged(Foo(), dict(a='x'), 'payload') == ('x', 2, 'payload')
+
+
+def test_parse_envelope_does_not_merge_through_other_decorators():
+    def _push(self, a, b, payload):
+        return a, b, payload
+
+    # drop_envelope copies the marker of the inner wrapper (functools.wraps), but is no merge
+    dut = parse_envelope('a')(drop_envelope(parse_envelope('b')(_push)))
+    _, target, values = dut.__parse_envelope__
+    assert values == ('a',)
+    assert target is not _push
+    # The envelope is dropped before 'b' is parsed: 'b' falls back to the instance value
+    assert dut(Foo(), dict(b='99'), 'payload') == (1, 2, 'payload')
+
+
+def test_attr_lookups_are_cached():
+    from pnp.plugins.push import _attr_lookups
+    _attr_lookups.cache_clear()
+    assert _attr_lookups(Foo, '__c') == ('__c', 'c', '_c', '_Foo__c')
+    assert _attr_lookups.cache_info().misses == 1
+    assert _attr_lookups(Foo, '__c') is _attr_lookups(Foo, '__c')
+    assert _attr_lookups.cache_info().hits == 2
+    _attr_lookups(Stacked, '__c')  # Another class: Another name mangling
+    assert _attr_lookups.cache_info().misses == 2
+
+
+def test_envelope_key_is_resolved_once(mocker):
+    dut = Foo()
+    key = dut._envelope_key('b')
+    assert key == ('_b', ('b', '_b', '__b', '_Foo__b'), dut._parse_b)
+    lookup = mocker.spy(utils, 'make_public_protected_private_attr_lookup')
+    assert dut._envelope_key('b') is key  # Hit
+    assert lookup.call_count == 0
+    assert dut._envelope_key('c')[0] == '_Foo__c'  # Miss
+    assert lookup.call_count > 0
+
+
+def test_envelope_key_attribute_set_later():
+    dut = Foo()
+    assert dut._envelope_key('e')[0] is None
+    assert dut._envelope_value('e', None) is None
+    dut.e = 5
+    assert dut._envelope_value('e', None) == 5
+
+
+def test_envelope_value():
+    dut = Foo()
+    assert dut._envelope_value('a', dict(a='a')) == 'a'  # As is: No parser
+    assert dut._envelope_value('b', dict(b='99')) == 99  # Parsed
+    assert dut._envelope_value('c', dict(c='abc')) == 3  # Parser failed: Instance value
+    assert dut._envelope_value('a', dict(b=98)) == 1  # Not in the envelope: Instance value
+    assert dut._envelope_value('d', None) is None
+
+
+class Batches(BatchPush):
+    def __init__(self, **kwargs):
+        super().__init__(name='pytest', **kwargs)
+        self.batches = []
+
+    async def _push_batch(self, payloads):
+        self.batches.append(payloads)
+
+
+@pytest.mark.asyncio
+async def test_batch_push_flushes_by_size():
+    dut = Batches(batch_size=3, batch_interval=60)
+    for i in range(7):
+        assert await dut.push(i) == i
+    assert dut.batches == [[0, 1, 2], [3, 4, 5]]
+
+    await dut.stop()  # Flushes the remainder
+    assert dut.batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+@pytest.mark.asyncio
+async def test_batch_push_flushes_by_interval():
+    dut = Batches(batch_size=100, batch_interval=0.05)
+    await dut.push(1)
+    await dut.push(2)
+    assert dut.batches == []
+
+    await asyncio.sleep(0.15)
+    assert dut.batches == [[1, 2]]
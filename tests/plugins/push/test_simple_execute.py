@@ -1,29 +1,44 @@
+import asyncio
+import time
+
 import pytest
 
+from pnp.plugins.push import PushExecutionError
 from pnp.plugins.push.simple import Execute
 from pnp.shared.exc import TemplateError
 
 
-class MockedBufferedReader:
-    def __init__(self, data):
-        self.data = data
-    def __iter__(self):
-        return iter(self.data)
-    def close(self):
-        pass
+class ProcessMock:
+    def __init__(self, stdout=(), stderr=(), returncode=0):
+        self.returncode = returncode
+        self.stdout = self._stream(stdout)
+        self.stderr = self._stream(stderr)
+
+    @staticmethod
+    def _stream(lines):
+        stream = asyncio.StreamReader()
+        stream.feed_data(''.join(line + '\n' for line in lines).encode())
+        stream.feed_eof()
+        return stream
+
+    async def wait(self):
+        return self.returncode
+
+
+def mock_shell(mocker, **kwargs):
+    return mocker.patch(
+        'asyncio.create_subprocess_shell', side_effect=lambda *args, **kw: ProcessMock(**kwargs)
+    )
 
 
 @pytest.mark.asyncio
 async def test_execute_push(mocker):
     dut = Execute(command="date", name='pytest')  # no args
 
-    mock_popen = mocker.patch('subprocess.Popen')
-    mock_popen.return_value.returncode = 0
-    mock_popen.return_value.stdout = MockedBufferedReader(["2018-11-27"])
-    mock_popen.return_value.stderr = MockedBufferedReader(["2018-11-28"])
+    mock_shell_call = mock_shell(mocker, stdout=["2018-11-27"], stderr=["2018-11-28"])
     res = await dut.push(None)  # no dict payload -> no templates -> no injection
 
-    mock_popen.assert_called_with(args='date', cwd=dut.base_path, shell=True, stderr=-1, stdout=-1, universal_newlines=True)
+    mock_shell_call.assert_called_with('date', cwd=dut.base_path, stdout=-1, stderr=-1, start_new_session=True)
     assert isinstance(res, dict)
     assert {'return_code', 'stdout', 'stderr'} == set(res.keys())
     assert res['return_code'] == 0
@@ -33,16 +48,12 @@ async def test_execute_push(mocker):
 
 @pytest.mark.asyncio
 async def test_execute_push_with_args(mocker):
-    mock_popen = mocker.patch('subprocess.Popen')
-    mock_popen.return_value.returncode = 0
-    mock_popen.return_value.stdout = MockedBufferedReader(["hello", "you"])
-    mock_popen.return_value.stderr = MockedBufferedReader([])
+    mock_shell_call = mock_shell(mocker, stdout=["hello", "you"])
 
     dut = Execute(command="echo", args='-e "hello\nyou"', name='pytest')
-    res = dut._push(None)
+    res = await dut.push(None)
 
-    mock_popen.assert_called_with(args='echo "-e \\\"hello\nyou\\\""', cwd=dut.base_path, shell=True, stderr=-1,
-                                  stdout=-1, universal_newlines=True)
+    mock_shell_call.assert_called_with('echo "-e \\\"hello\nyou\\\""', cwd=dut.base_path, stdout=-1, stderr=-1, start_new_session=True)
     assert isinstance(res, dict)
     assert {'return_code', 'stdout', 'stderr'} == set(res.keys())
     assert res['return_code'] == 0
@@ -51,21 +62,17 @@ async def test_execute_push_with_args(mocker):
 
     dut = Execute(command="echo", args=['-e', '"hello\nyou"'], name='pytest', cwd="/tmp")
     await dut.push(None)
-    mock_popen.assert_called_with(args='echo "-e" "\\\"hello\nyou\\\""', cwd="/tmp", shell=True, stderr=-1, stdout=-1,
-                                  universal_newlines=True)
+    mock_shell_call.assert_called_with('echo "-e" "\\\"hello\nyou\\\""', cwd="/tmp", stdout=-1, stderr=-1, start_new_session=True)
 
 
 @pytest.mark.asyncio
 async def test_execute_push_without_args_but_payload(mocker):
-    mock_popen = mocker.patch('subprocess.Popen')
-    mock_popen.return_value.returncode = 0
-    mock_popen.return_value.stdout = MockedBufferedReader(["2018-11-27"])
-    mock_popen.return_value.stderr = MockedBufferedReader([])
+    mock_shell_call = mock_shell(mocker, stdout=["2018-11-27"])
 
     dut = Execute(command="{{command}}", capture=True, name='pytest')
     res = await dut.push(dict(command='date'))
 
-    mock_popen.assert_called_with(args='date', cwd=dut.base_path, shell=True, stderr=-1, stdout=-1, universal_newlines=True)
+    mock_shell_call.assert_called_with('date', cwd=dut.base_path, stdout=-1, stderr=-1, start_new_session=True)
     assert isinstance(res, dict)
     assert {'return_code', 'stdout', 'stderr'} == set(res.keys())
     assert res['return_code'] == 0
@@ -74,15 +81,12 @@ async def test_execute_push_without_args_but_payload(mocker):
 
 @pytest.mark.asyncio
 async def test_execute_push_with_args_and_payload(mocker):
-    mock_popen = mocker.patch('subprocess.Popen')
-    mock_popen.return_value.returncode = 0
-    mock_popen.return_value.stdout = MockedBufferedReader(["hello", "dude", "!"])
-    mock_popen.return_value.stderr = MockedBufferedReader([])
+    mock_shell_call = mock_shell(mocker, stdout=["hello", "dude", "!"])
 
     dut = Execute(command="{{command}}", args=['hello', '{{name}}', '!'], capture=True, name='pytest')
     res = await dut.push(dict(command='echo', name='dude'))
 
-    mock_popen.assert_called_with(args='echo "hello" "dude" "!"', cwd=dut.base_path, shell=True, stderr=-1, stdout=-1, universal_newlines=True)
+    mock_shell_call.assert_called_with('echo "hello" "dude" "!"', cwd=dut.base_path, stdout=-1, stderr=-1, start_new_session=True)
     assert isinstance(res, dict)
     assert {'return_code', 'stdout', 'stderr'} == set(res.keys())
     assert res['return_code'] == 0
@@ -95,48 +99,97 @@ async def test_execute_push_with_unknown_template_var(mocker):
 
     with pytest.raises(TemplateError) as e:
         await dut.push(dict(command='echo'))
-    assert "Error when rendering template in TemplatedExecute" in str(e)
+    assert "Error when rendering template '{{name}}'" in str(e)
 
 
 @pytest.mark.asyncio
 async def test_execute_push_with_unused_template_var(mocker):
-    mock_popen = mocker.patch('subprocess.Popen')
+    mock_shell_call = mock_shell(mocker)
     dut = Execute(command="{{command}}", args=['hello', '{{name}}', '!'], capture=True, name='pytest')
 
     await dut.push(dict(command='echo', name="you", toomuch="I am not used"))
-    mock_popen.assert_called_with(args='echo "hello" "you" "!"', cwd=dut.base_path, shell=True, stderr=-1, stdout=-1,
-                                  universal_newlines=True)
+    mock_shell_call.assert_called_with('echo "hello" "you" "!"', cwd=dut.base_path, stdout=-1, stderr=-1, start_new_session=True)
 
 
 @pytest.mark.asyncio
 async def test_execute_push_with_dict_in_dict_referencing(mocker):
-    mock_popen = mocker.patch('subprocess.Popen')
+    mock_shell_call = mock_shell(mocker)
     dut = Execute(command="{{command}}", args=['hello', '{{label.name}}', '!'], capture=True, name='pytest')
 
     await dut.push(dict(command='echo', label=dict(name="you")))
-    mock_popen.assert_called_with(args='echo "hello" "you" "!"', cwd=dut.base_path, shell=True, stderr=-1, stdout=-1,
-                                  universal_newlines=True)
+    mock_shell_call.assert_called_with('echo "hello" "you" "!"', cwd=dut.base_path, stdout=-1, stderr=-1, start_new_session=True)
 
 
 @pytest.mark.asyncio
 async def test_execute_push_with_empty_and_none_args(mocker):
-    mock_popen = mocker.patch('subprocess.Popen')
+    mock_shell_call = mock_shell(mocker)
     dut = Execute(command="{{command}}", args=['hello', '{{label.name}}', '!'], capture=True, name='pytest')
 
     await dut.push(dict(command='echo', label=dict(name="")))
-    mock_popen.assert_called_with(args='echo "hello" "!"', cwd=dut.base_path, shell=True, stderr=-1, stdout=-1,
-                                  universal_newlines=True)
+    mock_shell_call.assert_called_with('echo "hello" "!"', cwd=dut.base_path, stdout=-1, stderr=-1, start_new_session=True)
 
     await dut.push(dict(command='echo', label=dict(name=None)))
-    mock_popen.assert_called_with(args='echo "hello" "!"', cwd=dut.base_path, shell=True, stderr=-1, stdout=-1,
-                                  universal_newlines=True)
+    mock_shell_call.assert_called_with('echo "hello" "!"', cwd=dut.base_path, stdout=-1, stderr=-1, start_new_session=True)
 
 
 @pytest.mark.asyncio
 async def test_execute_push_with_no_dict_as_args(mocker):
-    mock_popen = mocker.patch('subprocess.Popen')
+    mock_shell_call = mock_shell(mocker)
     dut = Execute(command="echo", args=['hello', '{{payload}}', '!'], capture=True, name='pytest')
 
     await dut.push("no dict")
-    mock_popen.assert_called_with(args='echo "hello" "no dict" "!"', cwd=dut.base_path, shell=True, stderr=-1, stdout=-1,
-                                  universal_newlines=True)
+    mock_shell_call.assert_called_with('echo "hello" "no dict" "!"', cwd=dut.base_path, stdout=-1, stderr=-1, start_new_session=True)
+
+
+@pytest.mark.asyncio
+async def test_execute_push_streams_large_output():
+    # The output exceeds the pipe buffer: The command must not block
+    dut = Execute(command="seq 1 100000", name='pytest', timeout=10)
+    res = await dut.push(None)
+
+    assert res['return_code'] == 0
+    assert len(res['stdout']) == 100000 and res['stdout'][-1] == '100000'
+
+
+@pytest.mark.asyncio
+async def test_execute_push_kills_on_timeout():
+    dut = Execute(command="sleep 10", name='pytest', timeout=0.2)
+    start = time.time()
+    with pytest.raises(PushExecutionError, match="did not finish within 0.2 seconds"):
+        await dut.push(None)
+    assert time.time() - start < 5
+
+
+@pytest.mark.asyncio
+async def test_execute_push_kills_on_cancel():
+    dut = Execute(command="sleep 10", name='pytest', capture=False)
+    killed = []
+    kill = dut._kill
+    dut._kill = lambda proc: killed.append(proc) or kill(proc)
+    task = asyncio.ensure_future(dut.push(None))
+    await asyncio.sleep(0.3)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert len(killed) == 1
+    assert await asyncio.wait_for(killed[0].wait(), 5) != 0
+
+
+@pytest.mark.asyncio
+async def test_execute_push_long_lines():
+    dut = Execute(command="head -c 200000 /dev/zero | tr '\\0' x; echo; echo done", name='pytest')
+    res = await dut.push(None)
+    assert res['return_code'] == 0
+    assert [len(line) for line in res['stdout']] == [200000, 4]
+
+
+@pytest.mark.asyncio
+async def test_execute_push_kills_on_error(mocker):
+    dut = Execute(command="sleep 10", name='pytest')
+    killed = []
+    kill = dut._kill
+    dut._kill = lambda proc: killed.append(proc) or kill(proc)
+    mocker.patch.object(dut, '_read_lines', side_effect=ValueError("broken"))
+    with pytest.raises(ValueError, match="broken"):
+        await dut.push(None)
+    assert len(killed) == 1 and killed[0].returncode is not None
@@ -12,7 +12,41 @@ async def test_influx_push(mocker):
     dut = InfluxPush(name='pytest', host='localhost', port=1234, user='user', password='secret',
                      database='testdb', protocol="{payload.a}, {payload.b}")
     await dut.push(Box(dict(a="foo", b="bar", c="baz")))
+    await dut.stop()  # Flushes the batch
 
-    mock_influx_db_client.assert_called
-    mc.write.assert_called
+    mock_influx_db_client.assert_called_once_with(
+        'localhost', 1234, 'user', 'secret', 'testdb', gzip=False
+    )
     mc.write.assert_called_with(['foo, bar'], {'db': 'testdb'}, 204, 'line')
+
+
+@pytest.mark.asyncio
+async def test_influx_push_batches_with_one_client(mocker):
+    mock_influx_db_client = mocker.patch('influxdb.InfluxDBClient')
+    mc = mock_influx_db_client.return_value
+
+    dut = InfluxPush(name='pytest', host='localhost', port=1234, user='user', password='secret',
+                     database='testdb', protocol="{payload.metric} value={payload.value}",
+                     batch_size=2)
+    for i in range(4):
+        await dut.push({'data': {'metric': 'temp', 'value': i}, 'topic': 'envelope'})
+
+    mock_influx_db_client.assert_called_once()
+    assert mc.write.call_count == 2
+    mc.write.assert_called_with(['temp value=2', 'temp value=3'], {'db': 'testdb'}, 204, 'line')
+
+
+@pytest.mark.asyncio
+async def test_influx_push_retries_failed_batch(mocker):
+    mc = mocker.patch('influxdb.InfluxDBClient').return_value
+    mc.write.side_effect = [IOError('influx is down'), None]
+
+    dut = InfluxPush(name='pytest', host='localhost', port=1234, user='user', password='secret',
+                     database='testdb', protocol="{payload}", batch_size=2, retry_buffer_size=3)
+    await dut.push(1)
+    assert await dut.push(2) == 2  # Failed write is logged, the points are kept
+    assert mc.write.call_count == 1
+    await dut.push(3)
+    await dut.push(4)
+
+    mc.write.assert_called_with(['1', '2', '3', '4'], {'db': 'testdb'}, 204, 'line')
@@ -29,7 +29,7 @@ class HassResponseDummy:
 
 
 def test_hass_state_for_correctness(monkeypatch):
-    def call_validator(url, *args, headers=None, timeout=None, **kwargs):
+    def call_validator(session, url, *args, headers=None, timeout=None, **kwargs):
         assert url == "{hass_url}/api/states/{entity_id}".format(hass_url=HASS_URL, entity_id=ENTITY_ID)
         assert headers == {
             'Authorization': 'Bearer {token}'.format(token=HA_TOKEN),
@@ -40,7 +40,7 @@ def test_hass_state_for_correctness(monkeypatch):
         return HassResponseDummy()
 
     import requests
-    monkeypatch.setattr(requests, 'get', call_validator)
+    monkeypatch.setattr(requests.Session, 'get', call_validator)
 
     dut = State(name='pytest', url=HASS_URL, token=HA_TOKEN, timeout=TIMEOUT)
 
@@ -53,10 +53,76 @@ def test_hass_state_for_error(monkeypatch):
         return HassResponseDummy(402)
 
     import requests
-    monkeypatch.setattr(requests, 'get', call_validator)
+    monkeypatch.setattr(requests.Session, 'get', call_validator)
 
     dut = State(name='pytest', url=HASS_URL, token=HA_TOKEN, timeout=TIMEOUT)
 
     with pytest.raises(RuntimeError) as e:
         dut.action(ENTITY_ID)
     assert "Failed to fetch the state for sun.sun @ http://hass:8123" in str(e)
+
+
+def test_hass_state_reuses_session(monkeypatch):
+    sessions = []
+
+    def call_validator(session, *args, **kwargs):
+        sessions.append(session)
+        return HassResponseDummy()
+
+    import requests
+    monkeypatch.setattr(requests.Session, 'get', call_validator)
+
+    dut = State(name='pytest', url=HASS_URL, token=HA_TOKEN, timeout=TIMEOUT)
+    dut.action(ENTITY_ID)
+    dut.action(ENTITY_ID)
+    assert len(sessions) == 2 and sessions[0] is sessions[1]
+
+
+def test_hass_state_websocket_mode(monkeypatch):
+    import asyncio
+    from pnp.shared.hass import HassApi, HassStateMirror
+
+    async def async_call(self, endpoint, *args, **kwargs):
+        assert endpoint == 'states'
+        return [
+            {'entity_id': ENTITY_ID, 'state': 'above_horizon', 'attributes': {'azimuth': 100},
+             'last_updated': '2020-01-01T10:00:00'},
+            {'entity_id': 'light.lamp', 'state': 'on', 'last_updated': '2020-01-01T10:00:00'},
+        ]
+
+    def call_validator(*args, **kwargs):
+        return HassResponseDummy()
+
+    import requests
+    monkeypatch.setattr(HassApi, 'async_call', async_call)
+    monkeypatch.setattr(requests.Session, 'get', call_validator)
+    monkeypatch.setattr(HassStateMirror, 'start', lambda self: None)
+
+    dut = State(name='pytest', url=HASS_URL, token=HA_TOKEN, mode='websocket')
+    assert dut.action(ENTITY_ID) == 'below_horizon'  # Not seeded yet: Falls back to rest
+
+    def event(entity_id, new_state):
+        return {'type': 'event', 'event': {'data': {'entity_id': entity_id, 'new_state': new_state}}}
+
+    async def seed_and_update():
+        mirror = dut._mirror
+        await mirror._on_subscribed()
+        await mirror._on_event(event(ENTITY_ID, {
+            'state': 'outdated', 'last_updated': '2020-01-01T09:00:00'
+        }))
+        await mirror._on_event(event(ENTITY_ID, {
+            'state': 'below_horizon', 'attributes': {'azimuth': 180},
+            'last_updated': '2020-01-01T11:00:00'
+        }))
+        await mirror._on_event(event('light.lamp', None))
+    asyncio.new_event_loop().run_until_complete(seed_and_update())
+
+    monkeypatch.setattr(requests.Session, 'get', lambda *args, **kwargs: pytest.fail("No request"))
+    assert dut.action(ENTITY_ID) == 'below_horizon'
+    assert dut.action(ENTITY_ID, attribute='azimuth') == 180
+    assert dut._mirror.get('light.lamp') is None
+
+
+def test_hass_state_invalid_mode():
+    with pytest.raises(ValueError):
+        State(name='pytest', url=HASS_URL, token=HA_TOKEN, mode='carrier_pigeon')
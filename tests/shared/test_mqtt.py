@@ -0,0 +1,84 @@
+import threading
+
+import paho.mqtt.client
+import pytest
+
+from pnp.shared.mqtt import MQTTConnection
+
+
+class FakeClient:
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        self.published = []
+        self.auth = None
+        self.ack = True
+        self.on_connect = self.on_disconnect = self.on_publish = None
+        FakeClient.instances.append(self)
+
+    def username_pw_set(self, username, password):
+        self.auth = (username, password)
+
+    def max_inflight_messages_set(self, inflight):
+        pass
+
+    def connect_async(self, host, port):
+        self.address = (host, port)
+
+    def loop_start(self):
+        threading.Thread(target=self.on_connect, args=(self, None, {}, 0)).start()
+
+    def disconnect(self):
+        pass
+
+    def loop_stop(self):
+        pass
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published.append((topic, payload, qos, retain))
+        info = paho.mqtt.client.MQTTMessageInfo(len(self.published))
+        info.rc = 0
+        if self.ack:
+            self.on_publish(self, None, info.mid)
+        return info
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    FakeClient.instances = []
+    monkeypatch.setattr(paho.mqtt.client, 'Client', FakeClient)
+    yield FakeClient
+    MQTTConnection.close_all()
+
+
+def test_mqtt_connection_is_shared(fake_client):
+    dut = MQTTConnection.get('localhost', 1883, 'user', 'secret')
+    assert MQTTConnection.get('localhost', 1883, 'user', 'secret') is dut
+    assert MQTTConnection.get('localhost', 1883) is not dut
+    assert MQTTConnection.get('localhost', 1884, 'user', 'secret') is not dut
+
+    # The connection is established lazily and only once
+    assert fake_client.instances == []
+    dut.publish('pytest/topic', 'one', qos=1)
+    dut.publish('pytest/topic', 'two', retain=True)
+    client, = fake_client.instances
+    assert client.address == ('localhost', 1883)
+    assert client.auth == ('user', 'secret')
+    assert client.published == [('pytest/topic', 'one', 1, False), ('pytest/topic', 'two', 0, True)]
+
+
+def test_mqtt_connection_inflight_window(fake_client, monkeypatch):
+    monkeypatch.setattr(MQTTConnection, 'MAX_INFLIGHT', 2)
+    monkeypatch.setattr(MQTTConnection, 'TIMEOUT', 0.1)
+    dut = MQTTConnection.get('localhost')
+    dut.publish('pytest/topic', 'acked')
+
+    client, = fake_client.instances
+    client.ack = False
+    dut.publish('pytest/topic', 'one')
+    dut.publish('pytest/topic', 'two')
+    with pytest.raises(RuntimeError, match="Too many messages in-flight"):
+        dut.publish('pytest/topic', 'three')
+
+    client.on_publish(client, None, 2)  # Broker acknowledged 'one'
+    dut.publish('pytest/topic', 'three')
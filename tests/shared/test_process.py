@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+from pnp.shared.process import ProcessOffload
+
+
+class Pid:
+    def __init__(self):
+        self.calls = 0
+
+    def pid(self):
+        self.calls += 1
+        return os.getpid(), self.calls
+
+
+@pytest.mark.asyncio
+async def test_process_offload_starts_the_workers_on_demand():
+    dut = ProcessOffload(Pid())
+    try:
+        assert dut.processes == ProcessOffload.DEFAULT_PROCESSES
+        assert not dut.pool._processes
+        pid, _ = await dut.call('pid')
+        assert pid != os.getpid() and pid in dut.pool._processes
+    finally:
+        await dut.close()
+
+
+@pytest.mark.asyncio
+async def test_process_offload_keeps_a_copy_per_worker():
+    instance = Pid()
+    dut = ProcessOffload(instance, processes=1)
+    try:
+        (pid1, one), (pid2, two) = [await dut.call('pid') for _ in range(2)]
+    finally:
+        await dut.close()
+    assert pid1 == pid2 and (one, two) == (1, 2)
+    assert instance.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_process_offload_closed():
+    dut = ProcessOffload(Pid(), processes=1)
+    await dut.close()
+    with pytest.raises(RuntimeError, match="already closed"):
+        await dut.call('pid')
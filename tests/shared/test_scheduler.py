@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+import pytest
+
+from pnp.shared.scheduler import Scheduler, get_scheduler
+
+
+@pytest.mark.asyncio
+async def test_scheduler_arms_a_single_timer_for_the_earliest_call(mocker):
+    dut = Scheduler(asyncio.get_event_loop())
+    call_later = mocker.spy(dut.loop, 'call_later')
+    res, now = [], time.time()
+
+    dut.call_at(now + 0.3, res.append, 3)
+    dut.call_at(now + 0.5, res.append, 5)  # Later than the armed timer: Nothing to re-arm
+    dut.call_at(now + 0.1, res.append, 1)
+    assert call_later.call_count == 2
+    assert len(dut) == 3
+
+    await asyncio.sleep(0.6)
+    assert res == [1, 3, 5]
+    assert len(dut) == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_cancel_and_failing_callbacks():
+    dut = Scheduler(asyncio.get_event_loop())
+    res, now = [], time.time()
+
+    def _fail():
+        raise Exception("Crash on purpose!")
+
+    dut.call_at(now + 0.05, _fail)
+    dut.call_at(now + 0.05, res.append, 'cancelled').cancel()
+    dut.call_at(now + 0.1, res.append, 'called')
+    assert len(dut) == 2
+
+    await asyncio.sleep(0.2)
+    assert res == ['called']
+
+
+@pytest.mark.asyncio
+async def test_get_scheduler_is_shared_per_loop():
+    assert get_scheduler() is get_scheduler()
+    assert get_scheduler().loop is asyncio.get_event_loop()
@@ -0,0 +1,42 @@
+import pytest
+
+from pnp.shared.exc import TemplateError
+from pnp.shared.templates import TemplateCache, MemoryBytecodeCache, render
+
+
+def test_template_cache_compiles_once():
+    dut = TemplateCache(size=2)
+    tpl = dut.get("{{a}}")
+    assert dut.get("{{a}}") is tpl
+    assert dut.get("{{b}}") is not tpl
+    assert render(tpl, dict(a=42)) == "42"
+
+
+def test_template_cache_reuses_bytecode_of_evicted_templates(mocker):
+    dut = TemplateCache(size=1)
+    tpl = dut.get("{{a}} {{b}}")
+    dut.get("{{c}}")  # Evicts the first template
+
+    compile_ = mocker.spy(dut.environment, 'compile')
+    other = dut.get("{{a}} {{b}}")
+    assert other is not tpl
+    assert compile_.call_count == 0
+    assert render(other, dict(a=1, b=2)) == "1 2"
+
+
+def test_template_cache_undefined_variable():
+    dut = TemplateCache()
+    assert dut.render("{{a}}", a='set') == 'set'
+    with pytest.raises(TemplateError, match="Error when rendering template '{{b}}'"):
+        dut.render("{{b}}")
+
+
+def test_memory_bytecode_cache_is_bounded():
+    dut = TemplateCache(bytecode_size=2)
+    for i in range(5):
+        dut.get("{{var%s}}" % i)
+    cache = dut.environment.bytecode_cache
+    assert isinstance(cache, MemoryBytecodeCache)
+    assert len(cache._cache) == 2
+    cache.clear()
+    assert len(cache._cache) == 0
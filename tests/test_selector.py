@@ -87,3 +87,134 @@ def test_selector_a_lot():
     assert "Error when running the selector lambda: 'lambda payload: known'" in str(e)
 
     assert dut.eval_selector({'str': 'str'}, payload=payload) == {'str': 'str'}
+
+
+def test_selector_expression_is_compiled_once():
+    dut = PayloadSelector.instance
+    sel = "payload['a'] + 1"
+    assert dut.eval_selector(sel, {'a': 1}) == 2
+    code = dut._compiled[sel]
+    assert dut.eval_selector(sel, {'a': 2}) == 3
+    assert dut._compiled[sel] is code
+
+    # Customs are globals: They are accessible in nested scopes like comprehensions as well
+    assert dut.eval_selector("[str(i) for i in payload]", [1, 2]) == ['1', '2']
+
+
+def test_complex_selector_is_compiled_once():
+    calls = 0
+
+    def udf():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    dut = PayloadSelector.instance
+    dut.register_custom_global('complex_calls', udf)
+    sel = {'literal': 'complex_calls()', 'items': ['a', 'lambda p: complex_calls()']}
+
+    fun = dut.compile_selector(sel)
+    assert calls == 0  # Literals are not evaluated at all
+    assert dut.compile_selector(dict(sel)) is fun
+    assert dut.eval_selector(sel, 'payload') == {'literal': 'complex_calls()', 'items': ['a', 1]}
+
+    with pytest.raises(EvaluationError, match="Your lambda is errorneous"):
+        dut.eval_selector({'key': 'lambda is not a lambda'}, 'payload')
+
+
+def test_selector_payload_view():
+    dut = PayloadSelector.instance
+    payload = {'devices': {'19': {'data': {'level': {'value': 42}}}}, 'my key': [{'a': 1}]}
+
+    # Dot access, int -> str fallback and keys that are no valid attribute names
+    assert dut.eval_selector('payload.devices[19].data.level.value', payload) == 42
+    assert dut.eval_selector('payload.my_key[0].a', payload) == 1
+    assert dut.eval_selector('isinstance(data.devices, dict)', payload) is True
+
+    # Selected parts are handed out as the original (unboxed) objects
+    selected = dut.eval_selector('payload.devices', payload)
+    assert type(selected) is dict and selected is payload['devices']
+    selected = dut.eval_selector({'level': 'lambda p: p.devices[19].data.level'}, payload)
+    assert selected['level'] is payload['devices']['19']['data']['level']
+
+    with pytest.raises(EvaluationError):
+        dut.eval_selector("payload.devices.__setattr__('x', 1)", payload)
+    assert 'x' not in payload['devices']
+
+
+def test_selector_payload_view_behaves_like_the_payload():
+    dut = PayloadSelector.instance
+    payload = {'a': {'b': 1}, 'l': [1, 2]}
+
+    assert dut.eval_selector('payload.l * 2', payload) == [1, 2, 1, 2]
+    assert dut.eval_selector('2 * payload.l', payload) == [1, 2, 1, 2]
+    assert dut.eval_selector('[4] + payload.l', payload) == [4, 1, 2]
+    assert dut.eval_selector('payload.l + [4]', payload) == [1, 2, 4]
+    assert dut.eval_selector('payload.a.copy()', payload) == {'b': 1}
+    assert type(dut.eval_selector('payload.to_dict()', payload)['a']) is dict
+    assert type(dut.eval_selector('payload.keys()', payload)) is type(payload.keys())
+    assert list(dut.eval_selector('payload.values()', payload)) == [{'b': 1}, [1, 2]]
+    assert dict(dut.eval_selector('payload.items()', payload)) == payload
+
+
+@pytest.mark.parametrize("selector,expected", [
+    ('sorted(payload.a)', [[1, 2], [2], [3]]),
+    ('max(payload.a)', [3]),
+    ('min(payload.a)', [1, 2]),
+    ('payload.a[0] > payload.a[1]', True),
+    ('[0] < payload.a[0]', True),
+    ('payload.a[2] <= [2] and payload.a[2] >= [2]', True),
+    ("payload.n | {'z': 1}", {'x': 1, 'z': 1}),
+    ("{'z': 1, 'x': 2} | payload.n", {'x': 1, 'z': 1}),
+    ("payload.n | payload.n", {'x': 1}),
+])
+def test_selector_payload_view_operators(selector, expected):
+    payload = {'a': [[3], [1, 2], [2]], 'n': {'x': 1}}
+    assert PayloadSelector.instance.eval_selector(selector, payload) == expected
+
+
+def test_selector_udfs_get_the_actual_payload():
+    import json
+
+    dut = PayloadSelector.instance
+    calls = []
+
+    def udf(obj):
+        calls.append(obj)
+        return isinstance(obj, dict) and json.dumps(obj)
+
+    dut.register_custom_global('view_aware_udf', udf)
+    assert dut.eval_selector('view_aware_udf(payload.a)', {'a': {'b': 1}}) == '{"b": 1}'
+    assert type(calls[0]) is dict
+
+
+def test_selector_inline_decision():
+    dut = PayloadSelector.instance
+    dut.register_custom_global('inline_udf', lambda p: p)
+
+    assert dut.compile_selector(None).inline
+    assert dut.compile_selector('payload.a.b').inline
+    assert dut.compile_selector("[str(i) for i in payload]").inline
+    assert dut.compile_selector({'a': 'lambda p: int(p)', 'b': 'literal()'}).inline
+
+    assert not dut.compile_selector('inline_udf(payload)').inline
+    assert not dut.compile_selector({'a': 'lambda p: p', 'b': 'lambda p: inline_udf(p)'}).inline
+
+    # Measured to be slow: Will be offloaded from now on
+    slow = dut.compile_selector('sorted(payload, reverse=True)')
+    assert slow.inline
+    slow.avg_duration = slow.INLINE_THRESHOLD * 2
+    assert not slow.inline
+
+
+def test_selector_throttled_udf_distinguishes_payloads():
+    from pnp.plugins.udf import UserDefinedFunction
+
+    class Echo(UserDefinedFunction):
+        def action(self, obj):
+            return obj['a']
+
+    dut = PayloadSelector.instance
+    dut.register_udfs([UDFModel(name='throttled_echo', callable=Echo(name='pytest', throttle='1m'))])
+    assert dut.eval_selector('throttled_echo(payload)', {'a': 1}) == 1
+    assert dut.eval_selector('throttled_echo(payload)', {'a': 2}) == 2